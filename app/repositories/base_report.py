@@ -1,6 +1,31 @@
+"""
+回測報表圖片
+
+每個 (股票, 策略) 一張 output/{stock_id}_{method}.png：折線圖 + 年度彙總 + 最近交易紀錄 + 最近 summary。
+- 表格列數有上限（ROLLUP_YEARS 年、RECENT_ROWS 筆交易、SUMMARY_ROWS 筆 summary），每列固定高度，
+  圖片尺寸與繪製時間不隨回測期間增長
+- 固定使用非互動的 Agg backend，以物件導向的 Figure API 繪圖（不經 pyplot 全域狀態），可安全地在多個程序中繪製
+- 交易紀錄與 summary 各以一次依 (stock_id, method) 排序的查詢讀出，在記憶體中分組
+- 各組合以 ProcessPoolExecutor 平行繪製；工作程序數預設為 CPU 核心數，可由環境變數 REPORT_WORKERS 設定，
+  1 表示在主程序內直接執行
+- 回傳並記錄每張圖片的繪製時間
+- 輸出目錄的 render_manifest.json 記錄每張圖片的輸入指紋（交易紀錄、圖中的 summary、RENDERER_VERSION），
+  指紋相同且圖片存在時略過；force=True（summary_table.py --force）全部重新繪製
+"""
+import logging
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import matplotlib
+matplotlib.use('Agg')
 import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import sqlite3
 from pathlib import Path
 from reportlab.lib import colors
@@ -12,9 +37,164 @@ from io import BytesIO
 import os
 import math
 from PIL import Image, ImageDraw, ImageFont
+from app.repositories import db_schema
+from app.repositories.render_manifest import RenderManifest, fingerprint
 from app.utils.formatting import format_float
 
+logger = logging.getLogger(__name__)
+
+TRANSACTION_COLUMNS = ['date', 'date_closed_price', 'position_size', 'position_price', 'position_value',
+                       'broker_dividend', 'asset_value']
+SUMMARY_COLUMNS = ['date', 'close', 'position_value', 'broker_dividend', 'asset_value', 'roi', 'irr']
+
+TITLE_FONT = 'arial.ttf'
+
+# 圖片版面或繪圖方式改變時遞增，使既有圖片全部重新繪製
+RENDERER_VERSION = 4
+
+# 表格列數上限：年度彙總超過 ROLLUP_YEARS 年時較早的年份合併為一列
+ROLLUP_YEARS = 10
+RECENT_ROWS = 12
+SUMMARY_ROWS = 5
+
+# 表格每列高度（英吋），表頭為兩行文字
+TABLE_ROW_INCHES = 0.45
+TABLE_FONT_SIZE = 10
+
+TRANSACTION_LABELS = ['Date', 'Close', 'Position\n Size', 'Position\n Price', 'Position\n Value',
+                      'Broker\n Dividend', 'Asset\n Value']
+ROLLUP_LABELS = ['Year', 'Trades'] + TRANSACTION_LABELS[1:]
+SUMMARY_LABELS = ['Date', 'Close', 'Position\n Value', 'Broker\n Dividend', 'Asset\n Value', 'ROI', 'IRR']
+
+
+@dataclass
+class RenderJob:
+    stock_id: str
+    method: str
+    df_transaction: pd.DataFrame
+    df_summary: pd.DataFrame
+    output_dir: Path
+
+    @property
+    def image_path(self) -> Path:
+        return self.output_dir / f"{self.stock_id}_{self.method}.png"
+
+    @cached_property
+    def plotted_summary(self) -> pd.DataFrame:
+        """圖中的 summary：最後 SUMMARY_ROWS 筆（含目前估值）"""
+        return self.df_summary.tail(SUMMARY_ROWS)
+
+    @cached_property
+    def fingerprint(self) -> str:
+        """只涵蓋圖中畫出的資料；估值改變時重新繪製"""
+        return fingerprint(RENDERER_VERSION, self.df_transaction, self.plotted_summary)
+
+
+@dataclass
+class RenderResult:
+    stock_id: str
+    method: str
+    path: Path
+    seconds: float
+
+
+def _title_font(size: int) -> ImageFont.FreeTypeFont:
+    """Arial 不存在時（例如 Linux）改用 Pillow 內建字型"""
+    try:
+        return ImageFont.truetype(TITLE_FONT, size)
+    except OSError:
+        return ImageFont.load_default(size)
+
+
+def _png_buffer(fig: Figure) -> BytesIO:
+    img_buffer = BytesIO()
+    FigureCanvasAgg(fig)
+    fig.savefig(img_buffer, format='png', bbox_inches='tight')
+    img_buffer.seek(0)
+    return img_buffer
+
+
+def yearly_rollup(df_transaction: pd.DataFrame, max_years: int = ROLLUP_YEARS) -> pd.DataFrame:
+    """
+    交易紀錄依年度彙總：每年最後一筆的持股、價值與累計配息，以及交易筆數
+
+    :param max_years: 列數上限；超過時較早的年份合併為一列（標示為 '起始年-結束年'）
+    :return: 欄位 year、trades 與 TRANSACTION_COLUMNS 中除 date 以外的欄位
+    """
+    years = df_transaction['date'].astype(str).str[:4]
+    distinct = years.unique()
+    if len(distinct) > max_years:
+        merged = distinct[:len(distinct) - max_years + 1]
+        years = years.mask(years.isin(merged), f'{merged[0]}-{merged[-1]}')
+    grouped = df_transaction.drop(columns='date').groupby(years.rename('year'), sort=False)
+    return grouped.last().assign(trades=grouped.size()).reset_index()[
+        ['year', 'trades'] + TRANSACTION_COLUMNS[1:]]
+
+
+def _transaction_table(df_transaction: pd.DataFrame) -> pd.DataFrame:
+    return df_transaction.tail(RECENT_ROWS).set_axis(TRANSACTION_LABELS, axis=1).map(format_float)
+
+
+def _rollup_table(df_transaction: pd.DataFrame) -> pd.DataFrame:
+    return yearly_rollup(df_transaction).set_axis(ROLLUP_LABELS, axis=1).map(format_float)
+
+
+def _summary_table(df_summary: pd.DataFrame) -> pd.DataFrame:
+    df_summary = df_summary.tail(SUMMARY_ROWS).set_axis(SUMMARY_LABELS, axis=1)
+    df_summary = df_summary.assign(
+        IRR=(df_summary['IRR'] * 100).round(2).astype(str) + '%',
+        ROI=(df_summary['ROI'] * 100).round(2).astype(str) + '%',
+    )
+    return df_summary.map(format_float)
+
+
+def _render_pair(job: RenderJob) -> RenderResult:
+    """工作程序：繪製單一 (股票, 策略) 的圖片"""
+    start = time.perf_counter()
+    path = BaseReport.process_data(job)
+    return RenderResult(job.stock_id, job.method, path, time.perf_counter() - start)
+
+
+def _render(jobs: List[RenderJob], workers: int) -> Iterator[RenderResult]:
+    if workers == 1 or len(jobs) <= 1:
+        yield from map(_render_pair, jobs)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(_render_pair, jobs)
+
+
+def render_reports(reports: Sequence['BaseReport'], workers: Optional[int] = None,
+                   force: bool = False) -> List[RenderResult]:
+    """
+    以同一個程序池繪製多個報表（例如美股與台股）中輸入有變動的圖片
+
+    :param workers: 工作程序數，None 時讀取 REPORT_WORKERS，未設定則為 CPU 核心數
+    :param force: 忽略繪製清單，全部重新繪製
+    :return: 依提交順序的繪製結果（不含略過的圖片）
+    """
+    workers = workers or int(os.environ.get('REPORT_WORKERS', 0)) or os.cpu_count() or 1
+    jobs = [job for report in reports for job in report.jobs()]
+    manifests = {job.output_dir: RenderManifest(job.output_dir / RenderManifest.FILENAME) for job in jobs}
+    pending = [job for job in jobs
+               if force or not manifests[job.output_dir].is_current(job.image_path, job.fingerprint)]
+    logger.info("繪製 %d 張圖片，略過 %d 張輸入未變動的圖片", len(pending), len(jobs) - len(pending))
+
+    results = []
+    try:
+        for job, result in zip(pending, _render(pending, workers)):
+            manifests[job.output_dir].mark(job.image_path, job.fingerprint)
+            logger.info("產生圖片 %s（%.2f 秒）", result.path, result.seconds)
+            results.append(result)
+    finally:
+        # 中途失敗時保留已完成的圖片，下次只重畫其餘的
+        for manifest in manifests.values():
+            manifest.save()
+    return results
+
+
 class BaseReport(ABC):
+    OUTPUT_DIR = Path('output')
+
     TABLE_STYLE = [
         ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
         ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
@@ -36,81 +216,95 @@ class BaseReport(ABC):
     @abstractmethod
     def DB_PATH(self) -> Path:
         pass
-    
-    def process_data(self, conn: sqlite3.Connection, stock_id: str, method: str) -> None:
-        df_transaction = pd.read_sql_query(
-            f"SELECT date, date_closed_price, position_size, position_price, position_value, broker_dividend, asset_value FROM transaction_logs WHERE stock_id='{stock_id}' AND method='{method}'", conn)
-
-        df_summary = pd.read_sql_query(
-            f"SELECT date, close, position_value, broker_dividend, asset_value, roi, irr FROM bt_summaries WHERE stock_id='{stock_id}' AND method='{method}'", conn)
-
-        chart_img_buffer = __class__.plot_strategy_graph(df_transaction, stock_id, method)
-
-        df_transaction.columns = ['Date','Close','Position\n Size','Position\n Price','Position\n Value','Broker\n Dividend','Asset\n Value']
-        df_transaction = df_transaction.map(format_float)
-        transaction_table_img_buffer = __class__.plot_table(df_transaction)
-        
-        df_summary.columns = ['Date','Close','Position\n Value','Broker\n Dividend','Asset\n Value','ROI','IRR']
-        df_summary['IRR'] = (df_summary['IRR'] * 100).round(2).astype(str) + '%'
-        df_summary['ROI'] = (df_summary['ROI'] * 100).round(2).astype(str) + '%'
-        df_summary = df_summary.map(format_float)
-        summary_table_img_buffer = __class__.plot_table(df_summary)
-        
-        #__class__.generate_pdf(stock_id, method, df_transaction, df_summary, img_buffer)        
-        __class__.generate_image(stock_id, method, transaction_table_img_buffer, summary_table_img_buffer, chart_img_buffer)
 
+    """
+    一次讀出所有組合的交易紀錄與 summary，依 (stock_id, method) 分組
+    """
+    def load_data(self) -> Dict[Tuple[str, str], Tuple[pd.DataFrame, pd.DataFrame]]:
+        with closing(db_schema.connect(self.DB_PATH)) as conn:
+            transactions = pd.read_sql_query(
+                f"SELECT stock_id, method, {', '.join(TRANSACTION_COLUMNS)} FROM {db_schema.LOGS_TABLE} "
+                "ORDER BY stock_id, method, date", conn)
+            summaries = pd.read_sql_query(
+                f"SELECT stock_id, method, {', '.join(SUMMARY_COLUMNS)} FROM {db_schema.SUMMARIES_TABLE} "
+                "ORDER BY stock_id, method, date", conn)
+
+        summary_groups = dict(list(summaries.groupby(['stock_id', 'method'], sort=False)))
+        empty_summary = summaries.iloc[:0]
+        return {
+            key: (group[TRANSACTION_COLUMNS].reset_index(drop=True),
+                  summary_groups.get(key, empty_summary)[SUMMARY_COLUMNS].reset_index(drop=True))
+            for key, group in transactions.groupby(['stock_id', 'method'], sort=False)
+        }
+
+    def jobs(self) -> List[RenderJob]:
+        return [RenderJob(stock_id, method, df_transaction, df_summary, self.OUTPUT_DIR)
+                for (stock_id, method), (df_transaction, df_summary) in self.load_data().items()]
+
+    """
+    繪製單一組合的折線圖、年度彙總、最近交易紀錄與 summary 表並合成一張圖片
+    :return: 圖片路徑
+    """
+    @staticmethod
+    def process_data(job: RenderJob) -> Path:
+        chart_img_buffer = BaseReport.plot_strategy_graph(job.df_transaction, job.stock_id, job.method)
+        recent_title = f"Recent Transactions ({min(RECENT_ROWS, len(job.df_transaction))} of {len(job.df_transaction)})"
+        sections = [
+            ("Yearly Summary", BaseReport.plot_table(_rollup_table(job.df_transaction))),
+            (recent_title, BaseReport.plot_table(_transaction_table(job.df_transaction))),
+            ("Summary Table", BaseReport.plot_table(_summary_table(job.plotted_summary))),
+        ]
+        return BaseReport.generate_image(job.stock_id, job.method, chart_img_buffer, sections, job.output_dir)
+
+    @staticmethod
     def plot_strategy_graph(df: pd.DataFrame, stock_id: str, strategy: str) -> BytesIO:
-        plt.figure(figsize=(12, 6))
-        plt.plot(df['date'], df['position_value'], label='Position Value', color='gray')
-        plt.plot(df['date'], df['asset_value'], label='Asset Value', color='darkred')
-
-        last_date = df['date'].iloc[-1]
+        fig = Figure(figsize=(12, 6))
+        ax = fig.subplots()
+        # 日期字串會被當成類別軸（每筆一個刻度），轉為日期後刻度數量固定
+        dates = pd.to_datetime(df['date'])
+        ax.plot(dates, df['position_value'], label='Position Value', color='gray')
+        ax.plot(dates, df['asset_value'], label='Asset Value', color='darkred')
+
+        last_date = dates.iloc[-1]
         last_pv = df['position_value'].iloc[-1]
         last_av = df['asset_value'].iloc[-1]
 
         va_pv = 'top' if last_av > last_pv else 'bottom'
         va_av = 'bottom' if last_av > last_pv else 'top'
 
-        plt.text(last_date, last_pv, f"{last_pv:.2f}", fontsize=12, ha='center', va=va_pv)
-        plt.text(last_date, last_av, f"{last_av:.2f}", fontsize=12, ha='center', va=va_av)
+        ax.text(last_date, last_pv, f"{last_pv:.2f}", fontsize=12, ha='center', va=va_pv)
+        ax.text(last_date, last_av, f"{last_av:.2f}", fontsize=12, ha='center', va=va_av)
 
-        plt.xlabel('Date', fontsize=16)
-        plt.ylabel('Value', fontsize=16)
-        plt.title(f'Stock ID: {stock_id}, Strategy: {strategy}', fontsize=20)
-        plt.legend(fontsize=16)
+        ax.set_xlabel('Date', fontsize=16)
+        ax.set_ylabel('Value', fontsize=16)
+        ax.set_title(f'Stock ID: {stock_id}, Strategy: {strategy}', fontsize=20)
+        ax.legend(fontsize=16)
 
-        plt.setp(plt.gca().get_xticklabels(), rotation=45, ha='right', rotation_mode='anchor')
+        for label in ax.get_xticklabels():
+            label.set(rotation=45, ha='right', rotation_mode='anchor')
 
-        plt.grid(True)
-        plt.tight_layout()
+        ax.grid(True)
+        fig.tight_layout()
 
-        img_buffer = BytesIO()
-        plt.savefig(img_buffer, format='png', bbox_inches='tight')
-        img_buffer.seek(0)
-        plt.close()
+        return _png_buffer(fig)
 
-        return img_buffer    
-    
+    @staticmethod
     def plot_table(df: pd.DataFrame) -> BytesIO:
-        # 創建一個新的圖形，寬度與折線圖相同
-        plt.figure(figsize=(12, 1))
+        # 創建一個新的圖形，寬度與折線圖相同，高度依列數（含表頭）固定增加
+        fig = Figure(figsize=(12, TABLE_ROW_INCHES * (len(df) + 1)))
+        ax = fig.add_axes((0.01, 0.01, 0.98, 0.98))
 
         # 隱藏圖形的坐標軸
-        plt.axis('off')
+        ax.axis('off')
 
-        # 創建表格
+        # 創建表格，填滿整個坐標軸
         data = [df.columns.tolist()] + df.values.tolist()
-        table = plt.table(cellText=data, cellLoc='center', loc='center')
-        #table.auto_set_column_width(col=list(range(len(df.columns))))
-        table.scale(1.25, 2.5)
+        table = ax.table(cellText=data, cellLoc='center', bbox=[0, 0, 1, 1])
+        table.auto_set_font_size(False)
+        table.set_fontsize(TABLE_FONT_SIZE)
 
-        img_buffer = BytesIO()
-        plt.savefig(img_buffer, format='png', bbox_inches='tight')
-        img_buffer.seek(0)
-        plt.close()
+        return _png_buffer(fig)
 
-        return img_buffer
-    
 
     def set_table_style(table: Table) -> Table:
         table.setStyle(TableStyle(BaseReport.TABLE_STYLE))
@@ -151,71 +345,53 @@ class BaseReport(ABC):
 
         doc.build(elements)
         print(f"PDF file '{pdf_filename}' created successfully.")
-              
 
-    def generate_image(stock_id: str, method: str, transaction_table_img_buffer: BytesIO, summary_table_img_buffer: BytesIO, chart_img_buffer: BytesIO) -> None:
-        img_filename = os.path.join("output", f"{stock_id}_{method}.png")
+
+    @staticmethod
+    def generate_image(stock_id: str, method: str, chart_img_buffer: BytesIO, sections: List[Tuple[str, BytesIO]],
+                       output_dir: Path = Path('output')) -> Path:
+        """
+        折線圖下依序接上各表格（每個表格上方置中標題）
+
+        :param sections: [(標題, 表格圖片), ...]
+        """
+        img_filename = output_dir / f"{stock_id}_{method}.png"
 
         # Line Chart
         line_chart = Image.open(chart_img_buffer)
         line_chart_width, line_chart_height = line_chart.size
-
-        # Transaction Records
-        transaction_table = Image.open(transaction_table_img_buffer)
-        transaction_table_width, transaction_table_height = transaction_table.size
-
-        # Current Asset Value
-        summary_table = Image.open(summary_table_img_buffer)
-        summary_table_width, summary_table_height = summary_table.size
+        tables = [(title, Image.open(buffer)) for title, buffer in sections]
 
         # Calculate total image height
         title_font_size = 24
-        total_height = line_chart_height + transaction_table_height + summary_table_height + title_font_size*8
+        total_height = line_chart_height + sum(table.height + title_font_size*3 for _, table in tables) + title_font_size*2
 
         # Create main image
         main_image = Image.new('RGB', (line_chart_width, total_height), color='white')
         draw = ImageDraw.Draw(main_image)
-        
-        # Add title to main image
-        
-        title_font = ImageFont.truetype("arial.ttf", title_font_size)
-        title_width, title_height = title_font.getsize("Transaction Table")
-        draw.text(((line_chart_width - title_width) // 2, line_chart_height + title_font_size), "Transaction Table", font=title_font, fill='black')
-        title_width, title_height = title_font.getsize("Summary Table")
-        draw.text(((line_chart_width - title_width) // 2, line_chart_height + transaction_table_height + title_font_size*4), "Summary Table", font=title_font, fill='black')
-
-        # Paste subplots onto main image
+        title_font = _title_font(title_font_size)
         main_image.paste(line_chart, (0, 0))
-        main_image.paste(transaction_table, (0, line_chart_height + title_font_size*3))
-        main_image.paste(summary_table, (0, line_chart_height + transaction_table_height + title_font_size*6))
-        
+
+        # Add titles and paste tables onto main image
+        top = line_chart_height
+        for title, table in tables:
+            title_width = draw.textlength(title, font=title_font)
+            draw.text(((line_chart_width - title_width) // 2, top + title_font_size), title, font=title_font, fill='black')
+            main_image.paste(table, (0, top + title_font_size*3))
+            top += table.height + title_font_size*3
+
         # Save main image
+        output_dir.mkdir(parents=True, exist_ok=True)
         main_image.save(img_filename)
-        print(f"Image file '{img_filename}' created successfully.")
-        
-        
-
-    def run(self) -> None:
-        try:
-            with sqlite3.connect(self.DB_PATH) as conn:
-                query = 'SELECT DISTINCT stock_id, method FROM transaction_logs'
-                unique_combinations = pd.read_sql_query(query, conn)
-
-            for _, row in unique_combinations.iterrows():
-                stock_id = row['stock_id']
-                method = row['method']
-                #if method != 'bt_dividend':
-                #    continue
-                with sqlite3.connect(self.DB_PATH) as conn:
-                    self.process_data(conn, stock_id, method)
-        except sqlite3.Error as e:
-            print(f"An error occurred: {e}")
-        finally:
-            if conn:
-                conn.close()
+        return img_filename
+
+
+    def run(self, workers: Optional[int] = None, force: bool = False) -> List[RenderResult]:
+        """平行繪製輸入有變動的 (股票, 策略) 圖片，回傳每張圖片的繪製時間"""
+        return render_reports([self], workers, force)
 
 class USReport(BaseReport):
     DB_PATH = Path('data/us/db.sqlite')
 
 class TWReport(BaseReport):
-    DB_PATH = Path('data/tw/db.sqlite')
\ No newline at end of file
+    DB_PATH = Path('data/tw/db.sqlite')
@@ -1,17 +1,31 @@
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional
 from datetime import date
 import pandas as pd
+import numpy as np
 import math
 import sqlite3
 import time
 import sys
+from app.repositories import db_schema
+from app.repositories.bt_checkpoint import CheckpointStore, history_hash
+from app.repositories.bt_engine import BacktestBatch, BacktestInputs, BacktestResult, BacktestState, run_vectorized
+from app.repositories.budget_allocator import BudgetAllocator
+from app.repositories.dividend_index import DividendIndex
+from app.repositories.indicator_store import IndicatorStore
+from app.repositories.result_sink import SqliteResultSink, WriteStats
 
 class BaseStrategy(ABC):
-    TRANSACTION_LOGS_TABLE = 'transaction_logs' 
+    TRANSACTION_LOGS_TABLE = 'transaction_logs'
     BT_SUMMARIES_TABLE = 'bt_summaries'
-    
+
+    # 可用的回測引擎
+    ENGINES = ('loop', 'vectorized')
+
+    # 所有回測策略
+    METHODS = ('bt_dividend', 'bt_signals', 'bt_ma_pullback', 'bt_monthly_dca')
+
     # 持股量
     POSITION_SIZE = 0
     
@@ -26,6 +40,15 @@ class BaseStrategy(ABC):
     
     # 起始年
     START_YEAR = 2000
+
+    # 年度預算分配政策，見 BudgetAllocator.POLICIES
+    BUDGET_POLICY = 'full_year'
+
+    # 技術指標增量快取，None 表示每次全量計算
+    indicator_store: Optional[IndicatorStore] = None
+
+    # 執行期間共用的結果寫入器（open_result_sink 開啟），None 表示每次寫入各自提交
+    result_sink: Optional[SqliteResultSink] = None
     
     @abstractmethod
     def DB_PATH(self):
@@ -66,38 +89,293 @@ class BaseStrategy(ABC):
     
     :param stock_data: 股票數據
     :param method_name: 策略名稱
+    :param engine: 回測引擎，'loop'（逐列迴圈）或 'vectorized'（NumPy 陣列運算），兩者產出相同
+    :param dividend_index: 配息事件索引；同一檔股票的多個策略應共用同一份，None 時由 stock_data 建立
     :return: 回測結果字典
     """
-    def bt_strategy(self, stock_data: pd.DataFrame, method_name: str) -> Dict[str, float]:
+    def bt_strategy(self, stock_data: pd.DataFrame, method_name: str, engine: str = 'loop',
+                    dividend_index: Optional[DividendIndex] = None) -> Dict[str, float]:
         if stock_data.empty:
             raise ValueError("Stock data is empty")
-
-        # 初始化參數
-        position_size = self.POSITION_SIZE
-        position_value = self.POSITION_VALUE
-        position_price = self.POSITION_PRICE
-        broker_dividend = self.BROKER_DIVIDEND
-        year_avl_cash = self.BROKER_YEAR_CASH
-        current_year = self.START_YEAR
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine: {engine}")
+        if dividend_index is None:
+            dividend_index = DividendIndex.from_frame(stock_data, self.DIVIDEND_COLUMN)
 
         # 執行回測日期
         bt_date = date.today().strftime('%Y-%m-%d')
 
         # 定義買入訊號 `buy_signal`
+        stock_data = stock_data.assign(buy_signal=self.buy_signal(stock_data, method_name))
+
+        if stock_data[stock_data['buy_signal'] == 1]['buy_signal'].count() == 0:
+            return None
+
+        # 每年訊號次數只計算一次，之後依分配政策以 O(1) 取得每次交易金額
+        allocator = BudgetAllocator.from_signals(
+            stock_data['date'], stock_data['buy_signal'], self.BROKER_YEAR_CASH, self.BUDGET_POLICY)
+
+        if engine == 'vectorized':
+            inputs = BacktestInputs.from_frame(stock_data, self.CLOSED_PRICE_COLUMN)
+            result = run_vectorized(inputs, stock_data['buy_signal'].to_numpy(), method_name, dividend_index, allocator)
+        else:
+            result = BacktestResult(*self._bt_loop(stock_data, method_name, dividend_index, allocator))
+
+        # 更新交易資料
+        self.update_transaction_logs(result.rows)
+
+        # 更新交易策略 summary 資料
+        first_date = stock_data[stock_data['buy_signal'] == 1].iloc[0]['date']
+        summary = self._summary_row(stock_data, method_name, bt_date, first_date, result)
+        if summary is not None:
+            self.update_bt_summary(summary)
+
+    """
+    多策略合併回測：同一檔股票的所有策略共用一次計算的訊號矩陣、配息索引與價格陣列，
+    以向量化引擎一次推進，最後以單一連線批次寫入交易紀錄與 summary。
+    不複製也不修改呼叫端的 stock_data。
+
+    incremental=True 時自 bt_checkpoints 的檢查點續算，只重寫檢查點之後的交易紀錄並取代該組合的 summary，
+    不需先清空資料表；歷史被改寫（雜湊不符）的策略整段重建。
+
+    :param stock_data: 股票數據（依日期排序）
+    :param methods: 策略名稱清單，預設為 METHODS
+    :param dividend_index: 配息事件索引，None 時由 stock_data 建立
+    :param incremental: 是否以檢查點增量回測
+    :return: {策略名稱: 回測結果}，無買入訊號的策略不列入；增量模式下結果只含檢查點之後的交易
+    """
+    def bt_strategies(self, stock_data: pd.DataFrame, methods: Optional[List[str]] = None,
+                      dividend_index: Optional[DividendIndex] = None,
+                      incremental: bool = False) -> Dict[str, BacktestResult]:
+        batch = self.backtest_batch(stock_data, methods, dividend_index, incremental)
+        self.write_batch(batch, incremental)
+        return batch.results
+
+    """
+    執行多策略回測但不寫入資料庫，供 bt_strategies 與平行回測共用
+
+    :param stock_data: 股票數據（依日期排序）
+    :param methods: 策略名稱清單，預設為 METHODS
+    :param dividend_index: 配息事件索引，None 時由 stock_data 建立
+    :param incremental: 是否以檢查點增量回測
+    :param checkpoints: 已讀取的檢查點（CheckpointStore.load 的結果），None 時由資料庫讀取
+    :return: 待寫入的回測結果
+    """
+    def backtest_batch(self, stock_data: pd.DataFrame, methods: Optional[List[str]] = None,
+                       dividend_index: Optional[DividendIndex] = None, incremental: bool = False,
+                       checkpoints: Optional[dict] = None) -> BacktestBatch:
+        if stock_data.empty:
+            raise ValueError("Stock data is empty")
+        methods = list(methods or self.METHODS)
+        if dividend_index is None:
+            dividend_index = DividendIndex.from_frame(stock_data, self.DIVIDEND_COLUMN)
+
+        bt_date = date.today().strftime('%Y-%m-%d')
+        signals = self.signal_matrix(stock_data, methods)
+        stock_id = self._stock_id(stock_data)
+        # 增量回測依 stock_id 刪除、重寫交易紀錄，配息列必須歸屬於該股票，否則每次續算都會重複寫入
+        inputs = BacktestInputs.from_frame(stock_data, self.CLOSED_PRICE_COLUMN, stock_id)
+        if checkpoints is None:
+            checkpoints = self.checkpoint_store.load(stock_id) if incremental else {}
+        dividends = stock_data[self.DIVIDEND_COLUMN].to_numpy(dtype=float)
+
+        batch = BacktestBatch()
+        for method_name in methods:
+            buy_signal = signals[method_name].to_numpy()
+            if not (buy_signal == 1).any():
+                batch.resumed.append((stock_id, method_name, None))
+                continue
+
+            allocator = BudgetAllocator.from_signals(
+                stock_data['date'], signals[method_name], self.BROKER_YEAR_CASH, self.BUDGET_POLICY)
+            start, initial, since = self._resume_point(
+                checkpoints.get(method_name), inputs, dividends, buy_signal, stock_id, method_name)
+            result = run_vectorized(inputs, buy_signal, method_name, dividend_index, allocator, start, initial)
+            batch.results[method_name] = result
+            batch.logs.extend(result.rows)
+            batch.resumed.append((stock_id, method_name, since))
+
+            final = result.states[-1] if result.states else initial
+            summary = self._summary_row(stock_data, method_name, bt_date, pd.Timestamp(final.first_buy_date), result)
+            if summary is not None:
+                batch.summaries.append(summary)
+            if incremental:
+                batch.checkpoints.extend(self._checkpoint_rows(
+                    stock_id, method_name, inputs, dividends, buy_signal, result, start, initial))
+        return batch
+
+    """
+    寫入回測結果：已開啟共用寫入器時先緩衝，否則以單一連線、單一交易寫入
+
+    :param batch: 回測結果（可合併多檔股票）
+    :param incremental: 是否為增量回測（決定是否刪除檢查點之後的舊資料並更新檢查點）
+    :return: 寫入統計（共用寫入器為累計值，不含尚未寫入的緩衝）
+    """
+    def write_batch(self, batch: BacktestBatch, incremental: bool = False) -> WriteStats:
+        if self.result_sink is not None:
+            self.result_sink.add(batch, incremental)
+            return self.result_sink.stats
+        with self.new_result_sink() as sink:
+            sink.add(batch, incremental)
+        return sink.stats
+
+    def new_result_sink(self, batch_rows: int = SqliteResultSink.BATCH_ROWS) -> SqliteResultSink:
+        return SqliteResultSink(self.DB_PATH, self.TRANSACTION_LOGS_TABLE, self.BT_SUMMARIES_TABLE,
+                                self.checkpoint_store, batch_rows)
+
+    """
+    開啟共用寫入器：之後 bt_strategy / bt_strategies 的結果只緩衝，close_result_sink 時一次寫入
+
+    :param batch_rows: 緩衝列數上限
+    """
+    def open_result_sink(self, batch_rows: int = SqliteResultSink.BATCH_ROWS) -> SqliteResultSink:
+        self.result_sink = self.new_result_sink(batch_rows)
+        return self.result_sink
+
+    """
+    寫入剩餘緩衝並關閉共用寫入器
+
+    :return: 寫入統計
+    """
+    def close_result_sink(self) -> Optional[WriteStats]:
+        if self.result_sink is None:
+            return None
+        sink, self.result_sink = self.result_sink, None
+        sink.close()
+        return sink.stats
+
+    def __getstate__(self) -> dict:
+        # 平行回測時策略會 pickle 至工作程序，資料庫連線不隨之傳遞
+        state = self.__dict__.copy()
+        state.pop('result_sink', None)
+        return state
+
+    """
+    由檢查點決定續算起點；無檢查點或歷史雜湊不符時從頭回測
+
+    :param checkpoint: (檢查點日期, 歷史雜湊, 狀態)，可為 None
+    :param inputs: 價格陣列
+    :param dividends: 配息陣列
+    :param buy_signal: 買入訊號
+    :param stock_id: 股票代號
+    :param method_name: 策略名稱
+    :return: (起始列, 起始狀態, 保留交易紀錄的最後日期；None 表示整段重寫)
+    """
+    def _resume_point(self, checkpoint: Optional[tuple], inputs: BacktestInputs, dividends: np.ndarray,
+                      buy_signal: np.ndarray, stock_id: str, method_name: str) -> Tuple[int, BacktestState, Optional[str]]:
+        if checkpoint is None:
+            return 0, BacktestState(), None
+        checkpoint_date, digest, state = checkpoint
+        start = int(np.searchsorted(inputs.dates, np.datetime64(checkpoint_date), side='right'))
+        if history_hash(inputs, dividends, buy_signal, start) != digest:
+            print(f"[INFO] {stock_id} {method_name}: 歷史資料已變更，重新回測")
+            return 0, BacktestState(), None
+        return start, state, checkpoint_date
+
+    """
+    計算新的檢查點：full_year 停在最後一年的前一個交易日（當年金額仍會隨新訊號調整），
+    point_in_time 停在最後一列；新檢查點未超過原檢查點時不更新
+
+    :return: 0 或 1 筆 bt_checkpoints 資料
+    """
+    def _checkpoint_rows(self, stock_id: str, method_name: str, inputs: BacktestInputs, dividends: np.ndarray,
+                         buy_signal: np.ndarray, result: BacktestResult, start: int,
+                         initial: BacktestState) -> List[tuple]:
+        if self.BUDGET_POLICY == 'point_in_time':
+            boundary = len(inputs.dates)
+        else:
+            years = inputs.dates.astype('datetime64[Y]')
+            boundary = int(np.searchsorted(years, years[-1], side='left'))
+        if boundary <= start:
+            return []
+        checkpoint_date = str(np.datetime64(inputs.dates[boundary - 1], 'D'))
+        digest = history_hash(inputs, dividends, buy_signal, boundary)
+        state = result.state_before(boundary, initial)
+        return [CheckpointStore.to_row(stock_id, method_name, checkpoint_date, digest, state)]
+
+    """
+    組出 bt_summaries 的一列；回測期間不足一天時回傳 None
+
+    :param stock_data: 股票數據
+    :param method_name: 策略名稱
+    :param bt_date: 回測日期
+    :param first_date: 第一次買入日期
+    :param result: 回測結果
+    :return: summary 資料
+    """
+    def _summary_row(self, stock_data: pd.DataFrame, method_name: str, bt_date: str, first_date: pd.Timestamp,
+                     result: BacktestResult) -> Optional[list]:
+        # 資產價值：持股量*最後一天收盤價 + 配息
+        last_closed_price = stock_data[self.CLOSED_PRICE_COLUMN].values[-1]
+        asset_value, roi = self.calculate_asset_value_and_ratio(
+            result.position_size, last_closed_price, result.broker_dividend, result.total_investment)
+
+        # 計算 irr
+        last_date = stock_data.iloc[-1]['date']
+        years = (last_date - first_date).days / 365
+        if years <= 0:
+            return None
+
+        irr = round(__class__.calculate_annualized_return(result.total_investment, asset_value, years), 4)
+        return [
+            self._stock_id(stock_data),
+            bt_date,  # 回測日期
+            method_name,  # 函式名稱
+            last_closed_price, # 最後一天收盤價
+            result.position_value,  # 持股成本
+            result.broker_dividend,  # 總配息
+            asset_value,  # 資產價值
+            roi,  # 投報率
+            irr,  # 年化報酬率
+        ]
+
+    """
+    計算單一策略的買入訊號，不修改 stock_data
+
+    :param stock_data: 股票數據
+    :param method_name: 策略名稱
+    :return: 買入訊號 Series（1 / True 表示買入）
+    """
+    def buy_signal(self, stock_data: pd.DataFrame, method_name: str) -> pd.Series:
         if method_name == 'bt_dividend':
-            stock_data['buy_signal'] = (stock_data[self.DIVIDEND_COLUMN] != 0).astype(int)
+            return (stock_data[self.DIVIDEND_COLUMN] != 0).astype(int)
         elif method_name == 'bt_signals':
-            stock_data = self.calculate_macd_and_rsi(stock_data)
-            stock_data['buy_signal'] = stock_data['MACD_signal'] & stock_data['RSI_signal']
+            columns = self._indicator_macd_rsi(stock_data)
+            return columns['MACD_signal'] & columns['RSI_signal']
         elif method_name == 'bt_ma_pullback':
-            stock_data = self.calculate_ma_pullback(stock_data)
-            stock_data['buy_signal'] = stock_data['MA_pullback_signal']
+            return self._indicator_ma_pullback(stock_data)['MA_pullback_signal']
         elif method_name == 'bt_monthly_dca':
-            stock_data = self.calculate_monthly_dca(stock_data)
-            stock_data['buy_signal'] = stock_data['monthly_dca_signal']
+            return self._monthly_dca_signal(stock_data['date'])
+        raise ValueError(f"Unknown method: {method_name}")
 
-        if stock_data[stock_data['buy_signal'] == 1]['buy_signal'].count() == 0: 
-            return None
+    """
+    計算多個策略的買入訊號矩陣（列：交易日，欄：策略）
+
+    :param stock_data: 股票數據
+    :param methods: 策略名稱清單
+    :return: 訊號矩陣
+    """
+    def signal_matrix(self, stock_data: pd.DataFrame, methods: List[str]) -> pd.DataFrame:
+        return pd.DataFrame({method: self.buy_signal(stock_data, method) for method in methods})
+
+    """
+    逐列迴圈回測引擎（原始實作，作為向量化引擎的對照基準）
+
+    :param stock_data: 已含 buy_signal 的股票數據
+    :param method_name: 策略名稱
+    :param dividend_index: 配息事件索引
+    :param allocator: 年度預算分配器
+    :return: (交易紀錄, 持股量, 持股單價, 持股成本, 總配息, 總投資金額)
+    """
+    def _bt_loop(self, stock_data: pd.DataFrame, method_name: str, dividend_index: DividendIndex,
+                 allocator: BudgetAllocator) -> Tuple[List[list], float, float, float, float, float]:
+        # 初始化參數
+        position_size = self.POSITION_SIZE
+        position_value = self.POSITION_VALUE
+        position_price = self.POSITION_PRICE
+        broker_dividend = self.BROKER_DIVIDEND
+        current_year = self.START_YEAR
+        year_trades = 0
 
         data = []
         total_investment = 0
@@ -107,29 +385,24 @@ class BaseStrategy(ABC):
             # 檢查當前年份是否與數據中的年份不同。如果不同,則更新 `current_year` 變數。
             if int(current_year) != int(row['date'].year):
                 current_year = row['date'].year
+                year_trades = 0
 
             # 接下來,它檢查當前數據行的買入信號 `buy_signal` 是否為1,表示需要進行買入操作。
             if row['buy_signal'] == 1:
                 # 如果需要買入,並且目前持有股票(即 `position_size` 大於0),則檢查上次買入後是否有配息:
                 if position_size > 0:
-                    # 如果 `last_div_date` 為 None,則找當前日期之前所有的配息數據。
-                    if last_div_date == None:
-                        div_data = stock_data.loc[(stock_data[self.DIVIDEND_COLUMN] > 0) & (stock_data['date'] < row['date']), 
-                                                  ['date',self.DIVIDEND_COLUMN]]
-                    # 如果 `last_div_date` 不為 None,則找上次配息日期和當前日期之間的配息數據。
-                    else:
-                        div_data = stock_data.loc[(stock_data[self.DIVIDEND_COLUMN] > 0) & (stock_data['date'] < row['date']) & (stock_data['date'] > last_div_date), 
-                                                  ['date',self.DIVIDEND_COLUMN]]
-
-                    # 如果找到配息數據,則根據持股量計算配息金額,並更新 `broker_dividend` 和 `last_div_date`。    
-                    if not div_data.empty:
-                        broker_dividend += round(position_size * div_data[self.DIVIDEND_COLUMN].values[-1], 2)
-                        last_div_date = div_data['date'].values[-1]  # 更新上次配息日期
+                    # 以配息索引二分搜尋「上次配息日之後、當前日期之前」的最後一筆配息（last_div_date 為 None 時不限起日）。
+                    div_idx = dividend_index.last_before(row['date'], after=last_div_date)
+
+                    # 如果找到配息數據,則根據持股量計算配息金額,並更新 `broker_dividend` 和 `last_div_date`。
+                    if div_idx >= 0:
+                        broker_dividend += round(position_size * dividend_index.amounts[div_idx], 2)
+                        last_div_date = dividend_index.dates[div_idx]  # 更新上次配息日期
 
                 # 定期定額：依照 per_trade_cash 每次交易金額  與 close 收盤價
-                # 計算當前年份的買入次數 `buy_times` ,並計算每次交易的金額 `per_trade_cash` 和股數 `per_trade_amount`
-                buy_times = stock_data.loc[(stock_data['date'].dt.year == current_year) & (stock_data['buy_signal'] == 1)].shape[0]
-                per_trade_cash = year_avl_cash / buy_times
+                # 由預算分配器取得當年第 `year_trades` 次交易的金額 `per_trade_cash` ,並計算股數 `per_trade_amount`
+                per_trade_cash = allocator.per_trade_cash(current_year, year_trades)
+                year_trades += 1
                 per_trade_amount = round(per_trade_cash / row[self.CLOSED_PRICE_COLUMN], 0)
 
                 # 更新持股單價 `position_price`, 公式: (持股價 * 持股量 + 收盤價 * 本次交易量) / (持股量 + 本次交易量)。
@@ -167,35 +440,7 @@ class BaseStrategy(ABC):
             else:
                 per_trade_amount = 0
 
-
-        # 更新交易資料
-        self.update_transaction_logs(data)
-
-        # 資產價值：持股量*最後一天收盤價 + 配息
-        last_closed_price = stock_data[self.CLOSED_PRICE_COLUMN].values[-1]
-        asset_value, roi = self.calculate_asset_value_and_ratio(position_size, last_closed_price, broker_dividend, total_investment)
-
-        # 計算 irr
-        first_date = stock_data[stock_data['buy_signal'] == 1].iloc[0]['date']
-        last_date = stock_data.iloc[-1]['date']
-        years = (last_date - first_date).days / 365
-
-        if years > 0:
-            irr = round(__class__.calculate_annualized_return(total_investment, asset_value, years), 4)
-
-            # 更新交易策略 summary 資料
-            summary = [
-                stock_data['stock_id'].iloc[0],
-                bt_date,  # 回測日期
-                method_name,  # 函式名稱
-                last_closed_price, # 最後一天收盤價
-                position_value,  # 持股成本
-                broker_dividend,  # 總配息
-                asset_value,  # 資產價值
-                roi,  # 投報率
-                irr,  # 年化報酬率
-            ]
-            self.update_bt_summary(summary)
+        return data, position_size, position_price, position_value, broker_dividend, total_investment
 
     """
     計算資產淨值 asset_value，與投資報酬率 roi
@@ -228,16 +473,16 @@ class BaseStrategy(ABC):
         :param window: 均線天數，預設 120
         :return: 包含 MA_pullback_signal 的股票數據
         """
-        ma = stock_data[self.CLOSED_PRICE_COLUMN].rolling(window=window).mean()
-        price = stock_data[self.CLOSED_PRICE_COLUMN]
+        return stock_data.assign(**self._ma_pullback_columns(stock_data[self.CLOSED_PRICE_COLUMN], window))
+
+    @staticmethod
+    def _ma_pullback_columns(price: pd.Series, window: int = 120, ma: Optional[pd.Series] = None) -> Dict[str, pd.Series]:
+        if ma is None:
+            ma = price.rolling(window=window).mean()
         below_ma = price < ma                          # 當日收盤在均線下方
         prev_below_ma = below_ma.shift(1, fill_value=False)  # 前一日在均線下方
         crossed_above = (price >= ma) & prev_below_ma  # 今日穿回均線上方
-
-        return stock_data.assign(
-            MA=ma,
-            MA_pullback_signal=crossed_above,
-        )
+        return {'MA': ma, 'MA_pullback_signal': crossed_above}
 
     def calculate_monthly_dca(self, stock_data: pd.DataFrame) -> pd.DataFrame:
         """
@@ -246,27 +491,72 @@ class BaseStrategy(ABC):
         :param stock_data: 股票數據
         :return: 包含 monthly_dca_signal 的股票數據
         """
-        first_trading_day = stock_data.groupby(
-            stock_data['date'].dt.to_period('M')
-        )['date'].transform('min')
-        signal = stock_data['date'] == first_trading_day
-        return stock_data.assign(monthly_dca_signal=signal)
+        return stock_data.assign(monthly_dca_signal=self._monthly_dca_signal(stock_data['date']))
+
+    @staticmethod
+    def _monthly_dca_signal(dates: pd.Series) -> pd.Series:
+        first_trading_day = dates.groupby(dates.dt.to_period('M')).transform('min')
+        return dates == first_trading_day
 
     def calculate_macd_and_rsi(self, stock_data: pd.DataFrame) -> pd.DataFrame:
-        stock_data['MACD'] = stock_data[self.CLOSED_PRICE_COLUMN].ewm(span=12, adjust=False).mean() - stock_data[self.CLOSED_PRICE_COLUMN].ewm(span=26, adjust=False).mean()
-        stock_data['Signal'] = stock_data['MACD'].ewm(span=9, adjust=False).mean()
-        stock_data['MACD_diff'] = stock_data['MACD'] - stock_data['Signal']
-        stock_data['MACD_diff_prev'] = stock_data['MACD_diff'].shift(1)
-        stock_data['MACD_signal'] = (stock_data['MACD_diff'] > 0) & (stock_data['MACD_diff_prev'] <= 0)
-        delta = stock_data[self.CLOSED_PRICE_COLUMN].diff()
+        return stock_data.assign(**self._macd_rsi_columns(stock_data[self.CLOSED_PRICE_COLUMN]))
+
+    @staticmethod
+    def _macd_rsi_columns(price: pd.Series) -> Dict[str, pd.Series]:
+        macd = price.ewm(span=12, adjust=False).mean() - price.ewm(span=26, adjust=False).mean()
+        signal = macd.ewm(span=9, adjust=False).mean()
+        delta = price.diff()
         gain = delta.where(delta > 0, 0)
         loss = -delta.where(delta < 0, 0)
         avg_gain = gain.rolling(window=14).mean()
         avg_loss = loss.rolling(window=14).mean()
         rs = avg_gain / avg_loss
-        stock_data['RSI'] = 100 - (100 / (1 + rs))
-        stock_data['RSI_signal'] = stock_data['RSI'] <= 50
-        return stock_data
+        rsi = 100 - (100 / (1 + rs))
+        return __class__._macd_rsi_signals(macd, signal, rsi)
+
+    @staticmethod
+    def _macd_rsi_signals(macd: pd.Series, signal: pd.Series, rsi: pd.Series) -> Dict[str, pd.Series]:
+        macd_diff = macd - signal
+        macd_diff_prev = macd_diff.shift(1)
+        return {
+            'MACD': macd,
+            'Signal': signal,
+            'MACD_diff': macd_diff,
+            'MACD_diff_prev': macd_diff_prev,
+            'MACD_signal': (macd_diff > 0) & (macd_diff_prev <= 0),
+            'RSI': rsi,
+            'RSI_signal': rsi <= 50,
+        }
+
+    """
+    取得 MACD / RSI 欄位；設定 indicator_store 時只增量計算新列
+
+    :param stock_data: 股票數據
+    :return: MACD / RSI 相關欄位
+    """
+    def _indicator_macd_rsi(self, stock_data: pd.DataFrame) -> Dict[str, pd.Series]:
+        price = stock_data[self.CLOSED_PRICE_COLUMN]
+        if self.indicator_store is None:
+            return self._macd_rsi_columns(price)
+        base = self.indicator_store.macd_rsi(self._stock_id(stock_data), price)
+        return self._macd_rsi_signals(base['MACD'], base['Signal'], base['RSI'])
+
+    """
+    取得均線回檔欄位；設定 indicator_store 時只增量計算新列
+
+    :param stock_data: 股票數據
+    :return: MA / MA_pullback_signal 欄位
+    """
+    def _indicator_ma_pullback(self, stock_data: pd.DataFrame) -> Dict[str, pd.Series]:
+        price = stock_data[self.CLOSED_PRICE_COLUMN]
+        if self.indicator_store is None:
+            return self._ma_pullback_columns(price)
+        ma = self.indicator_store.moving_average(self._stock_id(stock_data), price)
+        return self._ma_pullback_columns(price, ma=ma)
+
+    @staticmethod
+    def _stock_id(stock_data: pd.DataFrame) -> str:
+        return str(stock_data['stock_id'].dropna().iloc[0])
     
     """
     紀錄回測的交易紀錄
@@ -274,16 +564,7 @@ class BaseStrategy(ABC):
     :param data: 交易紀錄數據
     """
     def update_transaction_logs(self, data: List[Tuple]) -> None:
-        with sqlite3.connect(self.DB_PATH) as conn:
-            try:
-                cur = conn.cursor()
-                cur.executemany(f"INSERT INTO {self.TRANSACTION_LOGS_TABLE} \
-                    (stock_id, date, method, position_size, position_price, position_value, date_closed_price, broker_dividend, asset_value) \
-                    VALUES \
-                    (?, ?, ?, ?, ?, ?, ?, ?, ?)", data)
-                conn.commit()
-            except sqlite3.Error as e:
-                print(f"Error inserting transaction logs: {e}")
+        self.write_batch(BacktestBatch(logs=list(data)))
 
     """
     紀錄回測 summary
@@ -291,27 +572,25 @@ class BaseStrategy(ABC):
     :param data: 回測摘要數據
     """
     def update_bt_summary(self, data: List[Tuple]) -> None:
-        with sqlite3.connect(self.DB_PATH) as conn:
-            try:
-                cur = conn.cursor()            
-                cur.execute(f"INSERT INTO {self.BT_SUMMARIES_TABLE} \
-                    (stock_id, date, method, close, position_value, broker_dividend, asset_value, roi, irr) \
-                    VALUES \
-                    (?, ?, ?, ?, ?, ?, ?, ?, ?)", data)
-                conn.commit()
-            except sqlite3.Error as e:
-                print(f"Error inserting backtest summary: {e}")
+        self.write_batch(BacktestBatch(summaries=[data]))
+
+    @property
+    def checkpoint_store(self) -> CheckpointStore:
+        return CheckpointStore(self.DB_PATH)
 
     """
-    清除資料表
+    清除資料表（含回測檢查點，下次增量回測會整段重建）
     """
     def clear_tables(self) -> None:
-        with sqlite3.connect(self.DB_PATH) as conn:
+        with db_schema.connect(self.DB_PATH) as conn:
             try:
                 cur = conn.cursor()
                 cur.execute("BEGIN TRANSACTION")
                 cur.execute(f"DELETE FROM {self.BT_SUMMARIES_TABLE}")
                 cur.execute(f"DELETE FROM {self.TRANSACTION_LOGS_TABLE}")
+                cur.execute(f"DELETE FROM {db_schema.LATEST_TABLE}")
+                self.checkpoint_store.ensure_table(cur)
+                cur.execute(f"DELETE FROM {CheckpointStore.TABLE}")
                 cur.execute("COMMIT")
             except sqlite3.Error as e:
                 print(f"Error clearing tables: {e}")
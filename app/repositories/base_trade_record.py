@@ -1,74 +1,170 @@
 from abc import ABC, abstractmethod
+import numpy as np
 import pandas as pd
-import os
 import time
-import requests
-import json
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 from datetime import date
 from datetime import datetime
 from datetime import timedelta
 from FinMind.data import DataLoader
+from app.repositories.freshness_manifest import FreshnessManifest, covered_session
+from app.repositories.price_cache import ColumnarCache
+from app.repositories.split_audit import audit_splits, max_jump, price_panel
+from app.repositories.split_table import AdjustmentFactors, SplitTable
+from app.repositories.tail_fetch import refresh_tail, tail_start
+from app.repositories.trading_calendar import TW_CALENDAR, US_CALENDAR, TradingCalendar
+from app.services.tiingo import TiingoClient
 
 class BaseTradeRecord(ABC):
     SPLIT_RATIO_THRESHOLD = 1.9
     SPLIT_DETECTION_COLUMN = 'close'
 
-    def getTradeRecords(self, stock_id, start_date):
-        filename = Path(self.get_filename(stock_id))
+    # 欄式快取目錄（子類別設定）；get_filename 為舊 CSV 路徑，僅供一次性轉換
+    CACHE_ROOT: Path
 
-        if not os.path.exists(filename):
-            df = self.fetchTradeData(stock_id, start_date)
-            df.to_csv(filename, encoding='utf_8_sig', index=False)
+    # 市場交易日曆（子類別設定）；沒有新的交易日完成時不擷取
+    CALENDAR: TradingCalendar
 
-        elif self.is_file_older_than_1_day(filename):
-            cached_df = pd.read_csv(filename, dtype={'stock_id': str})
-            cached_df = cached_df.assign(date=pd.to_datetime(cached_df['date']))
+    # 快取過期時自最後一根 K 棒往前 OVERLAP_DAYS 天擷取，重疊區間以 RESTATEMENT_COLUMNS 比對回溯修正
+    OVERLAP_DAYS = 7
+    RESTATEMENT_COLUMNS = ['close']
 
-            if self._detect_split(cached_df, self.SPLIT_DETECTION_COLUMN):
-                # 快取已含分割前後混合資料，重新擷取完整調整股價
-                print(f'[WARNING] {stock_id}: 偵測到股票分割（快取），重新擷取調整股價')
-                df = self.fetchTradeData(stock_id, start_date)
-            else:
-                new_df = self.fetchTradeData(stock_id, start_date)
-                merged = pd.concat([cached_df, new_df], axis=0)
-                merged = merged.assign(date=pd.to_datetime(merged['date']))
-                merged = merged.sort_values(by='date')
-                merged = merged.drop_duplicates(subset=['date'], keep='last')
+    def getTradeRecords(self, stock_id, start_date):
+        cached_df = self._read_cache(stock_id)
 
-                if self._detect_split(merged, self.SPLIT_DETECTION_COLUMN):
-                    # 合併後才出現分割跡象，重新擷取完整調整股價
-                    print(f'[WARNING] {stock_id}: 偵測到股票分割（合併後），重新擷取調整股價')
-                    df = self.fetchTradeData(stock_id, start_date)
-                else:
-                    df = merged
+        if cached_df is None:
+            df = self.fetchTradeData(stock_id, start_date)
+            self._write_cache(stock_id, df)
+
+        elif self._cache_is_stale(stock_id):
+            df = self._refresh_records(stock_id, start_date, cached_df)
 
-            df.to_csv(filename, encoding='utf_8_sig', index=False)
+        elif self._split_since_validated(stock_id, cached_df):
+            # 快取污染但尚未過期，仍需重新擷取
+            print(f'[WARNING] {stock_id}: 偵測到股票分割（快取未過期），重新擷取調整股價')
+            df = self.fetchTradeData(stock_id, start_date)
+            self._write_cache(stock_id, df)
 
         else:
-            cached_df = pd.read_csv(filename, dtype={'stock_id': str})
-            cached_df = cached_df.assign(date=pd.to_datetime(cached_df['date']))
-
-            if self._detect_split(cached_df, self.SPLIT_DETECTION_COLUMN):
-                # 快取污染但檔案尚未過期，仍需重新擷取
-                print(f'[WARNING] {stock_id}: 偵測到股票分割（快取未過期），重新擷取調整股價')
-                df = self.fetchTradeData(stock_id, start_date)
-                df.to_csv(filename, encoding='utf_8_sig', index=False)
-            else:
-                df = cached_df
+            df = cached_df
+            self._mark_split_validated(stock_id, df)
 
         df = df.assign(date=pd.to_datetime(df['date']))
         df = df.set_index('date')
         return df
 
+    def _refresh_records(self, stock_id, start_date, cached_df: pd.DataFrame) -> pd.DataFrame:
+        """更新過期快取並寫入；快取或新 K 棒出現分割跳動時改為完整擷取調整股價"""
+        if self._split_since_validated(stock_id, cached_df):
+            # 快取已含分割前後混合資料
+            print(f'[WARNING] {stock_id}: 偵測到股票分割（快取），重新擷取調整股價')
+            df = self.fetchTradeData(stock_id, start_date)
+            self._write_cache(stock_id, df)
+            return df
+
+        df = self._refresh_tail(stock_id, start_date, cached_df)
+        # 先寫入：快取若被整段改寫（回溯修正），已驗證日期隨之清除，下一步改為全量檢查
+        self._write_cache(stock_id, df, cached_df)
+        if self._split_since_validated(stock_id, df):
+            print(f'[WARNING] {stock_id}: 偵測到股票分割（合併後），重新擷取調整股價')
+            df = self.fetchTradeData(stock_id, start_date)
+            self._write_cache(stock_id, df)
+            return df
+
+        self._mark_split_validated(stock_id, df)
+        return df
+
+    def _split_since_validated(self, stock_id, df: pd.DataFrame, signature=None) -> bool:
+        """
+        只檢查快取已驗證日期（邊界 K 棒）之後的分割跳動；未驗證或 signature 不同時全量檢查
+
+        :param signature: 影響檢查結果的其他狀態（例如台股調整因子），與驗證時不同即失效
+        """
+        meta = self.cache.meta(self.cache_key(stock_id))
+        since = meta.get('split_validated') if meta.get('split_signature') == signature else None
+        return self._detect_split(df, self.SPLIT_DETECTION_COLUMN, since)
+
+    def _mark_split_validated(self, stock_id, df: pd.DataFrame, signature=None) -> None:
+        """記錄快取至最後一根 K 棒皆已通過分割檢查"""
+        key = self.cache_key(stock_id)
+        last = pd.Timestamp(df['date'].max()).strftime('%Y-%m-%d')
+        meta = self.cache.meta(key)
+        if meta.get('split_validated') != last or meta.get('split_signature') != signature:
+            self.cache.update_meta(key, split_validated=last, split_signature=signature)
+
+    @property
+    def cache(self) -> ColumnarCache:
+        return ColumnarCache(self.CACHE_ROOT)
+
+    def cache_key(self, stock_id) -> str:
+        return str(stock_id)
+
+    def _read_cache(self, stock_id) -> Optional[pd.DataFrame]:
+        """讀取欄式快取（date 已為 datetime）；尚未建立時由舊 CSV 一次性轉換"""
+        return self.cache.load_or_migrate(self.cache_key(stock_id), Path(self.get_filename(stock_id)),
+                                          dtype={'stock_id': str})
+
+    def _write_cache(self, stock_id, df: pd.DataFrame, previous: Optional[pd.DataFrame] = None) -> None:
+        """
+        寫入欄式快取（既有快取為新資料前段時只追加新列），並記錄已更新至最後完成的交易日；
+        資料源尚未發布該日 K 棒時只記錄至最後一根，下次執行仍視為過期
+        """
+        df = df.assign(date=pd.to_datetime(df['date'])).reset_index(drop=True)
+        self.cache.save(self.cache_key(stock_id), df, previous)
+        last_bar = df['date'].max().date() if len(df) else None
+        self.freshness.mark(self.cache_key(stock_id), covered_session(self.CALENDAR, last_bar))
+
+    @property
+    def freshness(self) -> FreshnessManifest:
+        return FreshnessManifest.shared(self.cache.root / 'freshness.json')
+
+    def _refresh_tail(self, stock_id, start_date, cached_df: pd.DataFrame) -> pd.DataFrame:
+        """只擷取快取最後一根 K 棒之後（含重疊區間）的資料；重疊區間不一致時完整擷取"""
+        return refresh_tail(cached_df, lambda start: self.fetchTradeData(stock_id, start), start_date,
+                            self.OVERLAP_DAYS, self.RESTATEMENT_COLUMNS, stock_id)
+
+    def tail_start(self, stock_id, start_date) -> str:
+        """增量擷取的起始日；快取不存在時為 start_date"""
+        last = self.cache.last(self.cache_key(stock_id))
+        return start_date if last is None else tail_start(last, start_date, self.OVERLAP_DAYS)
+
+    def _cache_is_stale(self, stock_id) -> bool:
+        """快取未記錄於新鮮度清單，或記錄之後已有新的交易日完成"""
+        return self.freshness.is_stale(self.cache_key(stock_id), self.CALENDAR)
+
     @staticmethod
-    def _detect_split(df: pd.DataFrame, price_column: str) -> bool:
-        """相鄰交易日價格比值超過閾值，視為股票分割/反分割事件"""
-        sorted_price = df.sort_values('date')[price_column]
-        ratios = sorted_price / sorted_price.shift(1)
-        reverse_ratios = sorted_price.shift(1) / sorted_price
-        max_ratio = max(ratios.max(), reverse_ratios.max())
-        return max_ratio > BaseTradeRecord.SPLIT_RATIO_THRESHOLD
+    def _detect_split(df: pd.DataFrame, price_column: str, since: Optional[str] = None) -> bool:
+        """
+        相鄰交易日價格比值超過閾值，視為股票分割/反分割事件
+
+        :param since: 已驗證日期；指定時只檢查該日（邊界 K 棒）之後的相鄰比值
+        """
+        dates = pd.to_datetime(df['date'])
+        if not dates.is_monotonic_increasing:
+            df = df.assign(date=dates).sort_values('date', kind='stable')
+            dates = df['date']
+        start = 0
+        if since is not None:
+            start = max(int(np.searchsorted(dates.to_numpy(), np.datetime64(since), side='right')) - 1, 0)
+        return bool(max_jump(df[price_column].to_numpy()[start:]) > BaseTradeRecord.SPLIT_RATIO_THRESHOLD)
+
+    def audit_splits(self, stock_ids: List[str]) -> pd.DataFrame:
+        """
+        全量稽核：以快取建立價格面板，一次向量化檢查所有股票（不擷取新資料）
+
+        :param stock_ids: 股票代號
+        :return: 超過閾值的事件（stock_id / date / prev_price / price / ratio）
+        """
+        frames = {stock_id: self._audit_prices(stock_id) for stock_id in stock_ids}
+        frames = {stock_id: df for stock_id, df in frames.items() if df is not None}
+        if not frames:
+            return audit_splits(pd.DataFrame(), self.SPLIT_RATIO_THRESHOLD)
+        return audit_splits(price_panel(frames, self.SPLIT_DETECTION_COLUMN), self.SPLIT_RATIO_THRESHOLD)
+
+    def _audit_prices(self, stock_id) -> Optional[pd.DataFrame]:
+        """稽核使用的價格（快取內容）；快取不存在時回傳 None"""
+        return self.cache.read(self.cache_key(stock_id))
 
     @abstractmethod
     def fetchTradeData(self, stock_id, start_date):
@@ -78,95 +174,149 @@ class BaseTradeRecord(ABC):
     def get_filename(self, stock_id):
         pass
 
-    @staticmethod
-    def is_file_older_than_1_day(file_path):
-        if not os.path.exists(file_path):
-            print(f"檔案 {file_path} 不存在")
-            return False
-
-        file_mtime = os.path.getmtime(file_path)
-        current_time = time.time()
-        time_diff = current_time - file_mtime
-        days_diff = time_diff / (23 * 60 * 60)
-
-        if days_diff > 1:
-            return True
+class TaiwanTradeRecord(BaseTradeRecord):
+    """
+    台股快取保存 FinMind 未調整的原始股價，另以每檔股票的調整因子表（data/tw/{stock_id}_factors.csv）
+    在讀取時做前複權；新的分割事件只更新因子表，不需重新下載完整歷史
+    """
+    ADJUSTMENT_COLUMNS = ['open', 'max', 'min', 'close']
+    RESTATEMENT_COLUMNS = ADJUSTMENT_COLUMNS
+    CALENDAR = TW_CALENDAR
+    DATA_DIR = Path('data/tw')
+
+    # audit_splits 查詢分割資料的起始日期（與 tw_update.py 相同）
+    AUDIT_START_DATE = '2020-01-01'
+
+    def getTradeRecords(self, stock_id, start_date):
+        raw = self._raw_records(stock_id, start_date)
+        factors = self.adjustment_factors(stock_id, start_date)
+        df = factors.apply(raw.assign(date=pd.to_datetime(raw['date'])), self.ADJUSTMENT_COLUMNS)
+        # 調整因子改變時前複權價格隨之改變，已驗證日期失效
+        signature = factors.factors.tolist()
+        if self._split_since_validated(stock_id, df, signature):
+            # 分割資料尚未收錄的事件，前複權後仍有價格跳動
+            print(f'[WARNING] {stock_id}: 調整後仍偵測到疑似股票分割，請確認分割資料')
         else:
-            return False
+            self._mark_split_validated(stock_id, df, signature)
+        return df.set_index('date')
+
+    def _raw_records(self, stock_id, start_date) -> pd.DataFrame:
+        """讀取原始股價快取；快取不存在時完整擷取，過期時只擷取尾段並與快取合併"""
+        cached_df = self._read_cache(stock_id)
+        if cached_df is not None and not self._cache_is_stale(stock_id):
+            return cached_df
+
+        if cached_df is None:
+            df = self.fetchTradeData(stock_id, start_date)
+        else:
+            df = self._refresh_tail(stock_id, start_date, cached_df)
+        self._write_cache(stock_id, df, cached_df)
+        return df
 
-class TaiwanTradeRecord(BaseTradeRecord):
     def fetchTradeData(self, stock_id, start_date):
+        """擷取未調整的原始日線"""
         api = DataLoader()
         df = api.taiwan_stock_daily(
             stock_id=stock_id,
             start_date=start_date,
         )
         time.sleep(2)
-
-        df = TaiwanTradeRecord._apply_split_adjustments(df, stock_id, start_date)
         return df
 
     @staticmethod
     def _apply_split_adjustments(df: pd.DataFrame, stock_id: str, start_date: str) -> pd.DataFrame:
         """
-        依據 FinMind 的分割資料，對歷史股價做前複權調整。
-        對每個分割事件，將該日期之前的所有 OHLC 乘以 (after_price / before_price)。
+        依據 FinMind 的分割資料，對原始股價做前複權調整。
+        分割日之前的 OHLC 乘以該事件及之後所有事件 (after_price / before_price) 的乘積，
+        以 searchsorted 一次計算每列的累積因子。
         """
-        try:
-            api = DataLoader()
-            splits_df = api.taiwan_stock_split_price(start_date=start_date)
-            time.sleep(1)
-        except Exception as e:
-            print(f'[WARNING] {stock_id}: 無法取得分割資料，略過調整: {e}')
+        factors = TaiwanTradeRecord.adjustment_factors(stock_id, start_date)
+        if not len(factors):
             return df
+        return factors.apply(df.assign(date=pd.to_datetime(df['date'])), TaiwanTradeRecord.ADJUSTMENT_COLUMNS)
 
-        stock_splits = splits_df[splits_df['stock_id'] == stock_id].copy()
-        if stock_splits.empty:
-            return df
+    @staticmethod
+    def adjustment_factors(stock_id: str, start_date: str) -> AdjustmentFactors:
+        """
+        取得調整因子表；分割資料有新事件時更新 data/tw/{stock_id}_factors.csv，
+        分割資料無法取得時沿用既有檔案
+        """
+        path = TaiwanTradeRecord.DATA_DIR / f'{stock_id}_factors.csv'
+        stored = AdjustmentFactors.load(path)
+        table = SplitTable.shared(start_date)
+        splits = table.for_stock(stock_id)
+        if not table.available:
+            return stored or AdjustmentFactors.from_splits(splits)
 
-        stock_splits = stock_splits.assign(date=pd.to_datetime(stock_splits['date']))
-        stock_splits = stock_splits.sort_values('date')
+        factors = AdjustmentFactors.from_splits(splits)
+        if factors != stored and (len(factors) or stored is not None):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            factors.save(path)
+            for split_date, factor in zip(pd.DatetimeIndex(factors.dates).date, factors.factors):
+                print(f'[INFO] {stock_id}: 更新分割調整因子 {split_date} factor={factor:.4f}')
+        return factors
 
-        price_cols = [c for c in ['open', 'max', 'min', 'close'] if c in df.columns]
-        result = df.copy()
-        result = result.assign(date=pd.to_datetime(result['date']))
+    @property
+    def cache(self) -> ColumnarCache:
+        return ColumnarCache(self.DATA_DIR / 'cache')
 
-        for _, split_row in stock_splits.iterrows():
-            split_date = split_row['date']
-            factor = split_row['after_price'] / split_row['before_price']
-            mask = result['date'] < split_date
-            result = result.assign(**{
-                col: result[col].where(~mask, result[col] * factor)
-                for col in price_cols
-            })
-            print(f'[INFO] {stock_id}: 套用分割調整 {split_date.date()} factor={factor:.4f}')
+    def cache_key(self, stock_id) -> str:
+        return f'{stock_id}_raw'
 
-        return result
+    def _audit_prices(self, stock_id) -> Optional[pd.DataFrame]:
+        """稽核前複權後的價格（原始快取本身即含分割跳動）"""
+        raw = self.cache.read(self.cache_key(stock_id))
+        return None if raw is None else self._apply_split_adjustments(raw, stock_id, self.AUDIT_START_DATE)
 
     def get_filename(self, stock_id):
-        return f'data/tw/{stock_id}.csv'
+        return self.DATA_DIR / f'{stock_id}_raw.csv'
 
 class USTradeRecord(BaseTradeRecord):
     SPLIT_DETECTION_COLUMN = 'adjClose'
+    # 配息或分割後 Tiingo 會重算整段 adjClose，重疊區間不一致即完整擷取
+    RESTATEMENT_COLUMNS = ['close', 'adjClose']
+    CACHE_ROOT = Path('data/us/cache')
+    CALENDAR = US_CALENDAR
 
-    def fetchTradeData(self, stock_id, start_date):
-        with open('app/configs/tiingo.json') as f:
-            cred = json.load(f)
-            token = cred['token']
+    # Tiingo 客戶端（憑證只讀取一次）與本次執行 prefetch() 預先並行取得、尚未使用的日線；
+    # 請求時間保存於快取目錄，連續執行共用每小時配額
+    _client: Optional[TiingoClient] = None
+    _prefetched: Dict[Tuple[str, str], pd.DataFrame] = {}
 
-        url = "https://api.tiingo.com/tiingo/daily/" + stock_id + "/prices"
-        params = {
-            'startDate': start_date,
-            'token': token
-        }
-        r = requests.get(url, params=params)
-        df = pd.DataFrame(r.json())
+    @classmethod
+    def client(cls) -> TiingoClient:
+        if cls._client is None:
+            cls._client = TiingoClient.from_config(state_path=cls.CACHE_ROOT / 'tiingo_requests.json')
+        return cls._client
 
-        # 將 'date' 欄位轉換為指定的日期格式
-        df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+    @classmethod
+    def prefetch(cls, stock_ids: List[str], start_date: str) -> None:
+        """
+        以非同步客戶端並行取得多檔股票日線，之後 fetchTradeData 各使用一次；
+        快取未過期（getTradeRecords 不會擷取）的股票略過，已有快取的股票只取尾段。
+        每次呼叫取代上一次的預取結果；單檔失敗不影響其他股票，該檔改由 fetchTradeData 逐檔擷取
 
-        time.sleep(2)
-        return df
+        :param stock_ids: 股票代號
+        :param start_date: 起始日期
+        """
+        record = cls()
+        starts = {stock_id: record.tail_start(stock_id, start_date)
+                  for stock_id in stock_ids if record._cache_is_stale(stock_id)}
+        cls._prefetched = {}
+        if not starts:
+            return
+        for stock_id, df in cls.client().fetch_since(starts, return_exceptions=True).items():
+            if isinstance(df, BaseException):
+                print(f'[WARNING] {stock_id}: 預先擷取失敗，改為逐檔擷取: {df}')
+            else:
+                cls._prefetched[(stock_id, starts[stock_id])] = df
+
+    def fetchTradeData(self, stock_id, start_date):
+        # 取出後即移除：同一執行中再次擷取（例如偵測到分割後完整重抓）須取得最新資料
+        df = self._prefetched.pop((stock_id, start_date), None)
+        if df is None:
+            df = self.client().fetch_since({stock_id: start_date})[stock_id]
+        return df.copy()
 
     def get_filename(self, stock_id):
         return f'data/us/{stock_id}.csv'
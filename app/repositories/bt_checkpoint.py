@@ -0,0 +1,113 @@
+"""
+回測檢查點
+
+每日執行只會新增最新一根 K 棒，不需清空資料表重播全部歷史。
+bt_checkpoints 資料表以 (stock_id, method) 保存「已定案」的最後一列與當時的策略狀態
+（持股量、持股單價、總配息、總投資金額、上次配息日、當年度預算使用次數），
+下次執行只處理檢查點之後的列，並刪除、重寫檢查點之後的交易紀錄。
+
+- full_year 預算政策會依當年全部訊號次數回頭調整當年每筆金額，因此只有「最後一年之前」的列已定案，
+  檢查點停在最後一年的前一個交易日
+- point_in_time 不前視，檢查點停在最後一列
+- 檢查點同時保存歷史雜湊（日期、價格、配息、買入訊號）；上游歷史被改寫時雜湊不符，該組合整段重建
+
+技術指標的增量狀態由 IndicatorStore 另外保存，不重複存於檢查點。
+"""
+import hashlib
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.repositories.bt_engine import BacktestInputs, BacktestState
+
+
+# 已寫入的交易紀錄格式改變時遞增，使所有檢查點失效、整段重建一次
+# 2：配息列的交易紀錄改為歸屬於該股票（先前 stock_id 為 NULL）
+HASH_VERSION = 2
+
+
+def history_hash(inputs: BacktestInputs, dividends: np.ndarray, buy_signal: np.ndarray, end: int) -> str:
+    """前 end 列的日期、價格、配息與買入訊號雜湊（含 HASH_VERSION）"""
+    h = hashlib.blake2b(str(HASH_VERSION).encode('utf-8'), digest_size=16)
+    h.update(np.ascontiguousarray(inputs.dates[:end]).view('int64').tobytes())
+    h.update(np.ascontiguousarray(inputs.closes[:end]).tobytes())
+    h.update(np.ascontiguousarray(dividends[:end], dtype=float).tobytes())
+    h.update(np.ascontiguousarray(np.asarray(buy_signal[:end]) == 1).tobytes())
+    return h.hexdigest()
+
+
+def _to_date(value: Optional[np.datetime64]) -> Optional[str]:
+    return None if value is None else str(np.datetime64(value, 'D'))
+
+
+def _from_date(value: Optional[str]) -> Optional[np.datetime64]:
+    return None if value is None else np.datetime64(value, 'ns')
+
+
+def _from_real(value: Optional[float]) -> float:
+    """SQLite 將 NaN 存為 NULL；還原為 NaN（非交易日的配息列 close 為 NaN，在該列買入後持股即為 NaN）"""
+    return float('nan') if value is None else value
+
+
+class CheckpointStore:
+    TABLE = 'bt_checkpoints'
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+
+    def ensure_table(self, cur: sqlite3.Cursor) -> None:
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {self.TABLE} ( \
+            stock_id TEXT NOT NULL, method TEXT NOT NULL, checkpoint_date TEXT NOT NULL, history_hash TEXT NOT NULL, \
+            position_size REAL, position_price REAL, position_value REAL, broker_dividend REAL, \
+            total_investment REAL, last_div_date TEXT, budget_year INTEGER, year_trades INTEGER, \
+            first_buy_date TEXT, PRIMARY KEY (stock_id, method))")
+
+    def load(self, stock_id: str) -> Dict[str, Tuple[str, str, BacktestState]]:
+        """
+        讀取單一股票所有策略的檢查點
+
+        :return: {method: (checkpoint_date, history_hash, 狀態)}
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            cur = conn.cursor()
+            self.ensure_table(cur)
+            cur.execute(f"SELECT method, checkpoint_date, history_hash, position_size, position_price, \
+                position_value, broker_dividend, total_investment, last_div_date, budget_year, year_trades, \
+                first_buy_date FROM {self.TABLE} WHERE stock_id = ?", (stock_id,))
+            rows = cur.fetchall()
+
+        checkpoints = {}
+        for (method, checkpoint_date, digest, position_size, position_price, position_value, broker_dividend,
+             total_investment, last_div_date, budget_year, year_trades, first_buy_date) in rows:
+            broker_dividend = _from_real(broker_dividend)
+            state = BacktestState(
+                position_size=_from_real(position_size),
+                position_price=_from_real(position_price),
+                position_value=_from_real(position_value),
+                # 已入帳過配息時，迴圈版的總配息為 numpy.float64（影響資產價值的四捨五入方式）
+                broker_dividend=np.float64(broker_dividend) if last_div_date is not None else broker_dividend,
+                total_investment=_from_real(total_investment),
+                last_div_date=_from_date(last_div_date),
+                budget_year=budget_year,
+                year_trades=year_trades,
+                first_buy_date=_from_date(first_buy_date),
+            )
+            checkpoints[method] = (checkpoint_date, digest, state)
+        return checkpoints
+
+    @staticmethod
+    def to_row(stock_id: str, method: str, checkpoint_date: str, digest: str, state: BacktestState) -> tuple:
+        return (stock_id, method, checkpoint_date, digest, state.position_size, state.position_price,
+                state.position_value, float(state.broker_dividend), state.total_investment,
+                _to_date(state.last_div_date), state.budget_year, state.year_trades, _to_date(state.first_buy_date))
+
+    def save(self, cur: sqlite3.Cursor, rows: List[tuple]) -> None:
+        cur.executemany(f"INSERT OR REPLACE INTO {self.TABLE} \
+            (stock_id, method, checkpoint_date, history_hash, position_size, position_price, position_value, \
+            broker_dividend, total_investment, last_div_date, budget_year, year_trades, first_buy_date) \
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def delete(self, cur: sqlite3.Cursor, stock_id: str, method: str) -> None:
+        cur.execute(f"DELETE FROM {self.TABLE} WHERE stock_id = ? AND method = ?", (stock_id, method))
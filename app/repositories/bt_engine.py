@@ -0,0 +1,216 @@
+"""
+向量化回測引擎
+
+以 NumPy 陣列運算取代 `BaseStrategy._bt_loop` 的 iterrows 逐列迴圈：
+買入股數、持股量以買入遮罩上的累加（cumsum）一次算出，配息則透過 DividendIndex 二分搜尋。
+
+持股單價 `position_price` 每筆交易都會四捨五入到小數 2 位，結果與路徑相依，
+無法化為單一累加；因此僅對「買入事件」逐筆遞推（數百筆），不再逐列掃描全部交易日。
+四捨五入的型別（Python float / numpy.float64）刻意與迴圈版一致，確保寫入的數值完全相同。
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.repositories.budget_allocator import BudgetAllocator
+from app.repositories.dividend_index import DividendIndex
+
+
+@dataclass(frozen=True)
+class BacktestInputs:
+    """多個策略共用的價格陣列，每檔股票只從 DataFrame 取出一次"""
+    dates: np.ndarray
+    closes: np.ndarray
+    stock_ids: np.ndarray
+
+    @classmethod
+    def from_frame(cls, stock_data: pd.DataFrame, close_column: str,
+                   stock_id: Optional[str] = None) -> 'BacktestInputs':
+        """
+        :param stock_id: 指定時填入缺少的 stock_id（合併配息後非交易日的配息列），交易紀錄才能歸屬於該股票
+        """
+        stock_ids = stock_data['stock_id']
+        return cls(
+            dates=stock_data['date'].values,
+            closes=stock_data[close_column].to_numpy(dtype=float),
+            stock_ids=(stock_ids if stock_id is None else stock_ids.fillna(stock_id)).values,
+        )
+
+
+@dataclass(frozen=True)
+class BacktestState:
+    """某次買入後的策略狀態，用於檢查點續算"""
+    position_size: float = 0
+    position_price: float = 0
+    position_value: float = 0
+    broker_dividend: float = 0
+    total_investment: float = 0
+    last_div_date: Optional[np.datetime64] = None
+    budget_year: int = 0
+    year_trades: int = 0
+    first_buy_date: Optional[np.datetime64] = None
+
+
+@dataclass(frozen=True)
+class BacktestResult:
+    rows: List[list]
+    position_size: float
+    position_price: float
+    position_value: float
+    broker_dividend: float
+    total_investment: float
+    # 向量化引擎另外提供每次買入的列索引與買入後狀態
+    buy_index: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=int))
+    states: List[BacktestState] = field(default_factory=list)
+
+    def state_before(self, row: int, initial: BacktestState) -> BacktestState:
+        """第 row 列之前最後一次買入後的狀態；之前沒有買入時回傳 initial"""
+        k = int(np.searchsorted(self.buy_index, row, side='left')) - 1
+        return self.states[k] if k >= 0 else initial
+
+
+@dataclass
+class BacktestBatch:
+    """
+    待寫入資料庫的回測結果；平行回測時各工作的結果以 extend 合併，由單一寫入者一次寫入
+
+    resumed 為 [(股票代號, 策略名稱, 保留交易紀錄的最後日期)]，checkpoints 為 bt_checkpoints 資料，
+    retain 為本次執行的所有 (股票代號, 策略名稱)；非空時寫入前刪除其他組合（例如已自 stocks.json 移除的股票）
+    """
+    results: Dict[str, BacktestResult] = field(default_factory=dict)
+    logs: List[list] = field(default_factory=list)
+    summaries: List[list] = field(default_factory=list)
+    resumed: List[tuple] = field(default_factory=list)
+    checkpoints: List[tuple] = field(default_factory=list)
+    retain: List[tuple] = field(default_factory=list)
+
+    def extend(self, other: 'BacktestBatch') -> None:
+        """合併另一批結果的寫入資料（results 以策略名稱為鍵，跨股票時不合併）"""
+        self.logs.extend(other.logs)
+        self.summaries.extend(other.summaries)
+        self.resumed.extend(other.resumed)
+        self.checkpoints.extend(other.checkpoints)
+        self.retain.extend(other.retain)
+
+
+def _year_positions(buy_dates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """回傳每次買入的年份，以及為當年第幾次買入（從 0 起算）"""
+    years = buy_dates.astype('datetime64[Y]').astype(int) + 1970
+    _, first, inverse = np.unique(years, return_index=True, return_inverse=True)
+    return years, np.arange(len(years)) - first[inverse]
+
+
+def _dividend_accrual(dividend_index: DividendIndex, buy_dates: np.ndarray, size_before: np.ndarray,
+                      initial_event: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    計算每次買入前應入帳的配息金額。
+
+    與迴圈版規則相同：買入時若有持股，取「上次入帳配息日之後、本次買入日之前」的最後一筆配息，
+    以買入前持股量計算。上次入帳配息即前一次買入時可見的最後一筆配息，故只需比較兩者的索引。
+
+    :param initial_event: 續算前最後入帳的配息索引，-1 表示沒有
+    :return: (入帳金額, 是否入帳, 每次買入時可見的最後一筆配息索引)
+    """
+    # 每次買入日之前（不含當日）的最後一筆配息索引，-1 表示沒有
+    last_event = dividend_index.last_before_many(buy_dates)
+    has_position = size_before > 0
+    prev_event = np.concatenate(([initial_event], np.where(has_position[:-1], last_event[:-1], -1)))
+
+    accrue = has_position & (last_event >= 0) & (last_event > prev_event)
+    if not len(dividend_index):
+        return np.zeros(len(buy_dates)), accrue, last_event
+    amounts = np.round(size_before * dividend_index.amounts[np.maximum(last_event, 0)], 2)
+    return np.where(accrue, amounts, 0.0), accrue, last_event
+
+
+def _continue_cumsum(initial: float, values: np.ndarray) -> np.ndarray:
+    """自 initial 起逐筆累加（與迴圈版 `x += v` 的浮點順序相同）"""
+    return np.cumsum(np.concatenate(([initial], values)))[1:]
+
+
+def run_vectorized(inputs: BacktestInputs, buy_signal: np.ndarray, method_name: str,
+                   dividend_index: DividendIndex, allocator: BudgetAllocator, start: int = 0,
+                   initial: Optional[BacktestState] = None) -> BacktestResult:
+    """
+    以陣列運算執行單一策略回測。
+
+    :param inputs: 依日期排序的價格陣列
+    :param buy_signal: 買入訊號（1 / True 表示買入），與 inputs 對齊
+    :param method_name: 策略名稱
+    :param dividend_index: 配息事件索引
+    :param allocator: 年度預算分配器
+    :param start: 自第幾列開始回測（檢查點續算時為檢查點之後的第一列）
+    :param initial: 續算的起始狀態，None 表示從零開始
+    :return: BacktestResult，rows 與迴圈版 transaction_logs 完全相同
+    """
+    initial = initial or BacktestState()
+    dates = inputs.dates
+    closes = inputs.closes
+    buy_idx = np.flatnonzero(np.asarray(buy_signal)[start:] == 1) + start
+
+    # 買入股數與持股量（累加）；續算時同年度的買入序號接續檢查點
+    years, nth = _year_positions(dates[buy_idx])
+    nth = nth + np.where(years == initial.budget_year, initial.year_trades, 0)
+    cash = allocator.allocate_many(years, nth)
+    amounts = np.round(cash / closes[buy_idx], 0)
+    sizes = _continue_cumsum(initial.position_size, amounts)
+    sizes_before = np.concatenate(([initial.position_size], sizes[:-1]))
+
+    # 配息累計
+    initial_event = -1
+    if initial.last_div_date is not None:
+        initial_event = dividend_index.last_before(initial.last_div_date + np.timedelta64(1, 'ns'))
+    div_amounts, accrued, last_event = _dividend_accrual(dividend_index, dates[buy_idx], sizes_before, initial_event)
+    dividends_cum = _continue_cumsum(initial.broker_dividend, div_amounts)
+    investment_cum = _continue_cumsum(initial.total_investment, cash)
+
+    stock_ids = inputs.stock_ids[buy_idx]
+    buy_dates = pd.DatetimeIndex(dates[buy_idx]).strftime('%Y-%m-%d')
+
+    # 持股單價具路徑相依的四捨五入，僅對買入事件逐筆遞推
+    rows = []
+    states = []
+    state = initial
+    for k, (size_before, amount, size, close) in enumerate(
+            zip(sizes_before.tolist(), amounts.tolist(), sizes.tolist(), closes[buy_idx].tolist())):
+        broker_dividend = state.broker_dividend
+        last_div_date = state.last_div_date
+        if accrued[k]:
+            broker_dividend = dividends_cum[k]
+            last_div_date = dividend_index.dates[last_event[k]]
+        if size != 0:
+            position_price = round((state.position_price * size_before + close * amount) / size, 2)
+        else:
+            position_price = 0
+        position_size = size
+        position_value = round(position_price * position_size, 2)
+        date_closed_price = round(close, 2)
+        asset_value = round(position_size * date_closed_price + broker_dividend, 2)
+        rows.append([stock_ids[k], buy_dates[k], method_name, position_size, position_price,
+                     position_value, date_closed_price, broker_dividend, asset_value])
+
+        state = BacktestState(
+            position_size=position_size,
+            position_price=position_price,
+            position_value=position_value,
+            broker_dividend=broker_dividend,
+            total_investment=float(investment_cum[k]),
+            last_div_date=last_div_date,
+            budget_year=int(years[k]),
+            year_trades=int(nth[k]) + 1,
+            first_buy_date=state.first_buy_date if state.first_buy_date is not None else dates[buy_idx[k]],
+        )
+        states.append(state)
+
+    return BacktestResult(
+        rows=rows,
+        position_size=state.position_size,
+        position_price=state.position_price,
+        position_value=state.position_value,
+        broker_dividend=state.broker_dividend,
+        total_investment=state.total_investment,
+        buy_index=buy_idx,
+        states=states,
+    )
@@ -0,0 +1,80 @@
+"""
+年度預算分配
+
+回測時每次買入的金額 `per_trade_cash` 由年度預算 `BROKER_YEAR_CASH` 分配而來。
+原本每次買入都以 `date.dt.year == current_year` 重新掃描整個 DataFrame 計算當年買入次數；
+此處改為建立時以 groupby 一次算出每年訊號次數，之後每次查詢皆為 O(1)。
+
+分配政策：
+- full_year：年度預算 / 當年全部訊號次數（原本的行為，會使用到當年之後的訊號，屬於前視）
+- point_in_time：不前視。以前一年的訊號次數作為當年預期次數（無前一年時使用 DEFAULT_EXPECTED_TRADES），
+  每次投入 年度預算 / 預期次數，當年累計投入不超過年度預算
+"""
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+
+class BudgetAllocator:
+    POLICIES = ('full_year', 'point_in_time')
+
+    # point_in_time 在沒有前一年資料時的預期交易次數（每月一次）
+    DEFAULT_EXPECTED_TRADES = 12
+
+    def __init__(self, year_cash: float, year_counts: Dict[int, int], policy: str = 'full_year'):
+        """
+        :param year_cash: 每年可投入金額
+        :param year_counts: 每年買入訊號次數 {year: count}
+        :param policy: 分配政策，見 POLICIES
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown budget policy: {policy}")
+        self.year_cash = year_cash
+        self.year_counts = {int(year): int(count) for year, count in year_counts.items()}
+        self.policy = policy
+
+    @classmethod
+    def from_signals(cls, dates: pd.Series, buy_signal: pd.Series, year_cash: float,
+                     policy: str = 'full_year') -> 'BudgetAllocator':
+        """
+        由日期與買入訊號建立分配器（每年訊號次數只計算一次）。
+
+        :param dates: 交易日期
+        :param buy_signal: 買入訊號（1 / True 表示買入）
+        :param year_cash: 每年可投入金額
+        :param policy: 分配政策
+        """
+        counts = (buy_signal == 1).groupby(dates.dt.year).sum()
+        return cls(year_cash, counts[counts > 0].to_dict(), policy)
+
+    def _expected_trades(self, year: int) -> int:
+        if self.policy == 'full_year':
+            return self.year_counts[year]
+        return self.year_counts.get(year - 1, self.DEFAULT_EXPECTED_TRADES)
+
+    def per_trade_cash(self, year: int, nth: int = 0) -> float:
+        """
+        取得當年第 nth 次（從 0 起算）買入的金額。
+
+        :param year: 買入年份
+        :param nth: 當年第幾次買入，僅 point_in_time 使用
+        """
+        unit = self.year_cash / self._expected_trades(year)
+        if self.policy == 'full_year':
+            return unit
+        return min(unit, max(self.year_cash - nth * unit, 0))
+
+    def allocate_many(self, years: np.ndarray, nth: np.ndarray) -> np.ndarray:
+        """
+        `per_trade_cash` 的向量版本。
+
+        :param years: 每次買入的年份
+        :param nth: 每次買入為當年第幾次（從 0 起算）
+        """
+        unique_years, inverse = np.unique(years, return_inverse=True)
+        expected = np.array([self._expected_trades(int(y)) for y in unique_years], dtype=int)
+        unit = self.year_cash / expected[inverse]
+        if self.policy == 'full_year':
+            return unit
+        return np.minimum(unit, np.maximum(self.year_cash - nth * unit, 0))
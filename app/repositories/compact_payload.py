@@ -0,0 +1,93 @@
+"""
+交易紀錄的欄位式精簡編碼（選用）
+
+原本的 transaction_logs 每列都是 9 個鍵的物件，數值經 format_float 轉為字串，stock_id、method 也與路徑重複。
+columnar 格式（版本 1）以固定列數分頁，每頁一個物件：
+
+    {"n": 列數, "d0": "第一列日期", "date": [與 d0 相差的天數, ...], "position_size": [...], ...}
+
+- 數值為數字，精度與 format_float 相同（小於 1 四捨五入至 4 位小數，其餘 2 位），NaN 為 null
+- 不含 stock_id / method（由路徑決定）
+- 路徑為 {method}/transaction_logs/{stock_id}/{頁碼}；新增交易只改變最後一頁
+- {prefix}/schema 節點記錄目前的格式、版本與每頁列數，前端依此選擇解碼方式
+"""
+import sqlite3
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from app.repositories import sync_payload
+
+RECORDS = 'records'
+COLUMNAR = 'columnar'
+FORMATS = (RECORDS, COLUMNAR)
+VERSION = 1
+PAGE_SIZE = 128
+
+VALUE_COLUMNS = ('position_size', 'position_price', 'position_value', 'date_closed_price', 'broker_dividend',
+                 'asset_value')
+
+
+def schema(log_format: str, page_size: int = PAGE_SIZE) -> dict:
+    """{prefix}/schema 節點內容"""
+    if log_format not in FORMATS:
+        raise ValueError(f"Unknown log format: {log_format}. Use one of {FORMATS}.")
+    transaction_logs = {'format': log_format, 'version': VERSION}
+    if log_format == COLUMNAR:
+        transaction_logs['page_size'] = page_size
+    return {'transaction_logs': transaction_logs}
+
+
+def format_tag(log_format: str, page_size: int = PAGE_SIZE) -> str:
+    """同步帳本的集合標記；格式、版本或每頁列數改變時整個集合重新上傳"""
+    tag = f'{log_format}-v{VERSION}'
+    return f'{tag}-p{page_size}' if log_format == COLUMNAR else tag
+
+
+def _rounded(values: np.ndarray) -> list:
+    """與 format_float 相同的精度（round 與字串格式化同為正確捨入）；NaN 轉為 None（JSON null）"""
+    return [None if v != v else round(v, 4) if v < 1 else round(v, 2) for v in values.tolist()]
+
+
+def _pages(days: np.ndarray, columns: Dict[str, list], start: int, end: int, page_size: int) -> Dict[str, dict]:
+    pages = {}
+    for page, page_start in enumerate(range(start, end, page_size)):
+        page_end = min(page_start + page_size, end)
+        pages[str(page)] = {
+            'n': page_end - page_start,
+            'd0': str(days[page_start]),
+            'date': (days[page_start:page_end] - days[page_start]).astype(int).tolist(),
+            **{column: values[page_start:page_end] for column, values in columns.items()},
+        }
+    return pages
+
+
+def _encode_columns(df: pd.DataFrame):
+    days = pd.to_datetime(df['date']).to_numpy(dtype='datetime64[D]')
+    return days, {column: _rounded(df[column].to_numpy(dtype=float)) for column in VALUE_COLUMNS}
+
+
+def encode_pages(df: pd.DataFrame, page_size: int = PAGE_SIZE) -> Dict[str, dict]:
+    """
+    單一股票、單一策略的交易紀錄（依日期排序）編碼為分頁
+
+    :return: {頁碼: 頁}
+    """
+    days, columns = _encode_columns(df)
+    return _pages(days, columns, 0, len(df), page_size)
+
+
+def method_transaction_pages(conn: sqlite3.Connection, page_size: int = PAGE_SIZE) -> Dict[str, Dict[str, dict]]:
+    """
+    各策略、各股票交易紀錄的分頁（整個市場一次查詢、一次轉換，再依 (stock_id, method) 切片）
+
+    :return: {method: {'{stock_id}/{頁碼}': 頁}}，可直接作為 plan_delta 的集合子節點
+    """
+    df = pd.read_sql_query(sync_payload.LOGS_QUERY, conn)
+    days, columns = _encode_columns(df)
+    payloads: Dict[str, Dict[str, dict]] = {}
+    for (stock_id, method), positions in df.groupby(['stock_id', 'method'], sort=False).indices.items():
+        pages = _pages(days, columns, int(positions[0]), int(positions[-1]) + 1, page_size)
+        payloads.setdefault(method, {}).update({f'{stock_id}/{page}': value for page, value in pages.items()})
+    return payloads
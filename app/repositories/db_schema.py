@@ -0,0 +1,122 @@
+"""
+回測資料庫 schema 管理
+
+transaction_logs / bt_summaries 原本沒有任何索引，讀取端（summary_table、WebDataSync、近期交易通知）
+每次都以 GROUP BY + MAX(date) 重新計算「每組最新一列」或整表掃描日期區間。
+
+- transaction_logs 建立 (stock_id, method, date) 與 (date) 索引，bt_summaries 建立 (stock_id, method, date) 索引
+- latest_bt_summaries 以 (stock_id, method) 為主鍵，寫入 summary 時同步 upsert，讀取端改為索引查詢
+- 以 PRAGMA user_version 記錄 schema 版本；舊資料庫在第一次連線時自動遷移並由 bt_summaries 回填最新 summary
+"""
+import sqlite3
+from pathlib import Path
+from typing import Iterable
+
+SCHEMA_VERSION = 1
+
+LOGS_TABLE = 'transaction_logs'
+SUMMARIES_TABLE = 'bt_summaries'
+LATEST_TABLE = 'latest_bt_summaries'
+
+SUMMARY_COLUMNS = 'stock_id, date, method, close, position_value, broker_dividend, asset_value, roi, irr'
+
+TABLES = (
+    f"CREATE TABLE IF NOT EXISTS {LOGS_TABLE} (stock_id TEXT, date TEXT, method TEXT, position_size REAL, \
+        position_price REAL, position_value REAL, date_closed_price REAL, broker_dividend REAL, asset_value REAL)",
+    f"CREATE TABLE IF NOT EXISTS {SUMMARIES_TABLE} (stock_id TEXT, date TEXT, method TEXT, close REAL, \
+        position_value REAL, broker_dividend REAL, asset_value REAL, roi REAL, irr REAL)",
+    f"CREATE TABLE IF NOT EXISTS {LATEST_TABLE} (stock_id TEXT NOT NULL, date TEXT NOT NULL, \
+        method TEXT NOT NULL, close REAL, position_value REAL, broker_dividend REAL, asset_value REAL, \
+        roi REAL, irr REAL, PRIMARY KEY (stock_id, method))",
+)
+
+INDEXES = (
+    f"CREATE INDEX IF NOT EXISTS idx_{LOGS_TABLE}_stock_method_date ON {LOGS_TABLE} (stock_id, method, date)",
+    f"CREATE INDEX IF NOT EXISTS idx_{LOGS_TABLE}_date ON {LOGS_TABLE} (date)",
+    f"CREATE INDEX IF NOT EXISTS idx_{SUMMARIES_TABLE}_stock_method_date ON {SUMMARIES_TABLE} (stock_id, method, date)",
+)
+
+# 同一 (stock_id, method) 只保留日期最新的一列；同日重寫（增量回測）以新值覆蓋
+_UPSERT_LATEST = f"""
+    INSERT INTO {LATEST_TABLE} ({SUMMARY_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (stock_id, method) DO UPDATE SET
+        date = excluded.date, close = excluded.close, position_value = excluded.position_value,
+        broker_dividend = excluded.broker_dividend, asset_value = excluded.asset_value,
+        roi = excluded.roi, irr = excluded.irr
+    WHERE excluded.date >= {LATEST_TABLE}.date
+"""
+
+_BACKFILL_LATEST = f"""
+    INSERT OR REPLACE INTO {LATEST_TABLE} ({SUMMARY_COLUMNS})
+    SELECT bs.stock_id, bs.date, bs.method, bs.close, bs.position_value,
+           bs.broker_dividend, bs.asset_value, bs.roi, bs.irr
+    FROM {SUMMARIES_TABLE} bs
+    INNER JOIN (
+        SELECT stock_id, method, MAX(date) AS latest_date
+        FROM {SUMMARIES_TABLE} GROUP BY stock_id, method
+    ) latest ON bs.stock_id = latest.stock_id
+           AND bs.method = latest.method
+           AND bs.date = latest.latest_date
+"""
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def ensure_schema(conn: sqlite3.Connection) -> bool:
+    """
+    建立資料表、索引與 latest_bt_summaries，並回填既有 summary
+
+    :param conn: SQLite 連線（不可在未完成的交易中呼叫）
+    :return: 是否執行了遷移
+    """
+    if schema_version(conn) >= SCHEMA_VERSION:
+        return False
+    cur = conn.cursor()
+    try:
+        cur.execute('BEGIN IMMEDIATE')
+        # 等待寫入鎖期間其他連線可能已完成遷移
+        if schema_version(conn) >= SCHEMA_VERSION:
+            cur.execute('COMMIT')
+            return False
+        for statement in TABLES + INDEXES:
+            cur.execute(statement)
+        cur.execute(_BACKFILL_LATEST)
+        cur.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        cur.execute('COMMIT')
+    except sqlite3.Error:
+        cur.execute('ROLLBACK')
+        raise
+    return True
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    """開啟連線並確保 schema 為最新版本"""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        ensure_schema(conn)
+    except sqlite3.Error:
+        conn.close()
+        raise
+    conn.isolation_level = ''
+    return conn
+
+
+def upsert_latest(cur: sqlite3.Cursor, summaries: Iterable[tuple]) -> None:
+    """以寫入的 summary（bt_summaries 欄位順序）更新 latest_bt_summaries"""
+    cur.executemany(_UPSERT_LATEST, summaries)
+
+
+def migrate(db_path: Path) -> bool:
+    """遷移單一資料庫；回傳是否執行了遷移"""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        return ensure_schema(conn)
+    finally:
+        conn.close()
+
+
+def migrate_all(data_dir: Path = Path('data')) -> dict:
+    """遷移 data/*/db.sqlite；回傳 {路徑: 是否執行了遷移}"""
+    return {db_path: migrate(db_path) for db_path in sorted(data_dir.glob('*/db.sqlite'))}
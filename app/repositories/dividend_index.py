@@ -0,0 +1,71 @@
+"""
+配息事件索引
+
+每檔股票在載入股價/配息資料後建立一次，供所有策略共用。
+以排序後的除息日、配息金額與每股累計配息三個陣列表示，
+「某日之前、上次入帳之後的最後一筆配息」以二分搜尋 O(log n) 取得，
+取代每次買入都對整個 DataFrame 做布林遮罩的 O(n) 掃描。
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+class DividendIndex:
+    def __init__(self, dates: np.ndarray, amounts: np.ndarray):
+        """
+        :param dates: 除息日（datetime64，已排序）
+        :param amounts: 每股配息金額
+        """
+        self.dates = np.asarray(dates, dtype='datetime64[ns]')
+        self.amounts = np.asarray(amounts, dtype=float)
+        # 每股累計配息，cumulative[i] 為前 i+1 筆配息總和
+        self.cumulative = np.cumsum(self.amounts)
+
+    @classmethod
+    def from_frame(cls, stock_data: pd.DataFrame, dividend_column: str) -> 'DividendIndex':
+        """
+        由股價/配息合併後的 DataFrame 建立索引，只保留配息金額 > 0 的列。
+
+        :param stock_data: 含 date 與配息欄位的股票數據（依日期排序）
+        :param dividend_column: 配息欄位名稱
+        """
+        dividends = stock_data[dividend_column].to_numpy(dtype=float)
+        mask = dividends > 0
+        return cls(stock_data['date'].values[mask], dividends[mask])
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def last_before(self, when, after=None) -> int:
+        """
+        取得除息日早於 `when`（不含）且晚於 `after`（不含）的最後一筆配息索引。
+
+        :param when: 查詢日期
+        :param after: 上次入帳的配息日，None 表示不限
+        :return: 配息索引，找不到時回傳 -1
+        """
+        i = int(np.searchsorted(self.dates, np.datetime64(when, 'ns'), side='left')) - 1
+        if i < 0:
+            return -1
+        if after is not None and self.dates[i] <= np.datetime64(after, 'ns'):
+            return -1
+        return i
+
+    def last_before_many(self, when: np.ndarray) -> np.ndarray:
+        """`last_before` 的向量版本（不含 after 條件），找不到時為 -1"""
+        return np.searchsorted(self.dates, np.asarray(when, dtype='datetime64[ns]'), side='left') - 1
+
+    def per_share_between(self, start: Optional[np.datetime64], end: np.datetime64) -> float:
+        """
+        區間 (start, end) 內的每股配息總和，以累計陣列相減取得。
+
+        :param start: 起日（不含），None 表示自第一筆起算
+        :param end: 迄日（不含）
+        """
+        hi = int(np.searchsorted(self.dates, np.datetime64(end, 'ns'), side='left'))
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(start, 'ns'), side='right'))
+        if hi <= lo:
+            return 0.0
+        return float(self.cumulative[hi - 1] - (self.cumulative[lo - 1] if lo > 0 else 0.0))
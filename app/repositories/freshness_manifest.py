@@ -0,0 +1,69 @@
+"""
+快取新鮮度清單
+
+以單一 JSON（{快取鍵: 最後擷取時已完成的交易日}）記錄每檔股票快取涵蓋到哪個交易日，
+載入一次後以 dict 查詢，不需對每個快取檔 os.stat。交易日曆沒有新的交易日完成前，
+快取視為最新，不呼叫資料源。當日的 K 棒尚未發布時只記錄到實際取得的最後一根，下次執行仍會更新；
+已過去的交易日仍沒有 K 棒（未列出的休市日、暫停交易）時記錄為已嘗試，不再每次重新擷取。
+"""
+import json
+import os
+from datetime import date
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.repositories.trading_calendar import TradingCalendar
+
+
+def covered_session(calendar: TradingCalendar, last_bar: Optional[date]) -> date:
+    """
+    快取涵蓋的交易日：最後完成的交易日；該日為今天且資料源尚未發布 K 棒時為最後一根 K 棒
+
+    過去的交易日仍沒有 K 棒時視為已涵蓋（之後的擷取有重疊區間，晚到的 K 棒仍會補上）
+
+    :param last_bar: 擷取結果的最後一根 K 棒日期，None 表示未知
+    """
+    session = calendar.last_completed_session()
+    if last_bar is None or last_bar >= session or session < calendar.today():
+        return session
+    return last_bar
+
+
+class FreshnessManifest:
+    # 同一執行中共用的實例 {path: FreshnessManifest}
+    _shared: Dict[Path, 'FreshnessManifest'] = {}
+
+    def __init__(self, path: Path):
+        """
+        :param path: 清單檔路徑，例如 data/tw/cache/freshness.json
+        """
+        self.path = Path(path)
+        self._sessions: Dict[str, str] = {}
+        if self.path.exists():
+            self._sessions = json.loads(self.path.read_text(encoding='utf-8'))
+
+    @classmethod
+    def shared(cls, path: Path) -> 'FreshnessManifest':
+        """取得本次執行共用的清單（同一檔案只讀取一次）"""
+        path = Path(path)
+        if path not in cls._shared:
+            cls._shared[path] = cls(path)
+        return cls._shared[path]
+
+    def session(self, key: str) -> Optional[date]:
+        """快取涵蓋的最後交易日；未記錄時回傳 None"""
+        value = self._sessions.get(key)
+        return date.fromisoformat(value) if value else None
+
+    def is_stale(self, key: str, calendar: TradingCalendar) -> bool:
+        """未記錄，或記錄之後已有新的交易日完成"""
+        session = self.session(key)
+        return session is None or session < calendar.last_completed_session()
+
+    def mark(self, key: str, session: date) -> None:
+        """記錄快取已更新至 session，並以暫存檔 + os.replace 原子寫入"""
+        self._sessions[key] = session.isoformat()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        tmp.write_text(json.dumps(self._sessions, sort_keys=True), encoding='utf-8')
+        os.replace(tmp, self.path)
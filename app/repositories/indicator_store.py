@@ -0,0 +1,188 @@
+"""
+技術指標增量快取
+
+每日執行通常只新增一根 K 棒，但 MACD（EWM 12/26/9）、RSI（14 日滾動）與均線（120 日滾動）
+原本每次都對完整歷史重算。IndicatorStore 以 (股票, 指標, 參數) 為鍵，
+將 EWM 狀態、滾動視窗緩衝與已算出的欄位存成 .npz（與股價快取同目錄），
+下次只延伸新增的列；若既有歷史被改寫（例如分割重新調整），則整段重算。
+
+- EWM 延伸完全重現 pandas `ewm(adjust=False)` 的遞推（含 NaN 的權重衰減），結果與全量重算相同
+- 滾動平均以「緩衝 + 新列」重算，與 pandas 全量滾動和僅有浮點捨入誤差
+"""
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def _fingerprint(values: np.ndarray) -> str:
+    """價格序列的雜湊，用來判斷快取的歷史是否被改寫"""
+    return hashlib.blake2b(np.ascontiguousarray(values, dtype=float).tobytes(), digest_size=16).hexdigest()
+
+
+def _span_alpha(span: int) -> float:
+    return 1. / (1. + (span - 1) / 2.)
+
+
+def _ewm_full(values: pd.Series, span: int) -> Tuple[np.ndarray, float, float]:
+    """
+    以 pandas 全量計算 EWM，並推導延伸所需的狀態。
+
+    :return: (EWM 結果, 最後加權值, 最後權重)
+    """
+    result = values.ewm(span=span, adjust=False).mean().to_numpy()
+    observed = np.flatnonzero(~np.isnan(values.to_numpy()))
+    if len(observed) == 0:
+        return result, np.nan, 1.
+    # 每次觀測後權重重設為 1，之後每遇到一個 NaN 乘上 (1 - alpha)
+    trailing_nan = len(values) - 1 - observed[-1]
+    return result, result[-1], (1. - _span_alpha(span)) ** trailing_nan
+
+
+def _ewm_extend(values: np.ndarray, weighted: float, old_wt: float, span: int) -> Tuple[np.ndarray, float, float]:
+    """
+    從保存的狀態延伸 EWM，逐步重現 pandas ewm(adjust=False, ignore_na=False) 的計算。
+
+    :return: (新增列的 EWM 結果, 最後加權值, 最後權重)
+    """
+    alpha = _span_alpha(span)
+    old_wt_factor = 1. - alpha
+    out = np.empty(len(values))
+    for i, cur in enumerate(values):
+        is_observation = cur == cur
+        if weighted == weighted:
+            old_wt *= old_wt_factor
+            if is_observation:
+                if weighted != cur:
+                    weighted = old_wt * weighted + alpha * cur
+                    weighted /= (old_wt + alpha)
+                old_wt = 1.
+        elif is_observation:
+            weighted = cur
+        out[i] = weighted
+    return out, weighted, old_wt
+
+
+def _rolling_extend(buffer: np.ndarray, new_values: np.ndarray, window: int) -> np.ndarray:
+    """以保存的 window-1 筆緩衝加上新值計算滾動平均，只回傳新值對應的部分"""
+    combined = pd.Series(np.concatenate((buffer, new_values)))
+    return combined.rolling(window=window).mean().to_numpy()[len(buffer):]
+
+
+def _gain_loss(delta: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    gain = np.where(delta > 0, delta, 0.)
+    loss = np.where(delta < 0, -delta, 0.)
+    return gain, loss
+
+
+class IndicatorStore:
+    def __init__(self, root: Path):
+        """
+        :param root: 快取目錄，例如 data/tw/indicators
+        """
+        self.root = Path(root)
+
+    def _path(self, stock_id: str, indicator: str, params: Tuple[int, ...]) -> Path:
+        return self.root / f"{stock_id}_{indicator}_{'-'.join(map(str, params))}.npz"
+
+    def _load(self, path: Path, price: np.ndarray) -> Optional[Dict[str, np.ndarray]]:
+        """載入快取；若快取的歷史與目前價格前段不一致則回傳 None"""
+        if not path.exists():
+            return None
+        with np.load(path) as cached:
+            state = {key: cached[key] for key in cached.files}
+        n = int(state['n'])
+        if n > len(price) or str(state['fingerprint']) != _fingerprint(price[:n]):
+            return None
+        return state
+
+    def _save(self, path: Path, price: np.ndarray, **arrays) -> None:
+        """以暫存檔 + os.replace 原子寫入"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            np.savez(f, n=len(price), fingerprint=_fingerprint(price), **arrays)
+        os.replace(tmp, path)
+
+    def macd_rsi(self, stock_id: str, price: pd.Series, fast: int = 12, slow: int = 26, signal: int = 9,
+                 rsi_window: int = 14) -> Dict[str, pd.Series]:
+        """
+        取得 MACD、Signal 與 RSI 欄位，只對快取之後的新列計算。
+
+        :param stock_id: 股票代號
+        :param price: 完整收盤價序列
+        :return: {'MACD', 'Signal', 'RSI'}，index 與 price 相同
+        """
+        values = price.to_numpy(dtype=float)
+        path = self._path(stock_id, 'macd_rsi', (fast, slow, signal, rsi_window))
+        state = self._load(path, values)
+
+        if state is None:
+            fast_ema, fast_w, fast_wt = _ewm_full(price, fast)
+            slow_ema, slow_w, slow_wt = _ewm_full(price, slow)
+            macd = fast_ema - slow_ema
+            signal_ema, signal_w, signal_wt = _ewm_full(pd.Series(macd), signal)
+            gain, loss = _gain_loss(np.diff(values, prepend=np.nan))
+            rsi = self._rsi(pd.Series(gain).rolling(window=rsi_window).mean().to_numpy(),
+                            pd.Series(loss).rolling(window=rsi_window).mean().to_numpy())
+        else:
+            n = int(state['n'])
+            new = values[n:]
+            if len(new) == 0:
+                return self._as_series(price, MACD=state['MACD'], Signal=state['Signal'], RSI=state['RSI'])
+            fast_new, fast_w, fast_wt = _ewm_extend(new, float(state['fast_w']), float(state['fast_wt']), fast)
+            slow_new, slow_w, slow_wt = _ewm_extend(new, float(state['slow_w']), float(state['slow_wt']), slow)
+            macd_new = fast_new - slow_new
+            signal_new, signal_w, signal_wt = _ewm_extend(
+                macd_new, float(state['signal_w']), float(state['signal_wt']), signal)
+            gain_new, loss_new = _gain_loss(np.diff(values[n - 1:]) if n > 0 else np.diff(new, prepend=np.nan))
+            rsi_new = self._rsi(_rolling_extend(state['gain_tail'], gain_new, rsi_window),
+                                _rolling_extend(state['loss_tail'], loss_new, rsi_window))
+            macd = np.concatenate((state['MACD'], macd_new))
+            signal_ema = np.concatenate((state['Signal'], signal_new))
+            rsi = np.concatenate((state['RSI'], rsi_new))
+            gain = np.concatenate((state['gain_tail'], gain_new))
+            loss = np.concatenate((state['loss_tail'], loss_new))
+
+        self._save(path, values, MACD=macd, Signal=signal_ema, RSI=rsi,
+                   fast_w=fast_w, fast_wt=fast_wt, slow_w=slow_w, slow_wt=slow_wt,
+                   signal_w=signal_w, signal_wt=signal_wt,
+                   gain_tail=gain[len(gain) - (rsi_window - 1):], loss_tail=loss[len(loss) - (rsi_window - 1):])
+        return self._as_series(price, MACD=macd, Signal=signal_ema, RSI=rsi)
+
+    def moving_average(self, stock_id: str, price: pd.Series, window: int = 120) -> pd.Series:
+        """
+        取得 N 日均線，只對快取之後的新列計算。
+
+        :param stock_id: 股票代號
+        :param price: 完整收盤價序列
+        :param window: 均線天數
+        :return: 均線 Series，index 與 price 相同
+        """
+        values = price.to_numpy(dtype=float)
+        path = self._path(stock_id, 'ma', (window,))
+        state = self._load(path, values)
+
+        if state is None:
+            ma = price.rolling(window=window).mean().to_numpy()
+        else:
+            n = int(state['n'])
+            if n == len(values):
+                return pd.Series(state['MA'], index=price.index)
+            ma = np.concatenate((state['MA'], _rolling_extend(state['price_tail'], values[n:], window)))
+
+        self._save(path, values, MA=ma, price_tail=values[max(len(values) - (window - 1), 0):])
+        return pd.Series(ma, index=price.index)
+
+    @staticmethod
+    def _rsi(avg_gain: np.ndarray, avg_loss: np.ndarray) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = avg_gain / avg_loss
+            return 100 - (100 / (1 + rs))
+
+    @staticmethod
+    def _as_series(price: pd.Series, **columns) -> Dict[str, pd.Series]:
+        return {name: pd.Series(values, index=price.index) for name, values in columns.items()}
@@ -0,0 +1,174 @@
+"""
+平行回測
+
+tw_update.py / us_update.py 原本在主程序逐檔回測，多核心機器在回測階段只用到一個核心。
+ParallelBacktestRunner 將 (股票, 策略) 工作分派到 ProcessPoolExecutor：
+- 主程序把每檔股票的回測欄位存成 .npy，工作程序以 mmap_mode='r' 讀取，不需 pickle DataFrame
+- 檢查點由主程序先讀出隨工作傳入，工作程序完全不開啟 SQLite
+- 各工作回傳 BacktestBatch，由主程序依提交順序合併，以單一交易寫入（寫入結果與逐檔執行相同）
+- 工作程序的 log 經 QueueHandler 送回主程序，由 get_logger 建立的同一組 handler 輸出
+
+工作程序數預設為 CPU 核心數，可由環境變數 BACKTEST_WORKERS 設定；1 表示在主程序內直接執行。
+暫存的 .npy 目錄在 close()（或 with 區塊結束）時刪除，同一個 runner 可多次 add / run。
+"""
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.repositories.bt_engine import BacktestBatch
+from app.repositories.dividend_index import DividendIndex
+
+
+class SharedPrices:
+    """每檔股票的回測欄位（日期、收盤價、配息）以 .npy 保存，供工作程序以唯讀記憶體映射讀取"""
+
+    FIELDS = ('date', 'close', 'dividend', 'has_id')
+
+    def __init__(self, root: Path, close_column: str, dividend_column: str):
+        self.root = Path(root)
+        self.close_column = close_column
+        self.dividend_column = dividend_column
+
+    def _path(self, stock_id: str, field: str) -> Path:
+        return self.root / f"{stock_id}_{field}.npy"
+
+    def save(self, stock_id: str, stock_data: pd.DataFrame) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        arrays = {
+            'date': stock_data['date'].values.astype('datetime64[ns]').view('int64'),
+            'close': stock_data[self.close_column].to_numpy(dtype=float),
+            'dividend': stock_data[self.dividend_column].to_numpy(dtype=float),
+            # 合併配息後可能有缺少 stock_id 的列，需原樣保留才能與逐檔回測結果一致
+            'has_id': stock_data['stock_id'].notna().to_numpy(),
+        }
+        for field, values in arrays.items():
+            np.save(self._path(stock_id, field), values)
+
+    def load(self, stock_id: str) -> pd.DataFrame:
+        arrays = {field: np.load(self._path(stock_id, field), mmap_mode='r') for field in self.FIELDS}
+        return pd.DataFrame({
+            'stock_id': pd.Series(stock_id, index=range(len(arrays['date'])), dtype=object).where(arrays['has_id']),
+            'date': np.asarray(arrays['date']).view('datetime64[ns]'),
+            self.close_column: arrays['close'],
+            self.dividend_column: arrays['dividend'],
+        })
+
+
+def _init_worker(queue: multiprocessing.Queue, logger_name: Optional[str]) -> None:
+    """工作程序初始化：移除繼承的 handler，log 全部經佇列送回主程序"""
+    if logger_name is None:
+        return
+    logger = logging.getLogger(logger_name)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(QueueHandler(queue))
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+
+
+def _run_job(strategy, prices: SharedPrices, stock_id: str, method_name: str, incremental: bool,
+             checkpoints: dict, logger_name: Optional[str]) -> BacktestBatch:
+    """單一 (股票, 策略) 回測，回傳不含 BacktestResult 的寫入資料"""
+    if logger_name is not None:
+        logging.getLogger(logger_name).debug("回測 %s %s (pid %d)", stock_id, method_name, os.getpid())
+    stock_data = prices.load(stock_id)
+    dividend_index = DividendIndex.from_frame(stock_data, prices.dividend_column)
+    batch = strategy.backtest_batch(stock_data, [method_name], dividend_index, incremental, checkpoints)
+    batch.results = {}
+    return batch
+
+
+class ParallelBacktestRunner:
+    def __init__(self, strategy, workers: Optional[int] = None, logger: Optional[logging.Logger] = None,
+                 root: Optional[Path] = None):
+        """
+        :param strategy: BaseStrategy 實例（需可 pickle）
+        :param workers: 工作程序數，None 時讀取 BACKTEST_WORKERS，未設定則為 CPU 核心數
+        :param logger: get_logger 建立的 logger，工作程序的 log 會轉送至其 handler
+        :param root: .npy 存放目錄，None 時使用暫存目錄並於 close() 時刪除
+        """
+        self.strategy = strategy
+        self.workers = workers or int(os.environ.get('BACKTEST_WORKERS', 0)) or os.cpu_count() or 1
+        self.logger = logger
+        self._tmp = tempfile.TemporaryDirectory(prefix='bt_prices_') if root is None else None
+        self.prices = SharedPrices(root or self._tmp.name, strategy.CLOSED_PRICE_COLUMN, strategy.DIVIDEND_COLUMN)
+        self.stock_ids: List[str] = []
+
+    def add(self, stock_data: pd.DataFrame) -> None:
+        """加入一檔股票（依日期排序）"""
+        stock_id = self.strategy._stock_id(stock_data)
+        self.prices.save(stock_id, stock_data)
+        self.stock_ids.append(stock_id)
+
+    def run(self, methods: Optional[List[str]] = None, incremental: bool = False,
+            prune: bool = False) -> BacktestBatch:
+        """
+        平行回測所有已加入的股票，並以單一交易寫入結果
+
+        :param methods: 策略名稱清單，預設為 strategy.METHODS
+        :param incremental: 是否以檢查點增量回測
+        :param prune: 寫入前刪除不在本次 (股票, 策略) 中的舊資料（增量回測不再清空資料表，移除的股票需明確刪除）
+        :return: 合併後的寫入資料
+        """
+        methods = list(methods or self.strategy.METHODS)
+        checkpoints = self._checkpoints(incremental)
+        logger_name = self.logger.name if self.logger is not None else None
+        jobs = [(self.strategy, self.prices, stock_id, method_name, incremental,
+                 checkpoints.get(stock_id, {}), logger_name)
+                for stock_id in self.stock_ids for method_name in methods]
+
+        batches = self._execute(jobs, logger_name)
+        merged = BacktestBatch()
+        for batch in batches:
+            merged.extend(batch)
+        if prune and self.stock_ids:
+            merged.retain = [(stock_id, method_name) for stock_id in self.stock_ids for method_name in methods]
+        stats = self.strategy.write_batch(merged, incremental)
+        if self.logger is not None:
+            self.logger.info("寫入回測結果 %s", stats)
+        return merged
+
+    def close(self) -> None:
+        """刪除暫存的 .npy 目錄（指定 root 時保留）"""
+        if self._tmp is not None:
+            self._tmp.cleanup()
+            self._tmp = None
+
+    def __enter__(self) -> 'ParallelBacktestRunner':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _checkpoints(self, incremental: bool) -> Dict[str, dict]:
+        if not incremental:
+            return {stock_id: {} for stock_id in self.stock_ids}
+        store = self.strategy.checkpoint_store
+        return {stock_id: store.load(stock_id) for stock_id in self.stock_ids}
+
+    def _execute(self, jobs: List[tuple], logger_name: Optional[str]) -> List[BacktestBatch]:
+        """執行所有工作，結果依提交順序回傳"""
+        if self.workers == 1 or len(jobs) <= 1:
+            return [_run_job(*job) for job in jobs]
+
+        queue = multiprocessing.Queue()
+        listener = None
+        if self.logger is not None:
+            listener = QueueListener(queue, *self.logger.handlers, respect_handler_level=True)
+            listener.start()
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(queue, logger_name)) as executor:
+                futures = [executor.submit(_run_job, *job) for job in jobs]
+                return [future.result() for future in futures]
+        finally:
+            if listener is not None:
+                listener.stop()
@@ -0,0 +1,231 @@
+"""
+策略參數掃描
+
+一次評估整組參數（例如均線 20–250 天 × RSI 門檻 30–70 × MACD 週期），挑選穩健的設定。
+所有參數組合的買入訊號以 (交易日 × 參數組合) 的二維陣列一次算出：
+- 均線以累加和（cumsum）相減求滾動平均，所有視窗共用同一條累加和
+- MACD 的各 EWM 週期只計算一次，由所有組合共用；Signal 線依週期分組，以 DataFrame 一次計算多欄
+- RSI 只計算一次，門檻比較以廣播產生所有欄
+
+回測只計算 summary 所需的持股量、總配息與總投資金額（不需路徑相依的持股單價），
+同樣以二維累加一次推進所有組合，結果為每組參數一列的 ROI / IRR 表，不寫入 transaction_logs。
+買入金額、股數與配息入帳規則與 run_vectorized 相同。
+"""
+import itertools
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.repositories.budget_allocator import BudgetAllocator
+from app.repositories.dividend_index import DividendIndex
+
+
+def rolling_means(price: np.ndarray, windows: Sequence[int]) -> np.ndarray:
+    """
+    以累加和計算多個視窗的滾動平均；視窗內有 NaN 或資料不足時為 NaN（同 pandas rolling 預設）
+
+    :return: (交易日, 視窗) 陣列
+    """
+    valid = ~np.isnan(price)
+    total = np.concatenate(([0.], np.cumsum(np.where(valid, price, 0.))))
+    count = np.concatenate(([0], np.cumsum(valid)))
+    out = np.full((len(price), len(windows)), np.nan)
+    for j, window in enumerate(windows):
+        if window > len(price):
+            continue
+        sums = total[window:] - total[:-window]
+        full = (count[window:] - count[:-window]) == window
+        out[window - 1:, j] = np.where(full, sums / window, np.nan)
+    return out
+
+
+def ma_pullback_signals(price: np.ndarray, windows: Sequence[int]) -> np.ndarray:
+    """
+    均線回檔訊號矩陣：收盤價跌破均線後，反彈回穿均線上方當日
+
+    :return: (交易日, 視窗) 布林陣列
+    """
+    ma = rolling_means(price, windows)
+    with np.errstate(invalid='ignore'):
+        below = price[:, None] < ma
+        above = price[:, None] >= ma
+    prev_below = np.vstack((np.zeros((1, len(windows)), dtype=bool), below[:-1]))
+    return above & prev_below
+
+
+def macd_rsi_signals(price: pd.Series, spans: Sequence[Tuple[int, int, int]], thresholds: Sequence[float],
+                     rsi_window: int = 14) -> np.ndarray:
+    """
+    MACD 負轉正且 RSI 低於門檻的訊號矩陣，欄依 itertools.product(spans, thresholds) 排列
+
+    :param price: 收盤價
+    :param spans: [(fast, slow, signal)]
+    :param thresholds: RSI 門檻
+    :param rsi_window: RSI 天數
+    :return: (交易日, 組合) 布林陣列
+    """
+    bases = {span: price.ewm(span=span, adjust=False).mean().to_numpy()
+             for span in sorted({s for fast, slow, _ in spans for s in (fast, slow)})}
+    macd = np.column_stack([bases[fast] - bases[slow] for fast, slow, _ in spans])
+    signal = np.empty_like(macd)
+    for span in {s for _, _, s in spans}:
+        cols = [j for j, (_, _, s) in enumerate(spans) if s == span]
+        signal[:, cols] = pd.DataFrame(macd[:, cols]).ewm(span=span, adjust=False).mean().to_numpy()
+
+    diff = macd - signal
+    diff_prev = np.vstack((np.full((1, len(spans)), np.nan), diff[:-1]))
+    with np.errstate(invalid='ignore'):
+        macd_signal = (diff > 0) & (diff_prev <= 0)
+
+    delta = price.diff()
+    avg_gain = delta.where(delta > 0, 0).rolling(window=rsi_window).mean()
+    avg_loss = (-delta.where(delta < 0, 0)).rolling(window=rsi_window).mean()
+    rsi = (100 - (100 / (1 + avg_gain / avg_loss))).to_numpy()
+    with np.errstate(invalid='ignore'):
+        rsi_signal = rsi[:, None] <= np.asarray(thresholds, dtype=float)[None, :]
+
+    return (macd_signal[:, :, None] & rsi_signal[:, None, :]).reshape(len(price), -1)
+
+
+class ParamSweep:
+    # 每次回測的欄數，限制 (交易日 × 組合) 中間陣列的記憶體用量
+    CHUNK_COLUMNS = 256
+
+    def __init__(self, strategy):
+        """
+        :param strategy: BaseStrategy 實例，提供年度預算、分配政策與欄位名稱
+        """
+        self.strategy = strategy
+
+    def ma_pullback(self, stock_data: pd.DataFrame, windows: Sequence[int]) -> pd.DataFrame:
+        """
+        掃描均線回檔策略的均線天數
+
+        :param stock_data: 股票數據（依日期排序）
+        :param windows: 均線天數清單
+        :return: 每個視窗一列的 ROI / IRR 表
+        """
+        if stock_data.empty:
+            raise ValueError("Stock data is empty")
+        price = stock_data[self.strategy.CLOSED_PRICE_COLUMN].to_numpy(dtype=float)
+        signals = ma_pullback_signals(price, windows)
+        return self._table(stock_data, signals, pd.DataFrame({'window': list(windows)}))
+
+    def macd_rsi(self, stock_data: pd.DataFrame, spans: Sequence[Tuple[int, int, int]] = ((12, 26, 9),),
+                 thresholds: Sequence[float] = (50,), rsi_window: int = 14) -> pd.DataFrame:
+        """
+        掃描 MACD 週期與 RSI 門檻
+
+        :param stock_data: 股票數據（依日期排序）
+        :param spans: [(fast, slow, signal)] 清單
+        :param thresholds: RSI 門檻清單
+        :param rsi_window: RSI 天數
+        :return: 每個組合一列的 ROI / IRR 表
+        """
+        if stock_data.empty:
+            raise ValueError("Stock data is empty")
+        price = stock_data[self.strategy.CLOSED_PRICE_COLUMN].reset_index(drop=True)
+        signals = macd_rsi_signals(price, spans, thresholds, rsi_window)
+        params = pd.DataFrame([(fast, slow, signal, threshold) for (fast, slow, signal), threshold
+                               in itertools.product(spans, thresholds)],
+                              columns=['fast', 'slow', 'signal', 'rsi_threshold'])
+        return self._table(stock_data, signals, params)
+
+    def _table(self, stock_data: pd.DataFrame, signals: np.ndarray, params: pd.DataFrame) -> pd.DataFrame:
+        dates = stock_data['date'].values
+        closes = stock_data[self.strategy.CLOSED_PRICE_COLUMN].to_numpy(dtype=float)
+        dividend_index = DividendIndex.from_frame(stock_data, self.strategy.DIVIDEND_COLUMN)
+        totals = [sweep_backtest(dates, closes, signals[:, i:i + self.CHUNK_COLUMNS], dividend_index,
+                                 self.strategy.BROKER_YEAR_CASH, self.strategy.BUDGET_POLICY)
+                  for i in range(0, signals.shape[1], self.CHUNK_COLUMNS)]
+        totals = {key: np.concatenate([t[key] for t in totals]) for key in totals[0]} if totals else {}
+        rows = [self._summary(dates, closes, totals, j) for j in range(signals.shape[1])]
+        return params.join(pd.DataFrame(rows, columns=['trades', 'total_investment', 'asset_value', 'roi', 'irr']))
+
+    def _summary(self, dates: np.ndarray, closes: np.ndarray, totals: Dict[str, np.ndarray], j: int) -> list:
+        """單一組合的 summary，ROI / IRR 的四捨五入與 BaseStrategy._summary_row 相同"""
+        trades = int(totals['trades'][j])
+        if trades == 0:
+            return [0, 0.0, np.nan, np.nan, np.nan]
+        # 已入帳過配息時，總配息為 numpy.float64（與回測引擎的四捨五入方式一致）
+        broker_dividend = totals['broker_dividend'][j] if totals['accrued'][j] else 0
+        total_investment = float(totals['total_investment'][j])
+        asset_value, roi = self.strategy.calculate_asset_value_and_ratio(
+            float(totals['position_size'][j]), closes[-1], broker_dividend, total_investment)
+        years = (pd.Timestamp(dates[-1]) - pd.Timestamp(dates[totals['first_buy'][j]])).days / 365
+        irr = np.nan
+        if years > 0:
+            irr = round(self.strategy.calculate_annualized_return(total_investment, asset_value, years), 4)
+        return [trades, total_investment, asset_value, roi, irr]
+
+
+def _per_trade_cash(years: np.ndarray, signals: np.ndarray, year_cash: float, policy: str) -> np.ndarray:
+    """與 BudgetAllocator 相同的分配規則，對 (交易日 × 組合) 一次計算，非買入列為 0"""
+    if policy not in BudgetAllocator.POLICIES:
+        raise ValueError(f"Unknown budget policy: {policy}")
+    unique_years, starts, year_pos = np.unique(years, return_index=True, return_inverse=True)
+    hits = signals.astype(np.int64)
+    counts = np.add.reduceat(hits, starts, axis=0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if policy == 'full_year':
+            cash = year_cash / counts[year_pos]
+            return np.where(signals, cash, 0.)
+
+        # point_in_time：前一年有訊號時以其次數為預期次數，否則為預設值；當年累計不超過預算
+        has_prev = np.concatenate(([False], np.diff(unique_years) == 1))[:, None]
+        prev_counts = np.vstack((np.zeros((1, counts.shape[1]), dtype=np.int64), counts[:-1]))
+        expected = np.where(has_prev & (prev_counts > 0), prev_counts, BudgetAllocator.DEFAULT_EXPECTED_TRADES)
+        running = np.cumsum(hits, axis=0)
+        before_year = np.vstack((np.zeros((1, counts.shape[1]), dtype=np.int64), running[starts[1:] - 1]))
+        nth = running - hits - before_year[year_pos]
+        unit = year_cash / expected[year_pos]
+        return np.where(signals, np.minimum(unit, np.maximum(year_cash - nth * unit, 0)), 0.)
+
+
+def sweep_backtest(dates: np.ndarray, closes: np.ndarray, signals: np.ndarray, dividend_index: DividendIndex,
+                   year_cash: float, policy: str = 'full_year') -> Dict[str, np.ndarray]:
+    """
+    同時回測多個訊號欄，只計算 summary 所需的累計值
+
+    :param dates: 交易日期（已排序）
+    :param closes: 收盤價
+    :param signals: (交易日, 組合) 布林陣列
+    :param dividend_index: 配息事件索引
+    :param year_cash: 每年可投入金額
+    :param policy: 預算分配政策
+    :return: 每欄的 trades / first_buy / position_size / broker_dividend / accrued / total_investment
+    """
+    signals = np.asarray(signals, dtype=bool)
+    years = dates.astype('datetime64[Y]').astype(int) + 1970
+    cash = _per_trade_cash(years, signals, year_cash, policy)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        amounts = np.where(signals, np.round(cash / closes[:, None], 0), 0.)
+    sizes = np.cumsum(amounts, axis=0)
+    size_before = sizes - amounts
+
+    # 前一次買入時可見的最後一筆配息（前一次買入時無持股則為 -1），規則同 _dividend_accrual
+    event = dividend_index.last_before_many(dates)
+    rows = np.where(signals, np.arange(len(dates))[:, None], -1)
+    prev_buy = np.vstack((np.full((1, signals.shape[1]), -1), np.maximum.accumulate(rows, axis=0)[:-1]))
+    prev_row = np.maximum(prev_buy, 0)
+    prev_has_position = (prev_buy >= 0) & (np.take_along_axis(size_before, prev_row, axis=0) > 0)
+    prev_event = np.where(prev_has_position, event[prev_row], -1)
+
+    accrue = signals & (size_before > 0) & (event >= 0)[:, None] & (event[:, None] > prev_event)
+    if len(dividend_index):
+        per_share = dividend_index.amounts[np.maximum(event, 0)][:, None]
+        dividends = np.where(accrue, np.round(size_before * per_share, 2), 0.)
+    else:
+        dividends = np.zeros(signals.shape)
+
+    return {
+        'trades': signals.sum(axis=0),
+        'first_buy': signals.argmax(axis=0),
+        'position_size': sizes[-1],
+        # 逐列累加（與 run_vectorized 的浮點順序相同），非買入列加 0 不影響結果
+        'broker_dividend': np.cumsum(dividends, axis=0)[-1],
+        'accrued': accrue.any(axis=0),
+        'total_investment': np.cumsum(cash, axis=0)[-1],
+    }
@@ -0,0 +1,215 @@
+"""
+欄式股價快取
+
+原本每檔股票以 UTF-8-BOM CSV 保存，每次載入都要重新解析全文、推斷型別並多次 `pd.to_datetime`。
+ColumnarCache 以每欄一個 .npy 檔保存（日期為 int64 奈秒、價格為 float64、文字為固定寬度 unicode），
+載入時以 mmap_mode='r' 直接映射，不需解析：
+
+    {root}/{key}/manifest.json        欄位型別與分割區清單
+    {root}/{key}/p000000/{col}.npy    分割區（append 只新增分割區，不改寫既有檔案）
+
+- 寫入先建立新的分割區目錄，再以暫存檔 + os.replace 原子替換 manifest；讀取只依 manifest，
+  中斷的寫入不會留下半套資料
+- 分割區數超過 MAX_PARTITIONS 時合併為單一分割區
+- 尚未建立快取時，由既有 CSV 一次性轉換（load_or_migrate）
+- manifest 的 meta 保存與快取內容相關的附註（例如分割檢查已驗證至哪一天）；append 保留，write 清除
+"""
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def _encode(series: pd.Series) -> Dict[str, np.ndarray]:
+    """單一欄位轉為可 mmap 的陣列；文字欄另存缺值遮罩"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return {'': series.to_numpy(dtype='datetime64[ns]').view('int64')}
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+        return {'': series.to_numpy()}
+    na = series.isna().to_numpy()
+    return {'': series.where(~na, '').astype(str).to_numpy(dtype=str), '__na': na}
+
+
+def _kind(series: pd.Series) -> str:
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'datetime'
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+        return 'number'
+    return 'str'
+
+
+class ColumnarCache:
+    MANIFEST = 'manifest.json'
+
+    # 分割區數上限，超過時合併
+    MAX_PARTITIONS = 32
+
+    def __init__(self, root: Path):
+        """
+        :param root: 快取根目錄，例如 data/tw/cache
+        """
+        self.root = Path(root)
+
+    def path(self, key: str) -> Path:
+        return self.root / key
+
+    def manifest_path(self, key: str) -> Path:
+        return self.path(key) / self.MANIFEST
+
+    def exists(self, key: str) -> bool:
+        return self.manifest_path(key).exists()
+
+    def mtime(self, key: str) -> Optional[float]:
+        """最後寫入時間；快取不存在時回傳 None"""
+        path = self.manifest_path(key)
+        return os.path.getmtime(path) if path.exists() else None
+
+    def _manifest(self, key: str) -> Optional[dict]:
+        path = self.manifest_path(key)
+        if not path.exists():
+            return None
+        return json.loads(path.read_text(encoding='utf-8'))
+
+    def read(self, key: str) -> Optional[pd.DataFrame]:
+        """
+        載入快取（欄位順序與寫入時相同）
+
+        :return: DataFrame；快取不存在時回傳 None
+        """
+        manifest = self._manifest(key)
+        if manifest is None:
+            return None
+        parts = [self._read_partition(self.path(key) / name, manifest['columns']) for name in manifest['partitions']]
+        if len(parts) == 1:
+            return parts[0]
+        return pd.concat(parts, ignore_index=True)
+
+    def last(self, key: str, column: str = 'date'):
+        """
+        欄位最大值（只映射該欄，不載入完整快取），用於判斷快取最後一筆日期
+
+        :return: 最大值（datetime 欄為 Timestamp）；快取不存在或為空時回傳 None
+        """
+        manifest = self._manifest(key)
+        if manifest is None or not manifest['rows']:
+            return None
+        values = [np.load(self.path(key) / name / f'{column}.npy', mmap_mode='r') for name in manifest['partitions']]
+        value = max(v.max() for v in values if len(v))
+        return pd.Timestamp(value) if manifest['columns'][column] == 'datetime' else value
+
+    def _read_partition(self, directory: Path, columns: Dict[str, str]) -> pd.DataFrame:
+        data = {}
+        for col, kind in columns.items():
+            values = np.load(directory / f'{col}.npy', mmap_mode='r')
+            if kind == 'datetime':
+                data[col] = np.asarray(values).view('datetime64[ns]')
+            elif kind == 'str':
+                na = np.load(directory / f'{col}__na.npy')
+                data[col] = pd.Series(values, dtype=object).where(~na)
+            else:
+                data[col] = values
+        return pd.DataFrame(data)
+
+    def _write_partition(self, key: str, name: str, df: pd.DataFrame) -> None:
+        directory = self.path(key) / name
+        shutil.rmtree(directory, ignore_errors=True)
+        directory.mkdir(parents=True)
+        for col in df.columns:
+            for suffix, values in _encode(df[col]).items():
+                np.save(directory / f'{col}{suffix}.npy', values)
+
+    def meta(self, key: str) -> dict:
+        """快取附註；快取不存在時為空 dict"""
+        return dict((self._manifest(key) or {}).get('meta', {}))
+
+    def update_meta(self, key: str, **values) -> None:
+        """更新快取附註（快取不存在時略過）"""
+        manifest = self._manifest(key)
+        if manifest is None:
+            return
+        self._commit(key, manifest['columns'], manifest['partitions'], manifest['rows'],
+                     {**manifest.get('meta', {}), **values})
+
+    def _commit(self, key: str, columns: Dict[str, str], partitions: List[str], rows: int,
+                meta: Optional[dict] = None) -> None:
+        """以暫存檔 + os.replace 原子替換 manifest"""
+        manifest = {'columns': columns, 'partitions': partitions, 'rows': rows, 'updated': time.time(),
+                    'meta': meta or {}}
+        tmp = self.manifest_path(key).with_name(self.MANIFEST + '.tmp')
+        tmp.write_text(json.dumps(manifest), encoding='utf-8')
+        os.replace(tmp, self.manifest_path(key))
+
+    def _next_partition(self, key: str) -> str:
+        existing = [p.name for p in self.path(key).glob('p*') if p.is_dir()]
+        return f'p{max((int(name[1:]) for name in existing), default=-1) + 1:06d}'
+
+    def write(self, key: str, df: pd.DataFrame) -> None:
+        """以單一新分割區完整取代快取"""
+        old = self._manifest(key)
+        self.path(key).mkdir(parents=True, exist_ok=True)
+        name = self._next_partition(key)
+        df = df.reset_index(drop=True)
+        self._write_partition(key, name, df)
+        self._commit(key, {col: _kind(df[col]) for col in df.columns}, [name], len(df))
+        for stale in (old or {}).get('partitions', []):
+            shutil.rmtree(self.path(key) / stale, ignore_errors=True)
+
+    def append(self, key: str, df: pd.DataFrame) -> None:
+        """
+        新增一個分割區，不改寫既有資料；欄位需與既有快取相同
+
+        :param df: 新增的列
+        """
+        manifest = self._manifest(key)
+        if manifest is None:
+            return self.write(key, df)
+        if list(df.columns) != list(manifest['columns']):
+            raise ValueError(f"Columns mismatch for cache {key}: {list(df.columns)}")
+        if df.empty:
+            return
+        if len(manifest['partitions']) >= self.MAX_PARTITIONS:
+            self.write(key, pd.concat([self.read(key), df], ignore_index=True))
+            return self.update_meta(key, **manifest.get('meta', {}))
+
+        name = self._next_partition(key)
+        self._write_partition(key, name, df.reset_index(drop=True))
+        self._commit(key, manifest['columns'], manifest['partitions'] + [name], manifest['rows'] + len(df),
+                     manifest.get('meta'))
+
+    def save(self, key: str, df: pd.DataFrame, previous: Optional[pd.DataFrame] = None) -> None:
+        """
+        寫入完整資料；若既有快取恰為 df 的前段，只追加新的列
+
+        :param df: 完整資料
+        :param previous: 已載入的既有快取（省略時重新讀取）
+        """
+        if previous is None:
+            previous = self.read(key)
+        n = 0 if previous is None else len(previous)
+        if (previous is not None and 0 < n <= len(df) and list(previous.columns) == list(df.columns)
+                and df.iloc[:n].reset_index(drop=True).equals(previous.reset_index(drop=True))):
+            self.append(key, df.iloc[n:])
+        else:
+            self.write(key, df)
+
+    def load_or_migrate(self, key: str, legacy_csv: Path, parse_dates=('date',), **read_csv_kwargs) -> Optional[pd.DataFrame]:
+        """
+        讀取快取；快取不存在但舊 CSV 存在時，一次性轉換為欄式快取（保留原 CSV）
+
+        :param legacy_csv: 舊 CSV 路徑
+        :param parse_dates: 需轉為日期的欄位
+        :return: DataFrame；兩者皆不存在時回傳 None
+        """
+        df = self.read(key)
+        if df is not None or not Path(legacy_csv).exists():
+            return df
+        df = pd.read_csv(legacy_csv, **read_csv_kwargs)
+        df = df.assign(**{col: pd.to_datetime(df[col]) for col in parse_dates if col in df.columns})
+        self.write(key, df)
+        print(f'[INFO] {legacy_csv} 已轉換為欄式快取 {self.path(key)}')
+        return df
@@ -1,8 +1,8 @@
-import sqlite3
 import json
 from pathlib import Path
 from datetime import datetime, timedelta
 from abc import ABC, abstractmethod
+from app.repositories import db_schema
 from app.services.telegram_notify import TelegramNotify
 
 class RecentTranscation(ABC):
@@ -24,7 +24,7 @@ class RecentTranscation(ABC):
 
     def getRecords(self):
         """取得近期十四天的交易資料"""
-        conn = sqlite3.connect(self.DB_PATH)
+        conn = db_schema.connect(self.DB_PATH)
 
         end_date = datetime.now().strftime('%Y-%m-%d')
         start_date = (datetime.now() - timedelta(days=self.DAYS)).strftime('%Y-%m-%d')
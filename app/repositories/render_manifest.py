@@ -0,0 +1,52 @@
+"""
+報表圖片繪製清單
+
+以單一 JSON（{圖片檔名: 輸入指紋}）記錄每張圖片繪製時的輸入。指紋涵蓋交易紀錄、圖中的 summary 與繪圖程式版本，
+與清單相同且圖片仍存在時不重新繪製；大部分日子只有少數 (股票, 策略) 有新交易。
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict
+
+import pandas as pd
+
+_DIGEST_SIZE = 16
+
+
+def fingerprint(version: int, *frames: pd.DataFrame) -> str:
+    """繪圖程式版本 + 各 DataFrame 欄位名稱與內容的雜湊"""
+    digest = hashlib.blake2b(str(version).encode('utf-8'), digest_size=_DIGEST_SIZE)
+    for df in frames:
+        digest.update(json.dumps([str(column) for column in df.columns]).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class RenderManifest:
+    FILENAME = 'render_manifest.json'
+
+    def __init__(self, path: Path):
+        """
+        :param path: 清單檔路徑，例如 output/render_manifest.json
+        """
+        self.path = Path(path)
+        self._fingerprints: Dict[str, str] = {}
+        if self.path.exists():
+            self._fingerprints = json.loads(self.path.read_text(encoding='utf-8'))
+
+    def is_current(self, image_path: Path, value: str) -> bool:
+        """圖片存在且上次繪製時的指紋相同"""
+        return self._fingerprints.get(image_path.name) == value and image_path.exists()
+
+    def mark(self, image_path: Path, value: str) -> None:
+        """記錄圖片已以指紋 value 的輸入繪製（呼叫 save() 才寫入檔案）"""
+        self._fingerprints[image_path.name] = value
+
+    def save(self) -> None:
+        """以暫存檔 + os.replace 原子寫入"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        tmp.write_text(json.dumps(self._fingerprints, sort_keys=True), encoding='utf-8')
+        os.replace(tmp, self.path)
@@ -0,0 +1,106 @@
+"""
+HTML 報表內嵌資料（--charts inline）
+
+取代每個 (股票, 策略) 一張 matplotlib PNG：各市場以一次排序查詢讀出資產曲線與最新 summary，
+整份報表只輸出一份精簡 JSON，由瀏覽器在展開列時才繪製折線圖。
+
+    {"v": 1, "summary_columns": [...],
+     "summaries": {"TW/0050/bt_dividend": [date, close, ...]},
+     "curves": {"TW/0050/bt_dividend": {"d0": "第一筆日期", "dd": [與前一筆相差的天數, ...],
+                                         "pv": [position_value, ...], "av": [asset_value, ...]}}}
+
+- 數值四捨五入至 2 位小數（繪圖用），NaN 為 null
+- 可選擇以 gzip + base64 嵌入（data-encoding="gzip+base64"），前端以 DecompressionStream 解壓
+"""
+import base64
+import gzip
+import json
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from app.repositories import db_schema, sync_payload
+
+VERSION = 1
+JSON = 'json'
+GZIP_BASE64 = 'gzip+base64'
+
+SUMMARY_COLUMNS = ['date', 'close', 'position_value', 'broker_dividend', 'asset_value', 'roi', 'irr']
+
+_SUMMARIES_QUERY = f"SELECT stock_id, method, {', '.join(SUMMARY_COLUMNS)} FROM {db_schema.LATEST_TABLE}"
+
+
+def _key(market: str, stock_id: str, method: str) -> str:
+    return f'{market}/{stock_id}/{method}'
+
+
+def _values(values: np.ndarray, digits: int = 2) -> list:
+    return [None if v != v else round(v, digits) for v in values.tolist()]
+
+
+def equity_curves(conn: sqlite3.Connection, market: str) -> Dict[str, dict]:
+    """
+    各組合的資產曲線（只含有最新 summary 的組合）
+
+    :return: {'{market}/{stock_id}/{method}': 曲線}
+    """
+    df = pd.read_sql_query(sync_payload.LOGS_QUERY, conn)
+    days = pd.to_datetime(df['date']).to_numpy(dtype='datetime64[D]')
+    position_value = df['position_value'].to_numpy(dtype=float)
+    asset_value = df['asset_value'].to_numpy(dtype=float)
+    curves = {}
+    for (stock_id, method), positions in df.groupby(['stock_id', 'method'], sort=False).indices.items():
+        curves[_key(market, stock_id, method)] = {
+            'd0': str(days[positions[0]]),
+            'dd': np.diff(days[positions]).astype(int).tolist(),
+            'pv': _values(position_value[positions]),
+            'av': _values(asset_value[positions]),
+        }
+    return curves
+
+
+def latest_summaries(conn: sqlite3.Connection, market: str) -> Dict[str, list]:
+    """
+    :return: {'{market}/{stock_id}/{method}': 依 SUMMARY_COLUMNS 排列的最新 summary}
+    """
+    df = pd.read_sql_query(_SUMMARIES_QUERY, conn)
+    rows = df[SUMMARY_COLUMNS[1:]].to_numpy(dtype=float)
+    return {_key(market, stock_id, method): [day] + _values(row, 4)
+            for stock_id, method, day, row in zip(df['stock_id'], df['method'], df['date'], rows)}
+
+
+def build_payload(databases: Dict[str, Path]) -> dict:
+    """
+    :param databases: {市場標籤: 資料庫路徑}，例如 {'TW': Path('data/tw/db.sqlite')}
+    """
+    payload = {'v': VERSION, 'summary_columns': SUMMARY_COLUMNS, 'summaries': {}, 'curves': {}}
+    for market, db_path in databases.items():
+        with closing(db_schema.connect(db_path)) as conn:
+            payload['summaries'].update(latest_summaries(conn, market))
+            payload['curves'].update(equity_curves(conn, market))
+    return payload
+
+
+def encode(payload: dict, encoding: str = JSON) -> str:
+    """JSON 文字；GZIP_BASE64 時再以 gzip（固定 mtime，輸出可重現）壓縮並 base64 編碼"""
+    text = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    if encoding == JSON:
+        return text
+    if encoding == GZIP_BASE64:
+        return base64.b64encode(gzip.compress(text.encode('utf-8'), mtime=0)).decode('ascii')
+    raise ValueError(f"Unknown encoding: {encoding}. Use one of {(JSON, GZIP_BASE64)}.")
+
+
+def script_tag(payload: dict, encoding: str = JSON) -> str:
+    """內嵌於 HTML 的 <script type="application/json">（跳脫 </ 避免提早結束 script）"""
+    body = encode(payload, encoding).replace('</', '<\\/')
+    return f'<script type="application/json" id="report-data" data-encoding="{encoding}">{body}</script>'
+
+
+def file_sizes(path: Path, pattern: str = '*.png') -> List[int]:
+    """目錄中符合 pattern 的各檔案位元組數（用於與 PNG 輸出比較）"""
+    return [file.stat().st_size for file in Path(path).glob(pattern)]
@@ -0,0 +1,182 @@
+"""
+回測結果寫入器
+
+原本每個寫入函式各自 sqlite3.connect、寫入並 commit，每次 commit 都會 fsync。
+SqliteResultSink 整個執行期間共用一條連線（WAL、synchronous=NORMAL 等設定），
+先緩衝所有策略、所有股票的交易紀錄 / summary / 檢查點，緩衝列數達 batch_rows 或 close() 時
+在單一明確交易內以 executemany 一次寫入，並統計寫入速度（rows/sec）。
+連線時確保 schema（索引、latest_bt_summaries）為最新版本，寫入 summary 時同步更新最新 summary。
+批次帶有 retain 時，同一交易內先刪除不在其中的 (stock_id, method) 的所有資料。
+"""
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from app.repositories import db_schema
+from app.repositories.bt_checkpoint import CheckpointStore
+from app.repositories.bt_engine import BacktestBatch
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WriteStats:
+    rows: int = 0
+    seconds: float = 0.
+    transactions: int = 0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.
+
+    def __str__(self) -> str:
+        return (f'{self.rows} 列 / {self.transactions} 次交易 / {self.seconds:.3f} 秒'
+                f'（{self.rows_per_second:,.0f} rows/sec）')
+
+
+class SqliteResultSink:
+    PRAGMAS = (
+        'journal_mode=WAL',
+        # WAL 下 NORMAL 只在 checkpoint 時 fsync，斷電最多遺失最後一筆交易，不會損毀資料庫
+        'synchronous=NORMAL',
+        'temp_store=MEMORY',
+        'cache_size=-65536',
+        'busy_timeout=5000',
+    )
+
+    # 緩衝列數達此值時寫入；同一次 add 的資料不會拆到不同交易
+    BATCH_ROWS = 200_000
+
+    LOG_COLUMNS = ('stock_id, date, method, position_size, position_price, position_value, '
+                   'date_closed_price, broker_dividend, asset_value')
+    SUMMARY_COLUMNS = db_schema.SUMMARY_COLUMNS
+
+    def __init__(self, db_path: Path, logs_table: str, summaries_table: str,
+                 checkpoint_store: Optional[CheckpointStore] = None, batch_rows: int = BATCH_ROWS):
+        """
+        :param db_path: SQLite 資料庫路徑
+        :param logs_table: 交易紀錄資料表
+        :param summaries_table: summary 資料表
+        :param checkpoint_store: 增量回測的檢查點（寫入檢查點時必填）
+        :param batch_rows: 緩衝列數上限
+        """
+        self.db_path = db_path
+        self.logs_table = logs_table
+        self.summaries_table = summaries_table
+        self.checkpoint_store = checkpoint_store or CheckpointStore(db_path)
+        self.batch_rows = batch_rows
+        self.stats = WriteStats()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._logs: List[tuple] = []
+        self._summaries: List[tuple] = []
+        self._resumed: List[tuple] = []
+        self._checkpoints: List[tuple] = []
+        self._retain: List[tuple] = []
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # isolation_level=None：由 flush() 明確 BEGIN / COMMIT
+            self._conn = sqlite3.connect(self.db_path, isolation_level=None)
+            for pragma in self.PRAGMAS:
+                self._conn.execute(f'PRAGMA {pragma}')
+            db_schema.ensure_schema(self._conn)
+        return self._conn
+
+    @property
+    def pending(self) -> int:
+        return len(self._logs) + len(self._summaries) + len(self._checkpoints)
+
+    def add(self, batch: BacktestBatch, incremental: bool = False) -> None:
+        """
+        緩衝一批回測結果
+
+        :param batch: 回測結果
+        :param incremental: 增量回測：寫入前刪除檢查點之後的舊交易紀錄與該組合的舊 summary（每組合只保留目前一列），
+            並更新檢查點
+        """
+        self._logs.extend(batch.logs)
+        self._summaries.extend(batch.summaries)
+        self._retain.extend(batch.retain)
+        if incremental:
+            self._resumed.extend(batch.resumed)
+            self._checkpoints.extend(batch.checkpoints)
+        if self.pending >= self.batch_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        """在單一交易內寫入所有緩衝資料；失敗時回復整個交易並拋出例外（緩衝資料不保留，執行應視為失敗）"""
+        if not self.pending and not self._resumed and not self._retain:
+            return
+        start = time.perf_counter()
+        rows = self.pending
+        cur = self.connection.cursor()
+        try:
+            cur.execute('BEGIN')
+            self._write(cur)
+            cur.execute('COMMIT')
+        except sqlite3.Error:
+            logger.exception("寫入回測結果失敗，回復交易（%d 列）", rows)
+            cur.execute('ROLLBACK')
+            raise
+        finally:
+            self._reset()
+        self.stats.rows += rows
+        self.stats.transactions += 1
+        self.stats.seconds += time.perf_counter() - start
+
+    def _prune(self, cur: sqlite3.Cursor) -> None:
+        """
+        刪除不在 retain 中的 (stock_id, method) 的交易紀錄、summary、最新 summary 與檢查點；
+        包含舊版寫入、stock_id 為 NULL 而無法歸屬任何股票的配息列
+        """
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS retained_pairs (stock_id TEXT, method TEXT, "
+                    "PRIMARY KEY (stock_id, method))")
+        cur.execute("DELETE FROM temp.retained_pairs")
+        cur.executemany("INSERT OR IGNORE INTO temp.retained_pairs VALUES (?, ?)", self._retain)
+        for table in (self.logs_table, self.summaries_table, db_schema.LATEST_TABLE, CheckpointStore.TABLE):
+            cur.execute(f"DELETE FROM {table} WHERE NOT EXISTS (SELECT 1 FROM temp.retained_pairs r "
+                        f"WHERE r.stock_id = {table}.stock_id AND r.method = {table}.method)")
+
+    def _write(self, cur: sqlite3.Cursor) -> None:
+        if self._resumed or self._checkpoints or self._retain:
+            self.checkpoint_store.ensure_table(cur)
+        if self._retain:
+            self._prune(cur)
+        if self._resumed:
+            cur.executemany(f"DELETE FROM {CheckpointStore.TABLE} WHERE stock_id = ? AND method = ?",
+                            [(stock_id, method) for stock_id, method, since in self._resumed if since is None])
+            cur.executemany(f"DELETE FROM {self.logs_table} WHERE stock_id = ? AND method = ? AND date > ?",
+                            [(stock_id, method, since or '') for stock_id, method, since in self._resumed])
+            # 與清空資料表重建相同，每組 (stock_id, method) 只有目前一筆 summary；本次沒有 summary 的組合不保留舊值
+            pairs = [(stock_id, method) for stock_id, method, _ in self._resumed]
+            for table in (self.summaries_table, db_schema.LATEST_TABLE):
+                cur.executemany(f"DELETE FROM {table} WHERE stock_id = ? AND method = ?", pairs)
+        cur.executemany(f"INSERT INTO {self.logs_table} ({self.LOG_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        self._logs)
+        cur.executemany(f"INSERT INTO {self.summaries_table} ({self.SUMMARY_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        self._summaries)
+        db_schema.upsert_latest(cur, self._summaries)
+        if self._checkpoints:
+            self.checkpoint_store.save(cur, self._checkpoints)
+
+    def close(self) -> None:
+        """寫入剩餘緩衝並關閉連線"""
+        try:
+            self.flush()
+        finally:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __enter__(self) -> 'SqliteResultSink':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,63 @@
+"""
+分割跳動偵測
+
+相鄰交易日價格比值（漲、跌取較大者）超過閾值視為股票分割/反分割事件。
+- jump_ratios：單一股票，供增量檢查只計算邊界 K 棒與新 K 棒
+- audit_splits：整個追蹤清單的價格面板（交易日 × 股票）一次向量化計算，供定期全量稽核
+"""
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+
+def jump_ratios(prices: np.ndarray) -> np.ndarray:
+    """相鄰價格比值，上漲與下跌取較大者（長度為 len(prices) - 1）"""
+    prices = np.asarray(prices, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = prices[1:] / prices[:-1]
+        return np.fmax(ratios, 1 / ratios)
+
+
+def max_jump(prices: np.ndarray) -> float:
+    """最大相鄰比值；不足兩筆或全為缺值時回傳 0"""
+    ratios = jump_ratios(prices)
+    ratios = ratios[~np.isnan(ratios)]
+    return float(ratios.max()) if len(ratios) else 0.
+
+
+def price_panel(frames: Dict[str, pd.DataFrame], column: str) -> pd.DataFrame:
+    """
+    合併多檔股票為價格面板
+
+    :param frames: {股票代號: 含 date 與價格欄位的 DataFrame}
+    :param column: 價格欄位
+    :return: index 為交易日、欄位為股票代號的 DataFrame（未交易為 NaN）
+    """
+    series = {stock_id: df.assign(date=pd.to_datetime(df['date'])).set_index('date')[column]
+              for stock_id, df in frames.items()}
+    return pd.concat(series, axis=1).sort_index()
+
+
+def audit_splits(panel: pd.DataFrame, threshold: float) -> pd.DataFrame:
+    """
+    一次計算面板中所有股票的相鄰比值，列出超過閾值的事件
+
+    停牌或未上市造成的缺值，以前一個有價格的交易日比較。
+
+    :param panel: price_panel 的價格面板
+    :param threshold: 比值閾值
+    :return: 欄位 stock_id / date / prev_price / price / ratio，無事件時為空
+    """
+    previous = panel.ffill().shift(1)
+    values, prev = panel.to_numpy(dtype=float), previous.to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = np.fmax(values / prev, prev / values)
+    rows, cols = np.nonzero(ratios > threshold)
+    return pd.DataFrame({
+        'stock_id': panel.columns[cols].astype(str),
+        'date': panel.index[rows],
+        'prev_price': prev[rows, cols],
+        'price': values[rows, cols],
+        'ratio': ratios[rows, cols],
+    }).sort_values(['stock_id', 'date'], ignore_index=True)
@@ -0,0 +1,144 @@
+"""
+台股分割資料快取與調整因子
+
+FinMind `taiwan_stock_split_price` 一次回傳全市場的分割事件，原本每檔股票都重新下載一次（並等待 1 秒）。
+SplitTable 每次執行只下載一次，並以 CSV 保存於 data/tw/，當日內的後續執行直接讀檔；
+載入後依 stock_id 建立索引，每檔股票的查詢皆由記憶體取得。
+
+股價快取保存未調整的原始價格，AdjustmentFactors 為每檔股票的累積調整因子表（每個分割事件一列），
+讀取時以一次 searchsorted 與乘法得到前複權價格；新的分割只需更新因子表，不需重新下載歷史股價。
+"""
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from FinMind.data import DataLoader
+
+
+def _download(start_date: str) -> pd.DataFrame:
+    df = DataLoader().taiwan_stock_split_price(start_date=start_date)
+    time.sleep(1)
+    return df
+
+
+class SplitTable:
+    COLUMNS = ['date', 'stock_id', 'before_price', 'after_price']
+
+    # 快取有效時間（秒）
+    MAX_AGE = 23 * 60 * 60
+
+    # 同一執行中共用的實例 {(start_date, cache_path): SplitTable}
+    _shared: Dict[tuple, 'SplitTable'] = {}
+
+    def __init__(self, start_date: str, cache_path: Optional[Path] = None,
+                 fetch: Callable[[str], pd.DataFrame] = _download):
+        """
+        :param start_date: 分割資料起始日期
+        :param cache_path: 快取檔路徑，預設 data/tw/split_price_{start_date}.csv
+        :param fetch: 下載函式（測試時替換）
+        """
+        self.start_date = start_date
+        self.cache_path = Path(cache_path or f'data/tw/split_price_{start_date}.csv')
+        self._fetch = fetch
+        self._by_stock: Optional[Dict[str, pd.DataFrame]] = None
+        # 下載失敗時為 False，呼叫端應沿用既有的調整因子
+        self.available = True
+
+    @classmethod
+    def shared(cls, start_date: str, cache_path: Optional[Path] = None) -> 'SplitTable':
+        """取得本次執行共用的分割資料"""
+        key = (start_date, cache_path)
+        if key not in cls._shared:
+            cls._shared[key] = cls(start_date, cache_path)
+        return cls._shared[key]
+
+    def _is_fresh(self) -> bool:
+        return self.cache_path.exists() and time.time() - os.path.getmtime(self.cache_path) < self.MAX_AGE
+
+    def _load(self) -> pd.DataFrame:
+        if self._is_fresh():
+            return pd.read_csv(self.cache_path, dtype={'stock_id': str})
+        try:
+            df = self._fetch(self.start_date)
+        except Exception as e:
+            # 本次執行不再重試，避免每檔股票各失敗一次
+            print(f'[WARNING] 無法取得分割資料，沿用既有調整因子: {e}')
+            self.available = False
+            return pd.DataFrame(columns=self.COLUMNS)
+        df = df[self.COLUMNS] if not df.empty else pd.DataFrame(columns=self.COLUMNS)
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        df.to_csv(self.cache_path, encoding='utf_8_sig', index=False)
+        return df
+
+    def for_stock(self, stock_id: str) -> pd.DataFrame:
+        """
+        取得單一股票的分割事件（依日期排序，date 為 datetime）
+
+        :param stock_id: 股票代號
+        :return: 含 date / before_price / after_price 的 DataFrame，無事件時為空
+        """
+        if self._by_stock is None:
+            df = self._load()
+            df = df.assign(date=pd.to_datetime(df['date']), stock_id=df['stock_id'].astype(str))
+            self._by_stock = {stock_id: group.sort_values('date').reset_index(drop=True)
+                              for stock_id, group in df.groupby('stock_id')}
+        return self._by_stock.get(str(stock_id), pd.DataFrame(columns=self.COLUMNS))
+
+
+class AdjustmentFactors:
+    COLUMNS = ['date', 'factor', 'cumulative']
+
+    def __init__(self, dates: np.ndarray, factors: np.ndarray):
+        """
+        :param dates: 分割日期（已排序）
+        :param factors: 每個事件的調整因子 after_price / before_price
+        """
+        self.dates = np.asarray(dates, dtype='datetime64[ns]')
+        self.factors = np.asarray(factors, dtype=float)
+        # cumulative[i]：第 i 個事件之前（且在前一事件當日或之後）的價格所需乘上的累積因子
+        self.cumulative = np.cumprod(self.factors[::-1])[::-1]
+
+    @classmethod
+    def from_splits(cls, splits: pd.DataFrame) -> 'AdjustmentFactors':
+        """由 SplitTable.for_stock 的分割事件建立"""
+        return cls(pd.to_datetime(splits['date']).values,
+                   (splits['after_price'] / splits['before_price']).to_numpy(dtype=float))
+
+    @classmethod
+    def load(cls, path: Path) -> Optional['AdjustmentFactors']:
+        if not Path(path).exists():
+            return None
+        df = pd.read_csv(path)
+        return cls(pd.to_datetime(df['date']).values, df['factor'].to_numpy(dtype=float))
+
+    def save(self, path: Path) -> None:
+        df = pd.DataFrame({'date': pd.DatetimeIndex(self.dates).strftime('%Y-%m-%d'),
+                           'factor': self.factors, 'cumulative': self.cumulative}, columns=self.COLUMNS)
+        df.to_csv(path, encoding='utf_8_sig', index=False)
+
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, AdjustmentFactors) and np.array_equal(self.dates, other.dates)
+                and np.array_equal(self.factors, other.factors))
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def multipliers(self, dates: np.ndarray) -> np.ndarray:
+        """每個交易日的累積調整因子：日期早於分割日的價格乘上該事件及之後所有事件的因子"""
+        suffix = np.append(self.cumulative, 1.)
+        return suffix[np.searchsorted(self.dates, np.asarray(dates, dtype='datetime64[ns]'), side='right')]
+
+    def apply(self, df: pd.DataFrame, columns: list) -> pd.DataFrame:
+        """
+        回傳前複權後的新 DataFrame（不修改 df）
+
+        :param df: 含 date 欄位的原始股價
+        :param columns: 需調整的價格欄位
+        """
+        if not len(self):
+            return df
+        multiplier = self.multipliers(pd.to_datetime(df['date']).values)
+        return df.assign(**{col: df[col] * multiplier for col in columns if col in df.columns})
@@ -0,0 +1,213 @@
+"""
+Firebase 同步帳本（差異同步）
+
+每次通知原本都覆寫所有策略、所有股票的完整交易紀錄，但每檔每天最多只多一列。
+firebase_sync_ledger 資料表記錄每個已同步路徑的內容雜湊與列數，上傳前逐節點比對：
+
+- 一般節點（summaries、recent_transaction_logs）雜湊相同即略過，不同則整個覆寫
+- 集合節點（{method}/transaction_logs）每檔股票各為一個路徑；列雜湊為鏈式雜湊，
+  帳本內容是新內容的前綴時只以陣列索引子路徑追加新列，否則覆寫該股票
+- 帳本有、本次沒有的股票以 None 刪除；集合第一次同步或格式標記改變時整個覆寫，清除舊子節點
+- 子節點不是列（例如分頁的欄位式編碼）時整個子節點比對，只有內容改變的頁會上傳
+- 上傳全部成功後才寫入帳本；失敗時下次重新比對、重新上傳
+"""
+import hashlib
+import json
+import sqlite3
+from contextlib import closing
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.repositories import db_schema
+
+Entry = Tuple[str, int]
+
+_DIGEST_SIZE = 16
+EMPTY_HASH = hashlib.blake2b(digest_size=_DIGEST_SIZE).hexdigest()
+
+
+def _encode(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def chain_hashes(rows: list) -> Tuple[List[bytes], List[int]]:
+    """
+    :return: (hashes, sizes)；hashes[n] 為前 n 列的鏈式雜湊，sizes[i] 為第 i 列的 JSON 位元組數
+    """
+    digest = bytes.fromhex(EMPTY_HASH)
+    hashes, sizes = [digest], []
+    for row in rows:
+        encoded = _encode(row)
+        digest = hashlib.blake2b(digest + encoded, digest_size=_DIGEST_SIZE).digest()
+        hashes.append(digest)
+        sizes.append(len(encoded))
+    return hashes, sizes
+
+
+def _array_size(sizes: List[int]) -> int:
+    return 2 + sum(sizes) + max(len(sizes) - 1, 0)
+
+
+@dataclass
+class SyncStats:
+    uploaded_bytes: int = 0
+    skipped_bytes: int = 0
+    uploaded_nodes: int = 0
+    skipped_nodes: int = 0
+    appended_rows: int = 0
+    deleted_nodes: int = 0
+
+    @property
+    def saved_ratio(self) -> float:
+        total = self.uploaded_bytes + self.skipped_bytes
+        return self.skipped_bytes / total if total else 0.
+
+    def __str__(self) -> str:
+        return (f'上傳 {self.uploaded_bytes:,} bytes / 略過 {self.skipped_bytes:,} bytes（節省 {self.saved_ratio:.1%}）；'
+                f'節點 上傳 {self.uploaded_nodes} / 略過 {self.skipped_nodes} / 刪除 {self.deleted_nodes}，'
+                f'追加 {self.appended_rows} 列')
+
+
+@dataclass
+class DeltaPlan:
+    updates: Dict[str, object] = field(default_factory=dict)
+    entries: Dict[str, Entry] = field(default_factory=dict)
+    removed: List[str] = field(default_factory=list)
+    stats: SyncStats = field(default_factory=SyncStats)
+
+    def upload(self, updates: Dict[str, object], size: int, full_size: int) -> None:
+        self.updates.update(updates)
+        self.stats.uploaded_bytes += size
+        self.stats.skipped_bytes += full_size - size
+        self.stats.uploaded_nodes += 1
+
+    def skip(self, full_size: int) -> None:
+        self.stats.skipped_bytes += full_size
+        self.stats.skipped_nodes += 1
+
+    def remove(self, path: str) -> None:
+        self.updates[path] = None
+        self.removed.append(path)
+        self.stats.deleted_nodes += 1
+
+
+def _plan_node(plan: DeltaPlan, path: str, value, entry: Optional[Entry]) -> None:
+    encoded = _encode(value)
+    digest = hashlib.blake2b(encoded, digest_size=_DIGEST_SIZE).hexdigest()
+    plan.entries[path] = (digest, len(value) if isinstance(value, (list, dict)) else 0)
+    if entry is not None and entry[0] == digest:
+        plan.skip(len(encoded))
+    else:
+        plan.upload({path: value}, len(encoded), len(encoded))
+
+
+def _plan_rows(plan: DeltaPlan, path: str, rows: list, entry: Optional[Entry]) -> None:
+    hashes, sizes = chain_hashes(rows)
+    full_size = _array_size(sizes)
+    plan.entries[path] = (hashes[-1].hex(), len(rows))
+    stored_hash, count = entry if entry is not None else (None, 0)
+    if count == len(rows) and hashes[-1].hex() == stored_hash:
+        plan.skip(full_size)
+    elif 0 < count < len(rows) and hashes[count].hex() == stored_hash:
+        # 舊內容是前綴：只追加新列（Firebase 陣列以索引為子鍵）
+        plan.upload({f'{path}/{i}': rows[i] for i in range(count, len(rows))}, sum(sizes[count:]), full_size)
+        plan.stats.appended_rows += len(rows) - count
+    else:
+        plan.upload({path: rows}, full_size, full_size)
+
+
+def _nest(children: Dict[str, object]) -> dict:
+    """{'0050/0': 頁} → {'0050': {'0': 頁}}（整個集合覆寫時，子鍵不可含 /）"""
+    nested = {}
+    for key, value in children.items():
+        *parents, leaf = key.split('/')
+        node = nested
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[leaf] = value
+    return nested
+
+
+def _child_entry(value) -> Tuple[Entry, int]:
+    if isinstance(value, list):
+        hashes, sizes = chain_hashes(value)
+        return (hashes[-1].hex(), len(value)), _array_size(sizes)
+    encoded = _encode(value)
+    return (hashlib.blake2b(encoded, digest_size=_DIGEST_SIZE).hexdigest(), 0), len(encoded)
+
+
+def _plan_collection(plan: DeltaPlan, path: str, children: Dict[str, object], ledger: Dict[str, Entry],
+                     tag: str = EMPTY_HASH) -> None:
+    prefix = f'{path}/'
+    plan.entries[path] = (tag, len(children))
+    stale = [p for p in ledger if p.startswith(prefix) and p[len(prefix):] not in children]
+    if ledger.get(path, (None,))[0] != tag:
+        # 第一次同步或格式改變：整個集合覆寫，清除帳本建立前（或舊格式）的子節點
+        # 位元組數只計各子節點（與之後逐子節點比對的計算方式一致）
+        full_size = 0
+        for key, value in children.items():
+            plan.entries[prefix + key], size = _child_entry(value)
+            full_size += size
+        plan.upload({path: _nest(children)}, full_size, full_size)
+        plan.removed.extend(stale)
+        return
+    for key, value in children.items():
+        if isinstance(value, list):
+            _plan_rows(plan, prefix + key, value, ledger.get(prefix + key))
+        else:
+            _plan_node(plan, prefix + key, value, ledger.get(prefix + key))
+    for stale_path in stale:
+        plan.remove(stale_path)
+
+
+def plan_delta(nodes: Dict[str, object], collections: Dict[str, Dict[str, object]],
+               ledger: Dict[str, Entry], tags: Optional[Dict[str, str]] = None) -> DeltaPlan:
+    """
+    比對帳本，產生需要上傳的多路徑更新
+
+    :param nodes: {路徑: 值}，整個節點比對
+    :param collections: {路徑: {子鍵: 值}}，每個子鍵各自比對；值為列（list）時可追加，子鍵可含 / 表示更深的路徑
+    :param ledger: SyncLedger.load() 的結果
+    :param tags: {集合路徑: 格式標記}，標記與帳本不同時整個集合覆寫
+    """
+    plan = DeltaPlan()
+    for path, value in nodes.items():
+        _plan_node(plan, path, value, ledger.get(path))
+    for path, children in collections.items():
+        _plan_collection(plan, path, children, ledger, (tags or {}).get(path, EMPTY_HASH))
+    return plan
+
+
+class SyncLedger:
+    TABLE = 'firebase_sync_ledger'
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+
+    def ensure_table(self, cur: sqlite3.Cursor) -> None:
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {self.TABLE} ( \
+            path TEXT NOT NULL PRIMARY KEY, hash TEXT NOT NULL, row_count INTEGER NOT NULL)")
+
+    def load(self) -> Dict[str, Entry]:
+        with closing(db_schema.connect(self.db_path)) as conn:
+            cur = conn.cursor()
+            self.ensure_table(cur)
+            cur.execute(f"SELECT path, hash, row_count FROM {self.TABLE}")
+            return {path: (digest, row_count) for path, digest, row_count in cur.fetchall()}
+
+    def save(self, plan: DeltaPlan) -> None:
+        """上傳成功後寫入本次比對結果"""
+        with closing(db_schema.connect(self.db_path)) as conn, conn:
+            cur = conn.cursor()
+            self.ensure_table(cur)
+            cur.executemany(f"DELETE FROM {self.TABLE} WHERE path = ?", [(path,) for path in plan.removed])
+            cur.executemany(f"INSERT OR REPLACE INTO {self.TABLE} (path, hash, row_count) VALUES (?, ?, ?)",
+                            [(path, digest, count) for path, (digest, count) in plan.entries.items()])
+
+    def clear(self) -> None:
+        """清空帳本；下次同步會整個覆寫所有節點"""
+        with closing(db_schema.connect(self.db_path)) as conn, conn:
+            cur = conn.cursor()
+            self.ensure_table(cur)
+            cur.execute(f"DELETE FROM {self.TABLE}")
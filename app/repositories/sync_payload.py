@@ -0,0 +1,68 @@
+"""
+WebDataSync 的 Firebase payload
+
+原本每個策略先查最新 summary，再對每檔股票各開一條連線查一次交易紀錄（N+1 查詢），並逐格 format_float。
+改為同一條連線上各一次排序好的查詢：最新 summary 依策略分組；交易紀錄依 (stock_id, method, date)
+索引順序以游標串流讀出，不經 DataFrame，逐列格式化後在記憶體中分組。payload 內容與順序與原寫法相同
+（唯一差異：交易紀錄中的 NULL 維持 None，原寫法經 DataFrame 會在同欄有數值時變成 'nan'）。
+"""
+import sqlite3
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, List
+
+import pandas as pd
+
+from app.repositories import db_schema
+from app.utils.formatting import format_float
+
+SUMMARIES_QUERY = f"""
+    SELECT {db_schema.SUMMARY_COLUMNS}
+    FROM {db_schema.LATEST_TABLE}
+    ORDER BY method, stock_id
+"""
+
+# 只讀有最新 summary 的組合；依索引順序讀出，同日多筆維持原本的寫入順序
+LOGS_QUERY = f"""
+    SELECT tl.*
+    FROM {db_schema.LATEST_TABLE} latest
+    INNER JOIN {db_schema.LOGS_TABLE} tl INDEXED BY idx_{db_schema.LOGS_TABLE}_stock_method_date
+        ON tl.stock_id = latest.stock_id AND tl.method = latest.method
+    ORDER BY tl.stock_id, tl.method, tl.date
+"""
+
+RECENT_QUERY = f"""
+    SELECT stock_id, date, date_closed_price, method
+    FROM {db_schema.LOGS_TABLE}
+    WHERE date BETWEEN ? AND ?
+"""
+
+
+def recent_logs(conn: sqlite3.Connection, start_date: str, end_date: str) -> List[dict]:
+    """區間內的交易紀錄（不格式化）"""
+    return pd.read_sql_query(RECENT_QUERY, conn, params=(start_date, end_date)).to_dict('records')
+
+
+def method_summaries(conn: sqlite3.Connection) -> Dict[str, List[dict]]:
+    """
+    各策略的最新 summary
+
+    :return: {method: [summary, ...]}，依 stock_id 排序
+    """
+    df = pd.read_sql_query(SUMMARIES_QUERY, conn).map(format_float)
+    return {method: list(rows) for method, rows in groupby(df.to_dict('records'), key=itemgetter('method'))}
+
+
+def method_transaction_logs(conn: sqlite3.Connection) -> Dict[str, Dict[str, List[dict]]]:
+    """
+    各策略、各股票的交易紀錄
+
+    :return: {method: {stock_id: [交易紀錄, ...]}}，stock_id 依序排列、交易紀錄依日期排序
+    """
+    cur = conn.execute(LOGS_QUERY)
+    columns = [description[0] for description in cur.description]
+    records = (dict(zip(columns, map(format_float, row))) for row in cur)
+    payloads: Dict[str, Dict[str, List[dict]]] = {}
+    for (stock_id, method), rows in groupby(records, key=itemgetter('stock_id', 'method')):
+        payloads.setdefault(method, {})[stock_id] = list(rows)
+    return payloads
@@ -0,0 +1,73 @@
+"""
+增量尾段擷取
+
+快取過期時不再自 start_date 重新下載完整歷史，而是自快取最後一筆往前 overlap_days 天開始擷取，
+以尾段取代快取中相同日期之後的資料。重疊區間與快取逐欄比對，數值不同時（資料源回溯修正、
+Tiingo 配息/分割後重算 adjClose）視為整段歷史已改寫，改為自 start_date 完整擷取。
+"""
+from typing import Callable, Iterable
+
+import numpy as np
+import pandas as pd
+
+
+def tail_start(last_date, start_date: str, overlap_days: int) -> str:
+    """
+    尾段擷取起始日（不早於 start_date）
+
+    :param last_date: 快取最後一筆日期
+    :param start_date: 完整擷取的起始日期
+    :param overlap_days: 與快取重疊的日曆天數
+    """
+    start = max(pd.Timestamp(last_date) - pd.Timedelta(days=overlap_days), pd.Timestamp(start_date))
+    return start.strftime('%Y-%m-%d')
+
+
+def is_restated(cached: pd.DataFrame, fetched: pd.DataFrame, columns: Iterable[str]) -> bool:
+    """
+    重疊日期的指定欄位是否與快取不同；沒有重疊日期時無法驗證，亦視為不同
+
+    :param cached: 快取資料（date 為 datetime）
+    :param fetched: 尾段資料（date 為 datetime）
+    :param columns: 比對欄位（兩者皆有的欄位才比對）
+    """
+    columns = [col for col in columns if col in cached.columns and col in fetched.columns]
+    overlap = cached[['date'] + columns].merge(fetched[['date'] + columns], on='date', suffixes=('', '_new'))
+    if overlap.empty:
+        return True
+    return not all(np.allclose(overlap[col].to_numpy(dtype=float), overlap[f'{col}_new'].to_numpy(dtype=float),
+                               rtol=1e-6, atol=0, equal_nan=True) for col in columns)
+
+
+def merge_tail(cached: pd.DataFrame, fetched: pd.DataFrame) -> pd.DataFrame:
+    """以尾段取代快取中尾段首日（含）之後的資料"""
+    head = cached[cached['date'] < fetched['date'].min()]
+    return pd.concat([head, fetched], ignore_index=True).sort_values('date', kind='stable').reset_index(drop=True)
+
+
+def refresh_tail(cached: pd.DataFrame, fetch: Callable[[str], pd.DataFrame], start_date: str,
+                 overlap_days: int, columns: Iterable[str], name: str = '') -> pd.DataFrame:
+    """
+    擷取尾段並與快取合併；重疊區間不一致時改為完整擷取
+
+    :param cached: 快取資料
+    :param fetch: 擷取函式，參數為起始日期
+    :param start_date: 完整擷取的起始日期
+    :param overlap_days: 與快取重疊的日曆天數
+    :param columns: 偵測回溯修正的比對欄位
+    :param name: 訊息中顯示的名稱（股票代號）
+    :return: 合併後的資料（date 為 datetime）；尾段為空時回傳快取
+    """
+    cached = cached.assign(date=pd.to_datetime(cached['date']))
+    fetched = fetch(tail_start(cached['date'].max(), start_date, overlap_days))
+    if not isinstance(fetched, pd.DataFrame) or fetched.empty:
+        return cached
+    fetched = fetched.assign(date=pd.to_datetime(fetched['date']))
+
+    if is_restated(cached, fetched, columns):
+        print(f'[WARNING] {name}: 重疊區間資料與快取不同，自 {start_date} 重新擷取完整歷史')
+        full = fetch(start_date)
+        if not isinstance(full, pd.DataFrame) or full.empty:
+            return cached
+        return full.assign(date=pd.to_datetime(full['date']))
+    return merge_tail(cached, fetched)
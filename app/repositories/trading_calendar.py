@@ -0,0 +1,102 @@
+"""
+交易日曆
+
+判斷各市場「最後一個已收盤且資料已發布的交易日」，取代以檔案修改時間（23 / 24 小時）判斷快取是否過期：
+週末、假日或同日重複執行時，沒有新的交易日收盤就不需要呼叫 FinMind / Tiingo。
+
+- 美股：NYSE 固定假日規則（元旦、MLK、總統日、耶穌受難日、國殤日、六月節、獨立日、勞動節、感恩節、聖誕節）
+- 台股：週一至週五，國定假日與颱風停市等由 app/configs/holidays.json 的 "tw" 清單補充；
+  未列入的休市日只會多擷取一次（不會漏資料）
+- ready 為當日日線視為可取得的當地時間，此時間之前當日不算已完成
+"""
+import json
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Set
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+from pandas.tseries.holiday import (AbstractHolidayCalendar, GoodFriday, Holiday, USLaborDay,
+                                    USMartinLutherKingJr, USMemorialDay, USPresidentsDay,
+                                    USThanksgivingDay, nearest_workday, sunday_to_monday)
+
+HOLIDAYS_PATH = Path('app/configs/holidays.json')
+
+
+class NYSEHolidayCalendar(AbstractHolidayCalendar):
+    rules = [
+        # 元旦逢週六時 NYSE 不補假
+        Holiday('NewYearsDay', month=1, day=1, observance=sunday_to_monday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday('Juneteenth', month=6, day=19, start_date='2022-01-01', observance=nearest_workday),
+        Holiday('USIndependenceDay', month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday('Christmas', month=12, day=25, observance=nearest_workday),
+    ]
+
+
+def _configured_holidays(market: str, path: Path = HOLIDAYS_PATH) -> Set[date]:
+    """讀取 holidays.json 中指定市場的休市日（檔案不存在時為空）"""
+    if not Path(path).exists():
+        return set()
+    with open(path, encoding='utf-8') as f:
+        return {date.fromisoformat(day) for day in json.load(f).get(market, [])}
+
+
+class TradingCalendar:
+    def __init__(self, market: str, tz: str, ready: time, holidays: Iterable[date] = (),
+                 rules: Optional[AbstractHolidayCalendar] = None, clock: Optional[Callable[[], datetime]] = None):
+        """
+        :param market: 市場代號（tw / us）
+        :param tz: 交易所時區
+        :param ready: 當日日線可取得的當地時間
+        :param holidays: 額外休市日
+        :param rules: 假日規則（美股）
+        :param clock: 目前時間（測試時替換），預設為交易所時區的現在時間
+        """
+        self.market = market
+        self.tz = ZoneInfo(tz)
+        self.ready = ready
+        self.holidays = set(holidays)
+        self.rules = rules
+        self._clock = clock or (lambda: datetime.now(self.tz))
+        self._rule_holidays: Dict[int, Set[date]] = {}
+
+    def _holidays_in(self, year: int) -> Set[date]:
+        if year not in self._rule_holidays:
+            days = self.rules.holidays(f'{year}-01-01', f'{year}-12-31') if self.rules else pd.DatetimeIndex([])
+            self._rule_holidays[year] = set(days.date)
+        return self._rule_holidays[year]
+
+    def _local(self, now: Optional[datetime] = None) -> datetime:
+        now = now or self._clock()
+        return now.replace(tzinfo=self.tz) if now.tzinfo is None else now.astimezone(self.tz)
+
+    def today(self, now: Optional[datetime] = None) -> date:
+        """交易所時區的今天"""
+        return self._local(now).date()
+
+    def is_session(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in self.holidays and day not in self._holidays_in(day.year)
+
+    def last_completed_session(self, now: Optional[datetime] = None) -> date:
+        """
+        最後一個已收盤且日線已發布的交易日
+
+        :param now: 時間點（naive 視為交易所時區），預設為目前時間
+        """
+        now = self._local(now)
+        day = now.date() if now.time() >= self.ready else now.date() - timedelta(days=1)
+        while not self.is_session(day):
+            day -= timedelta(days=1)
+        return day
+
+
+# 與 README 建議排程一致：台股 14:00 擷取當日日線；美股台北 06:00（美東 17:00 或 18:00）擷取前一交易日
+TW_CALENDAR = TradingCalendar('tw', 'Asia/Taipei', time(14, 0), _configured_holidays('tw'))
+US_CALENDAR = TradingCalendar('us', 'America/New_York', time(17, 0), _configured_holidays('us'),
+                              rules=NYSEHolidayCalendar())
@@ -1,44 +1,74 @@
 from FinMind.data import DataLoader
 from pathlib import Path
 import pandas as pd
-import os
 import time
+from app.repositories.base_trade_record import TaiwanTradeRecord
+from app.repositories.freshness_manifest import FreshnessManifest, covered_session
+from app.repositories.price_cache import ColumnarCache
+from app.repositories.tail_fetch import refresh_tail
+from app.repositories.trading_calendar import TW_CALENDAR
 
 class DividendRecord:
-    N = 1
+    COLUMNS = ['date', 'stock_and_cache_dividend', 'stock_or_cache_dividend']
+    CACHE = ColumnarCache(Path('data/tw/cache'))
+
+    # 快取過期時自最後一筆除息日往前 OVERLAP_DAYS 天擷取，重疊區間的配息金額與快取不同時完整擷取
+    OVERLAP_DAYS = 30
+    RESTATEMENT_COLUMNS = ['stock_and_cache_dividend', 'stock_or_cache_dividend']
     
     # 取得配息資料
-    # 如果本地 csv 檔案未超過效期，讀取舊檔
-    # 如果檔案不存在，或是超過效期，擷取新資料
+    # 如果台股沒有新的交易日完成，讀取舊資料（舊 CSV 於第一次讀取時轉換為欄式快取）
+    # 如果快取不存在，擷取新資料；已有新的交易日完成時只擷取最後一筆之後（含重疊區間）的資料
     def getDividendRecords(stock_id, start_date):
-        filename = Path(f'data/tw/{stock_id}-dividend.csv')
-        if not os.path.exists(filename):
+        key = f'{stock_id}-dividend'
+        cached_df = __class__.CACHE.load_or_migrate(key, Path(f'data/tw/{stock_id}-dividend.csv'))
+        if cached_df is None:
             df = __class__.fetchDividendRecords(stock_id,start_date)
             if isinstance(df, pd.DataFrame) & (df.shape[0] > 0):
-                df.to_csv(filename, encoding='utf_8_sig', index=False)
+                __class__.save(key, df, session=__class__.price_session(stock_id))
             else:
-                df = pd.DataFrame(columns=['date', 'stock_and_cache_dividend', 'stock_or_cache_dividend'])
+                df = pd.DataFrame(columns=__class__.COLUMNS)
             
-        # 如果資料超過七天未更新，則更新
-        elif __class__.is_file_older_than_7_days(filename):  
-            df = __class__.fetchDividendRecords(stock_id,start_date)
-            if isinstance(df, pd.DataFrame):
-                df.to_csv(filename, encoding='utf_8_sig', index=False)
+        # 如果快取之後已有新的交易日完成，則更新
+        elif __class__.is_cache_stale(key):
+            df = refresh_tail(cached_df, lambda start: __class__.fetchDividendRecords(stock_id, start), start_date,
+                              __class__.OVERLAP_DAYS, __class__.RESTATEMENT_COLUMNS, stock_id)
+            __class__.save(key, df, cached_df, __class__.price_session(stock_id))
             
         # 載入舊資料
         else:
-            df = pd.read_csv(filename)
+            df = cached_df
             
-        df = df[['date', 'stock_and_cache_dividend', 'stock_or_cache_dividend']]
+        df = df[__class__.COLUMNS]
         df = df.assign(date=pd.to_datetime(df['date']))
         df = df.set_index('date')
         return df
 
+    # 寫入欄式快取（只保留回測使用的欄位），並記錄已更新至 session（預設為最後完成的交易日）
+    def save(key, df, previous=None, session=None):
+        df = df[__class__.COLUMNS]
+        __class__.CACHE.save(key, df.assign(date=pd.to_datetime(df['date'])), previous)
+        __class__.freshness().mark(key, session or TW_CALENDAR.last_completed_session())
+
+    # 配息資料沒有每日 K 棒：以同一檔股價快取實際涵蓋的交易日為準（同樣來自 FinMind，
+    # 當日資料尚未發布時兩者一起延後），股價快取未記錄時為最後完成的交易日
+    def price_session(stock_id):
+        price_key = TaiwanTradeRecord().cache_key(stock_id)
+        return covered_session(TW_CALENDAR, __class__.freshness().session(price_key))
+
+    # 與台股股價快取共用的新鮮度清單
+    def freshness():
+        return FreshnessManifest.shared(__class__.CACHE.root / 'freshness.json')
+
+    # 快取記錄之後是否已有新的交易日完成
+    def is_cache_stale(key):
+        return __class__.freshness().is_stale(key, TW_CALENDAR)
 
     # 擷取新的配息資料
     def fetchDividendRecords(stock_id, start_date):
         # FinMind api 初始化
         api = DataLoader()
+        df = None
 
         try:
             df = api.taiwan_stock_dividend_result(
@@ -52,30 +82,3 @@ class DividendRecord:
         # 配息的 dataframe
         time.sleep(2)
         return df
-
-    # 輔助函式
-    def is_file_older_than_7_days(file_path):
-        # 檢查檔案是否存在
-        if not os.path.exists(file_path):
-            print(f"檔案 {file_path} 不存在")
-            return False
-
-        # 取得檔案的最後修改時間
-        file_mtime = os.path.getmtime(file_path)
-
-        # 取得當前時間
-        current_time = time.time()
-
-        # 計算檔案最後修改時間與當前時間的差異（以秒為單位）
-        time_diff = current_time - file_mtime
-
-        # 將時間差異轉換為天數
-        days_diff = time_diff / (24 * 60 * 60)
-
-        # 檢查是否超過 N 天
-        if days_diff > __class__.N:
-            #print(f"檔案 {file_path} 的更新時間超過 N 天")
-            return True
-        else:
-            #print(f"檔案 {file_path} 的更新時間未超過 N 天")
-            return False
\ No newline at end of file
@@ -1,12 +1,14 @@
-import sqlite3
+import os
 import time
 import logging
+from contextlib import closing
 from pathlib import Path
 from abc import ABC, abstractmethod
-from app.services.firebase import Firebase as DB
+from typing import Optional
+from app.repositories import compact_payload, db_schema, sync_payload
+from app.repositories.sync_ledger import SyncLedger, SyncStats, plan_delta
+from app.services.firebase import Firebase as DB, chunk_updates
 from datetime import datetime, timedelta
-import pandas as pd
-from app.utils.formatting import format_float
 
 logger = logging.getLogger(__name__)
 
@@ -14,18 +16,24 @@ _RETRY_ATTEMPTS = 3
 _RETRY_BACKOFF = 2  # seconds; doubles on each attempt
 
 
-def _sync_with_retry(node_ref: str, data) -> None:
-    """Call DB.updateNodeByDict with exponential-backoff retry."""
+def _describe(updates: dict) -> str:
+    paths = list(updates)
+    return paths[0] if len(paths) == 1 else f"{paths[0]} 等 {len(paths)} 個路徑"
+
+
+def _sync_with_retry(updates: dict) -> None:
+    """Call DB.updateNodes (one multi-path update) with exponential-backoff retry."""
     delay = _RETRY_BACKOFF
     for attempt in range(1, _RETRY_ATTEMPTS + 1):
         try:
-            DB.updateNodeByDict(node_ref, data)
+            DB.updateNodes(updates)
             return
         except Exception:
             if attempt == _RETRY_ATTEMPTS:
-                logger.error("Firebase 同步失敗（已重試 %d 次）：%s", _RETRY_ATTEMPTS, node_ref, exc_info=True)
+                logger.error("Firebase 同步失敗（已重試 %d 次）：%s", _RETRY_ATTEMPTS, _describe(updates), exc_info=True)
                 raise
-            logger.warning("Firebase 同步失敗，%d 秒後重試（第 %d/%d 次）：%s", delay, attempt, _RETRY_ATTEMPTS, node_ref)
+            logger.warning("Firebase 同步失敗，%d 秒後重試（第 %d/%d 次）：%s",
+                           delay, attempt, _RETRY_ATTEMPTS, _describe(updates))
             time.sleep(delay)
             delay *= 2
 
@@ -33,6 +41,8 @@ class WebDataSync(ABC):
     # 預設的查詢天數
     DAYS = 30
     PREFIX_URI = None
+    # columnar 格式每頁列數
+    PAGE_SIZE = compact_payload.PAGE_SIZE
 
     @property
     def DB_PATH(self):
@@ -40,78 +50,52 @@ class WebDataSync(ABC):
             raise NotImplementedError("PREFIX_URI must be defined in the subclass.")
         return Path(f'data/{self.PREFIX_URI}/db.sqlite')
 
-    def get_transaction_logs(self, row):
-        stock_id = row['stock_id']
-        method = row['method']
-
-        query = f'''
-            SELECT * FROM transaction_logs
-            WHERE stock_id = '{stock_id}' AND method = '{method}'
-            ORDER BY date
-        '''
-
-        with sqlite3.connect(self.DB_PATH) as conn:
-            logs_df = pd.read_sql_query(query, conn)
-
-        return logs_df
+    @property
+    def ledger(self) -> SyncLedger:
+        return SyncLedger(self.DB_PATH)
 
-    def do_process(self):
+    def do_process(self, full: bool = False, log_format: Optional[str] = None) -> SyncStats:
         """
-        查詢近期交易紀錄
+        查詢近期交易紀錄與各策略最新 summary / 交易紀錄，只將與同步帳本不同的節點同步至 Firebase
+
+        :param full: 忽略同步帳本，整個覆寫所有節點
+        :param log_format: 交易紀錄格式（records / columnar），None 時讀取 FIREBASE_LOG_FORMAT，預設 records
+        :return: 上傳 / 略過的位元組數
         """
-        with sqlite3.connect(self.DB_PATH) as conn:
-            # 計算最近七天的日期範圍
-            end_date = datetime.now().strftime('%Y-%m-%d')
-            start_date = (datetime.now() - timedelta(days=self.DAYS)).strftime('%Y-%m-%d')
-
-            # 查詢最近七天的交易資料
-            query = f"""
-                SELECT stock_id, date, date_closed_price, method
-                FROM 'transaction_logs'
-                WHERE date BETWEEN '{start_date}' AND '{end_date}'
-            """
-            df_recent = pd.read_sql_query(query, conn)
-                    
-        _sync_with_retry(f'{self.PREFIX_URI}/recent_transaction_logs', df_recent.to_dict('records'))
-        
-        # 查詢所有的 method
-        with sqlite3.connect(self.DB_PATH) as conn:
-            query = "SELECT DISTINCT method FROM bt_summaries"
-            methods = pd.read_sql_query(query, conn)['method'].tolist()
-
-        for method in methods:
-            # 查詢每個 method 的最新資料
-            with sqlite3.connect(self.DB_PATH) as conn:
-                query = f'''
-                    SELECT bs.*
-                    FROM bt_summaries bs
-                    INNER JOIN (
-                        SELECT stock_id, MAX(date) AS latest_date
-                        FROM bt_summaries
-                        WHERE method = '{method}'
-                        GROUP BY stock_id
-                    ) latest ON bs.stock_id = latest.stock_id AND bs.date = latest.latest_date
-                    WHERE bs.method = '{method}'
-                    ORDER BY bs.stock_id
-                '''
-                df_method = pd.read_sql_query(query, conn)
-                df_method = df_method.map(format_float)
-
-            # 將 query 結果轉存至 firebase realtime database
-            data_method_summaries = df_method.to_dict('records')
-            data_method_transaction_logs = {}
-
-            for index, row in df_method.iterrows():
-                s = self.get_transaction_logs(row)
-                s = s.map(format_float)
-                stock_id = s.stock_id.values[0]
-                data_method_transaction_logs[stock_id] = s.to_dict('records')
-
-            _sync_with_retry(f'{self.PREFIX_URI}/{method}/summaries', data_method_summaries)
-            _sync_with_retry(f'{self.PREFIX_URI}/{method}/transaction_logs', data_method_transaction_logs)
+        log_format = log_format or os.environ.get('FIREBASE_LOG_FORMAT', compact_payload.RECORDS)
+        schema = compact_payload.schema(log_format, self.PAGE_SIZE)
+
+        # 計算最近 DAYS 天的日期範圍
+        end_date = datetime.now().strftime('%Y-%m-%d')
+        start_date = (datetime.now() - timedelta(days=self.DAYS)).strftime('%Y-%m-%d')
+
+        with closing(db_schema.connect(self.DB_PATH)) as conn:
+            recent = sync_payload.recent_logs(conn, start_date, end_date)
+            summaries = sync_payload.method_summaries(conn)
+            if log_format == compact_payload.COLUMNAR:
+                transaction_logs = compact_payload.method_transaction_pages(conn, self.PAGE_SIZE)
+            else:
+                transaction_logs = sync_payload.method_transaction_logs(conn)
+
+        nodes = {f'{self.PREFIX_URI}/schema': schema, f'{self.PREFIX_URI}/recent_transaction_logs': recent}
+        collections = {}
+        for method, data_method_summaries in summaries.items():
+            nodes[f'{self.PREFIX_URI}/{method}/summaries'] = data_method_summaries
+            collections[f'{self.PREFIX_URI}/{method}/transaction_logs'] = transaction_logs.get(method, {})
+        # 格式改變時整個集合覆寫
+        tags = dict.fromkeys(collections, compact_payload.format_tag(log_format, self.PAGE_SIZE))
+        plan = plan_delta(nodes, collections, {} if full else self.ledger.load(), tags)
+
+        # 變更的節點合併為多路徑 update()，依 payload 上限分塊寫入 firebase realtime database
+        for chunk in chunk_updates(plan.updates, DB.MAX_UPDATE_BYTES):
+            _sync_with_retry(chunk)
+        self.ledger.save(plan)
+
+        logger.info("Firebase 同步 %s：%s", self.PREFIX_URI, plan.stats)
+        return plan.stats
 
 class USWebData(WebDataSync):
     PREFIX_URI = 'us'
 
 class TWWebData(WebDataSync):
-    PREFIX_URI = 'tw'
\ No newline at end of file
+    PREFIX_URI = 'tw'
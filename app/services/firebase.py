@@ -1,33 +1,106 @@
-import firebase_admin
 import json
+from typing import Iterator, List, Tuple
+
 import pandas as pd
-from firebase_admin import credentials
-from firebase_admin import db
+
+CONFIG_PATH = "app/configs/firebase_config.json"
+CRED_PATH = "app/configs/firebase-cred.json"
+
 
 def _load_firebase_config():
-    with open("app/configs/firebase_config.json", "r") as f:
+    with open(CONFIG_PATH, "r") as f:
         return json.load(f)
 
+
+def json_size(value) -> int:
+    return len(json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def _split_node(path: str, value, max_bytes: int) -> Iterator[Tuple[str, object, int]]:
+    """
+    超過上限的節點拆成：先以部分子節點覆寫整個節點（保留 set 會刪除舊子節點的語意），其餘子節點以子路徑寫入
+
+    :return: (路徑, 值, JSON 位元組數)
+    """
+    size = json_size(value)
+    if size <= max_bytes or not isinstance(value, (dict, list)) or not value:
+        yield path, value, size
+        return
+    items = value.items() if isinstance(value, dict) else ((str(i), v) for i, v in enumerate(value))
+    head, head_size, rest = {}, 2, []
+    for key, child in items:
+        child_size = json_size(child) + len(key) + 4
+        if not rest and (not head or head_size + child_size <= max_bytes):
+            head[key] = child
+            head_size += child_size
+        else:
+            rest.append((f'{path}/{key}', child, child_size))
+    yield path, head, head_size
+    yield from rest
+
+
+def chunk_updates(updates: dict, max_bytes: int) -> List[dict]:
+    """
+    將多路徑更新切成數個 JSON 不超過 max_bytes 的 update()（單一子節點本身超過上限時單獨一塊）
+
+    :param updates: {路徑: 值}，每個路徑的值整個覆寫（與 set 相同）
+    :param max_bytes: 每塊 payload 上限
+    """
+    chunks, current, current_size = [], {}, 0
+    for path, value in updates.items():
+        for sub_path, sub_value, size in _split_node(path, value, max_bytes):
+            # 節點拆開時，子路徑一定會落在覆寫節點之後的新區塊（同一次 update 不可同時含祖先與子孫路徑）
+            if current and current_size + size > max_bytes:
+                chunks.append(current)
+                current, current_size = {}, 0
+            current[sub_path] = sub_value
+            current_size += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
 class Firebase:
-    _config = _load_firebase_config()
-    DB_URL = _config["db_url"]
-    CRED = credentials.Certificate("app/configs/firebase-cred.json")
-    
-    #def __init__(self):
-    #    self.cred = 
-    
-    def updateNodeByCsv(node_ref, csv_file):
+    APP_NAME = 'stock-analysis'
+
+    # 單次 update() 的 payload 上限（Realtime Database 單次寫入上限為 16MB）
+    MAX_UPDATE_BYTES = 8 * 1024 * 1024
+
+    _app = None
+
+    @classmethod
+    def app(cls):
+        """同一程序只初始化一次 Firebase app，之後的寫入共用憑證與連線"""
+        if cls._app is None:
+            import firebase_admin
+            from firebase_admin import credentials
+
+            cls._app = firebase_admin.initialize_app(credentials.Certificate(CRED_PATH), {
+                'databaseURL': _load_firebase_config()["db_url"]
+            }, name=cls.APP_NAME)
+        return cls._app
+
+    @classmethod
+    def reference(cls, node_ref: str = '/'):
+        from firebase_admin import db
+
+        return db.reference(node_ref, app=cls.app())
+
+    @classmethod
+    def updateNodeByCsv(cls, node_ref, csv_file):
         csv_data = pd.read_csv(csv_file, dtype = {'stock_code': str})
         file_contents = csv_data.to_dict(orient='records')
-        firebase_admin.initialize_app(__class__.CRED, {
-            'databaseURL': __class__.DB_URL
-        })
-        db.reference(node_ref).set(file_contents)
-        firebase_admin.delete_app(firebase_admin.get_app())
-        
-    def updateNodeByDict(node_ref, data):
-        firebase_admin.initialize_app(__class__.CRED, {
-            'databaseURL': __class__.DB_URL
-        })
-        db.reference(node_ref).set(data)
-        firebase_admin.delete_app(firebase_admin.get_app())
\ No newline at end of file
+        cls.reference(node_ref).set(file_contents)
+
+    @classmethod
+    def updateNodeByDict(cls, node_ref, data):
+        cls.reference(node_ref).set(data)
+
+    @classmethod
+    def updateNodes(cls, updates: dict):
+        """
+        多路徑更新：單一 update() 同時覆寫多個節點
+
+        :param updates: {路徑: 值}
+        """
+        cls.reference().update(updates)
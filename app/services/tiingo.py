@@ -0,0 +1,208 @@
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import aiohttp
+import pandas as pd
+
+
+class TokenBucket:
+    """
+    非同步 token bucket：容量 capacity，每秒補充 rate 個 token。
+    收到 429 時以 pause() 讓所有等待中的請求一起暫停到指定時間。
+    指定 state_path 時以 save() 保存補滿期間內的請求時間，下次執行由此重建 token 數，
+    連續多次執行合計仍不超過配額；未指定時只在單一程序內限速。
+    """
+
+    def __init__(self, capacity: float, rate: float, state_path: Optional[Path] = None):
+        self.capacity = capacity
+        self.rate = rate
+        self.state_path = Path(state_path) if state_path is not None else None
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.
+        self._lock = None
+        self._loop = None
+        # 取得 token 的時間（epoch 秒）
+        self._requests: List[float] = []
+        if self.state_path is not None:
+            self._seed(self._load())
+
+    @property
+    def window(self) -> float:
+        """token 自 0 補滿所需秒數；更早的請求不影響目前的 token 數"""
+        return self.capacity / self.rate
+
+    def _load(self) -> List[float]:
+        if not self.state_path.exists():
+            return []
+        cutoff = time.time() - self.window
+        return sorted(t for t in json.loads(self.state_path.read_text(encoding='utf-8')) if t > cutoff)
+
+    def _seed(self, requests: List[float]) -> None:
+        """依先前執行的請求時間重播 bucket，得到目前的 token 數（可能為負，需等待補充）"""
+        tokens, last = self.capacity, None
+        for t in requests:
+            if last is not None:
+                tokens = min(self.capacity, tokens + (t - last) * self.rate)
+            tokens -= 1
+            last = t
+        if last is not None:
+            tokens = min(self.capacity, tokens + (time.time() - last) * self.rate)
+        self._tokens = tokens
+        self._requests = requests
+
+    def save(self) -> None:
+        """保存補滿期間內的請求時間（暫存檔 + os.replace 原子寫入）；未指定 state_path 時不動作"""
+        if self.state_path is None:
+            return
+        cutoff = time.time() - self.window
+        self._requests = [t for t in self._requests if t > cutoff]
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_name(self.state_path.name + '.tmp')
+        tmp.write_text(json.dumps(self._requests), encoding='utf-8')
+        os.replace(tmp, self.state_path)
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        # asyncio.Lock 綁定事件迴圈，每次 asyncio.run 需重建
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock, self._loop = asyncio.Lock(), loop
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self._requests.append(time.time())
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class TiingoError(Exception):
+    pass
+
+
+class TiingoClient:
+    """
+    Tiingo 日線 API 的非同步客戶端
+
+    - 憑證只在建立時讀取一次
+    - 單一 aiohttp.ClientSession（keep-alive 連線池），同時請求數上限 concurrency
+    - token bucket 限速，預設依 Tiingo 每小時配額補充；429 時依 Retry-After（無則指數退避）暫停後重試
+    - 指定 state_path 時跨執行保存請求時間，連續執行共用同一份每小時配額
+    """
+    BASE_URL = 'https://api.tiingo.com'
+    CONFIG_PATH = Path('app/configs/tiingo.json')
+
+    # Tiingo 免費方案每小時請求上限，可於 tiingo.json 以 hourly_quota 覆寫
+    DEFAULT_HOURLY_QUOTA = 50
+    MAX_RETRIES = 5
+    BACKOFF_SECONDS = 2
+
+    def __init__(self, token: str, base_url: str = BASE_URL, concurrency: int = 8,
+                 hourly_quota: int = DEFAULT_HOURLY_QUOTA, burst: Optional[int] = None,
+                 state_path: Optional[Path] = None):
+        """
+        :param token: Tiingo API token
+        :param base_url: API 位址（測試時指向本機 stub）
+        :param concurrency: 同時請求數上限（亦為連線池大小）
+        :param hourly_quota: 每小時請求配額，決定 token 補充速率
+        :param burst: 可連續發出的請求數，預設為 hourly_quota
+        :param state_path: 請求時間的保存檔，None 時只在單一程序內限速
+        """
+        self.token = token
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(burst or hourly_quota, hourly_quota / 3600, state_path)
+
+    @classmethod
+    def from_config(cls, path: Path = CONFIG_PATH, **kwargs) -> 'TiingoClient':
+        """由 tiingo.json 建立（token 必填，hourly_quota 選填）"""
+        with open(path) as f:
+            cred = json.load(f)
+        if 'hourly_quota' in cred:
+            kwargs.setdefault('hourly_quota', cred['hourly_quota'])
+        return cls(cred['token'], **kwargs)
+
+    async def _get_json(self, session: aiohttp.ClientSession, url: str, params: dict):
+        for attempt in range(self.MAX_RETRIES + 1):
+            await self.bucket.acquire()
+            async with session.get(url, params=params) as r:
+                if r.status == 429:
+                    wait = self._retry_after(r.headers.get('Retry-After'), attempt)
+                    print(f'[WARNING] Tiingo 429，{wait:.0f} 秒後重試: {url}')
+                    self.bucket.pause(wait)
+                    continue
+                if r.status != 200:
+                    raise TiingoError(f'{url}: HTTP {r.status} {await r.text()}')
+                return await r.json()
+        raise TiingoError(f'{url}: 超過重試次數')
+
+    def _retry_after(self, header: Optional[str], attempt: int) -> float:
+        """Retry-After 秒數；缺少或為 HTTP 日期格式時改用指數退避"""
+        try:
+            return float(header)
+        except (TypeError, ValueError):
+            return self.BACKOFF_SECONDS * 2 ** attempt
+
+    async def daily_prices(self, session: aiohttp.ClientSession, stock_id: str, start_date: str) -> pd.DataFrame:
+        """取得單一股票自 start_date 起的日線（date 為 YYYY-MM-DD 字串）"""
+        url = f'{self.base_url}/tiingo/daily/{stock_id}/prices'
+        data = await self._get_json(session, url, {'startDate': start_date, 'token': self.token})
+        df = pd.DataFrame(data)
+        return df.assign(date=pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d'))
+
+    async def fetch_since_async(self, starts: Dict[str, str],
+                                return_exceptions: bool = False) -> Dict[str, Union[pd.DataFrame, BaseException]]:
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def fetch(stock_id: str) -> pd.DataFrame:
+                async with semaphore:
+                    return await self.daily_prices(session, stock_id, starts[stock_id])
+
+            try:
+                frames = await asyncio.gather(*(fetch(stock_id) for stock_id in starts),
+                                              return_exceptions=return_exceptions)
+            finally:
+                self.bucket.save()
+        return dict(zip(starts, frames))
+
+    async def fetch_many_async(self, stock_ids: Iterable[str], start_date: str) -> Dict[str, pd.DataFrame]:
+        return await self.fetch_since_async({stock_id: start_date for stock_id in stock_ids})
+
+    def fetch_since(self, starts: Dict[str, str],
+                    return_exceptions: bool = False) -> Dict[str, Union[pd.DataFrame, BaseException]]:
+        """
+        同步介面：並行取得多檔股票日線，每檔各自的起始日期（增量擷取尾段）
+
+        :param starts: {股票代號: 起始日期}
+        :param return_exceptions: 單檔失敗時以例外作為該檔的值，不中斷其他股票
+        :return: {股票代號: 日線 DataFrame}
+        """
+        return asyncio.run(self.fetch_since_async(starts, return_exceptions))
+
+    def fetch_many(self, stock_ids: Iterable[str], start_date: str) -> Dict[str, pd.DataFrame]:
+        """
+        同步介面：並行取得多檔股票日線
+
+        :param stock_ids: 股票代號
+        :param start_date: 起始日期
+        :return: {股票代號: 日線 DataFrame}
+        """
+        return self.fetch_since({stock_id: start_date for stock_id in stock_ids})
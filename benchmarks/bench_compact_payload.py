@@ -0,0 +1,51 @@
+"""
+交易紀錄 payload：records（format_float 字串、每列 9 個鍵）vs columnar（分頁欄位陣列、數值、日期位移）
+
+比較編碼時間、JSON 大小（含 gzip，接近實際傳輸量）與 json.loads 解析時間（前端解析的近似值），
+以合成資料模擬 24 檔與 500 檔，每檔 4 個策略、每策略 250 筆交易紀錄。
+
+    python benchmarks/bench_compact_payload.py
+"""
+import gzip
+import json
+import sys
+import tempfile
+import time
+from contextlib import closing
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.repositories import compact_payload, db_schema, sync_payload  # noqa: E402
+from bench_web_sync import _populate  # noqa: E402
+
+
+def _measure(encode, db_path: Path) -> dict:
+    with closing(db_schema.connect(db_path)) as conn:
+        start = time.perf_counter()
+        payload = encode(conn)
+        encode_s = time.perf_counter() - start
+    encoded = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    start = time.perf_counter()
+    json.loads(encoded)
+    return {
+        'encode_s': round(encode_s, 3),
+        'json_mb': round(len(encoded) / 1e6, 2),
+        'gzip_mb': round(len(gzip.compress(encoded)) / 1e6, 2),
+        'parse_s': round(time.perf_counter() - start, 3),
+    }
+
+
+def _bench(n_symbols: int) -> list:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / 'db.sqlite'
+        _populate(db_path, n_symbols)
+        records = _measure(sync_payload.method_transaction_logs, db_path)
+        columnar = _measure(compact_payload.method_transaction_pages, db_path)
+    return [{'symbols': n_symbols, 'format': 'records', **records},
+            {'symbols': n_symbols, 'format': 'columnar', **columnar}]
+
+
+if __name__ == '__main__':
+    print(pd.DataFrame(_bench(24) + _bench(500)).to_string(index=False))
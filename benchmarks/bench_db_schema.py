@@ -0,0 +1,85 @@
+"""
+讀取端查詢延遲：無索引的舊資料庫 vs db_schema 遷移後（索引 + latest_bt_summaries）
+
+以 1,000 檔 × 4 策略 × 250 筆交易紀錄（10⁶ 列 transaction_logs）與每組 60 個執行日的 bt_summaries
+模擬長期累積的資料庫，比較 summary_table、WebDataSync、近期交易通知使用的查詢。
+
+    python benchmarks/bench_db_schema.py
+"""
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.repositories import db_schema  # noqa: E402
+
+METHODS = ('bt_dividend', 'bt_signals', 'bt_ma_pullback', 'bt_monthly_dca')
+N_SYMBOLS, N_LOGS, N_RUNS = 1000, 250, 60
+LOOKUPS = 200
+
+GROUP_BY_LATEST = """
+    SELECT bs.* FROM bt_summaries bs
+    INNER JOIN (
+        SELECT stock_id, MAX(date) AS latest_date FROM bt_summaries WHERE method = ? GROUP BY stock_id
+    ) latest ON bs.stock_id = latest.stock_id AND bs.date = latest.latest_date
+    WHERE bs.method = ? ORDER BY bs.stock_id
+"""
+LATEST_TABLE = f"SELECT {db_schema.SUMMARY_COLUMNS} FROM latest_bt_summaries WHERE method = ? ORDER BY stock_id"
+STOCK_LOGS = "SELECT * FROM transaction_logs WHERE stock_id = ? AND method = ? ORDER BY date"
+RECENT = ("SELECT stock_id, date, date_closed_price, method FROM transaction_logs "
+          "WHERE date BETWEEN ? AND ? ORDER BY date DESC, stock_id ASC")
+
+
+def _populate(db_path: Path) -> None:
+    log_dates = pd.bdate_range('2016-01-01', periods=N_LOGS * 10)[::10].strftime('%Y-%m-%d')
+    run_dates = pd.bdate_range('2026-01-01', periods=N_RUNS).strftime('%Y-%m-%d')
+    with sqlite3.connect(db_path) as conn:
+        for statement in db_schema.TABLES[:2]:
+            conn.execute(statement)
+        for i in range(N_SYMBOLS):
+            stock_id = f'{i:04d}'
+            conn.executemany("INSERT INTO transaction_logs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             [(stock_id, d, m, 1., 10., 10., 10., 0., 10.) for m in METHODS for d in log_dates])
+            conn.executemany("INSERT INTO bt_summaries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             [(stock_id, d, m, 10., 10., 0., 10., 0.1, 0.05) for m in METHODS for d in run_dates])
+
+
+def _time(conn: sqlite3.Connection, query: str, params_list) -> float:
+    start = time.perf_counter()
+    for params in params_list:
+        conn.execute(query, params).fetchall()
+    return (time.perf_counter() - start) / len(params_list) * 1000
+
+
+def _queries(conn: sqlite3.Connection, latest_query: str, latest_params) -> dict:
+    stocks = [(f'{i:04d}', METHODS[i % len(METHODS)]) for i in range(0, N_SYMBOLS, N_SYMBOLS // LOOKUPS)]
+    return {
+        'latest per method (ms)': _time(conn, latest_query, [latest_params(m) for m in METHODS]),
+        'stock logs (ms)': _time(conn, STOCK_LOGS, stocks),
+        'recent 14 days (ms)': _time(conn, RECENT, [('2024-01-01', '2024-01-14')] * 20),
+    }
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / 'db.sqlite'
+        _populate(db_path)
+        with sqlite3.connect(db_path) as conn:
+            n_logs = conn.execute("SELECT COUNT(*) FROM transaction_logs").fetchone()[0]
+            before = _queries(conn, GROUP_BY_LATEST, lambda m: (m, m))
+        start = time.perf_counter()
+        db_schema.migrate(db_path)
+        migrate_s = time.perf_counter() - start
+        with sqlite3.connect(db_path) as conn:
+            after = _queries(conn, LATEST_TABLE, lambda m: (m,))
+    print(f'transaction_logs: {n_logs:,} 列，遷移耗時 {migrate_s:.2f} 秒')
+    df = pd.DataFrame({'legacy': before, 'migrated': after}).round(3)
+    print(df.assign(speedup=(df['legacy'] / df['migrated']).round(1)).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+報表輸出：每個 (股票, 策略) 一張 PNG（--charts png）vs 資產曲線以 JSON 內嵌於 HTML（--charts inline）
+
+比較產生時間與輸出大小（PNG 目錄合計 vs 內嵌資料的 JSON / gzip + base64），
+以合成資料模擬 8 檔，每檔 4 個策略、每策略 250 筆交易紀錄。
+
+    python benchmarks/bench_html_report.py
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.repositories import report_data  # noqa: E402
+from app.repositories.base_report import BaseReport, render_reports  # noqa: E402
+from bench_web_sync import _populate  # noqa: E402
+
+
+def _bench(n_symbols: int) -> list:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / 'db.sqlite'
+        _populate(db_path, n_symbols)
+
+        class Report(BaseReport):
+            DB_PATH = db_path
+            OUTPUT_DIR = Path(tmp) / 'output'
+
+        start = time.perf_counter()
+        render_reports([Report()], workers=1)
+        png_s = time.perf_counter() - start
+        png_sizes = report_data.file_sizes(Report.OUTPUT_DIR)
+
+        rows = [{'symbols': n_symbols, 'charts': 'png', 'files': len(png_sizes), 'seconds': round(png_s, 2),
+                 'kb': round(sum(png_sizes) / 1e3, 1)}]
+        for encoding in (report_data.JSON, report_data.GZIP_BASE64):
+            start = time.perf_counter()
+            tag = report_data.script_tag(report_data.build_payload({'TW': db_path}), encoding)
+            rows.append({'symbols': n_symbols, 'charts': f'inline ({encoding})', 'files': 1,
+                         'seconds': round(time.perf_counter() - start, 3), 'kb': round(len(tag.encode('utf-8')) / 1e3, 1)})
+    return rows
+
+
+if __name__ == '__main__':
+    print(pd.DataFrame(_bench(8)).to_string(index=False))
@@ -0,0 +1,73 @@
+"""
+CSV vs 欄式快取（ColumnarCache）載入時間與磁碟用量
+
+以合成資料模擬目前追蹤清單（stocks.json：台股 13、美股 11，2020 年起約 1,700 根 K 棒）
+與 1,000 檔的清單，分別以原本的 CSV 流程（read_csv + to_datetime）與 ColumnarCache.read 載入。
+
+    python benchmarks/bench_price_cache.py
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.repositories.price_cache import ColumnarCache  # noqa: E402
+
+
+def _tw_frame(stock_id: str, n: int, rng: np.random.Generator) -> pd.DataFrame:
+    """FinMind taiwan_stock_daily 欄位"""
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, n)))
+    return pd.DataFrame({
+        'date': pd.bdate_range('2020-01-02', periods=n).strftime('%Y-%m-%d'),
+        'stock_id': stock_id,
+        'Trading_Volume': rng.integers(1e5, 1e8, n),
+        'Trading_money': rng.integers(1e7, 1e10, n),
+        'open': close * 0.995, 'max': close * 1.01, 'min': close * 0.99, 'close': close,
+        'spread': rng.normal(0, 1, n).round(2),
+        'Trading_turnover': rng.integers(100, 1e5, n),
+    })
+
+
+def _disk_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob('*') if p.is_file())
+
+
+def _bench(n_symbols: int, n_bars: int = 1700) -> dict:
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_dir = Path(tmp) / 'csv'
+        csv_dir.mkdir()
+        cache = ColumnarCache(Path(tmp) / 'cache')
+        ids = [f'{i:04d}' for i in range(n_symbols)]
+        for stock_id in ids:
+            df = _tw_frame(stock_id, n_bars, rng)
+            df.to_csv(csv_dir / f'{stock_id}.csv', encoding='utf_8_sig', index=False)
+            cache.write(stock_id, df.assign(date=pd.to_datetime(df['date'])))
+
+        start = time.perf_counter()
+        for stock_id in ids:
+            df = pd.read_csv(csv_dir / f'{stock_id}.csv', dtype={'stock_id': str})
+            df = df.assign(date=pd.to_datetime(df['date']))
+        csv_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for stock_id in ids:
+            cache.read(stock_id)
+        cache_seconds = time.perf_counter() - start
+
+        return {
+            'symbols': n_symbols,
+            'csv_load_s': round(csv_seconds, 3),
+            'columnar_load_s': round(cache_seconds, 3),
+            'speedup': round(csv_seconds / cache_seconds, 1),
+            'csv_mb': round(_disk_size(csv_dir) / 2 ** 20, 1),
+            'columnar_mb': round(_disk_size(cache.root) / 2 ** 20, 1),
+        }
+
+
+if __name__ == '__main__':
+    print(pd.DataFrame([_bench(24), _bench(1000)]).to_string(index=False))
@@ -0,0 +1,80 @@
+"""
+回測報表圖片：單一程序（REPORT_WORKERS=1）vs 程序池平行繪製；繪製清單略過輸入未變動的圖片；
+單張圖片的繪製時間與尺寸隨交易紀錄筆數的變化（表格列數有上限，應維持不變）
+
+以合成資料模擬 8 檔，每檔 4 個策略、每策略 60 筆交易紀錄，圖片寫入暫存目錄。
+
+    python benchmarks/bench_report_render.py
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.repositories.base_report import SUMMARY_COLUMNS, BaseReport, RenderJob, render_reports  # noqa: E402
+from app.repositories.bt_engine import BacktestBatch  # noqa: E402
+from app.repositories.result_sink import SqliteResultSink  # noqa: E402
+from bench_web_sync import METHODS, _populate  # noqa: E402
+
+
+def _run(report: BaseReport, n_symbols: int, workers: int, run: str) -> dict:
+    start = time.perf_counter()
+    results = render_reports([report], workers)
+    elapsed = time.perf_counter() - start
+    seconds = pd.Series([result.seconds for result in results], dtype=float)
+    return {
+        'symbols': n_symbols,
+        'workers': workers,
+        'run': run,
+        'images': len(results),
+        'wall_s': round(elapsed, 2),
+        'image_p50_s': round(seconds.median(), 3),
+        'image_max_s': round(seconds.max(), 3),
+    }
+
+
+def _bench(n_symbols: int, workers: int) -> list:
+    """第一次全部繪製、輸入未變動的重跑、一組 (股票, 策略) 新增一筆交易後的重跑"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / 'db.sqlite'
+        _populate(db_path, n_symbols, n_logs=60)
+
+        class Report(BaseReport):
+            DB_PATH = db_path
+            OUTPUT_DIR = Path(tmp) / 'output'
+
+        rows = [_run(Report(), n_symbols, workers, 'full'), _run(Report(), n_symbols, workers, 'unchanged')]
+        with SqliteResultSink(db_path, 'transaction_logs', 'bt_summaries') as sink:
+            sink.add(BacktestBatch(logs=[('0000', '2030-01-01', METHODS[0], 1., 10., 10., 10., 0., 10.)], summaries=[]))
+        rows.append(_run(Report(), n_symbols, workers, 'one new trade'))
+    return rows
+
+
+def _bench_history(n_logs: int) -> dict:
+    """單一 (股票, 策略)、每月一筆交易紀錄"""
+    dates = pd.date_range('1990-01-01', periods=n_logs, freq='MS').strftime('%Y-%m-%d')
+    values = np.random.default_rng(n_logs).lognormal(3, 1, n_logs)
+    df_transaction = pd.DataFrame({'date': dates, 'date_closed_price': values, 'position_size': np.arange(1., n_logs + 1),
+                                   'position_price': values, 'position_value': values, 'broker_dividend': values,
+                                   'asset_value': values})
+    df_summary = pd.DataFrame([[dates[-1], 10., 10., 0., 10., .1, .05]] * 30, columns=SUMMARY_COLUMNS)
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        path = BaseReport.process_data(RenderJob('0000', 'bt_monthly_dca', df_transaction, df_summary, Path(tmp)))
+        elapsed = time.perf_counter() - start
+        png_kb = round(path.stat().st_size / 1e3, 1)
+        with Image.open(path) as image:
+            width, height = image.size
+    return {'transactions': n_logs, 'render_s': round(elapsed, 2), 'width': width, 'height': height, 'png_kb': png_kb}
+
+
+if __name__ == '__main__':
+    print(pd.DataFrame([_bench_history(n_logs) for n_logs in (60, 300, 1200)]).to_string(index=False))
+    rows = [row for workers in sorted({1, os.cpu_count() or 1}) for row in _bench(8, workers)]
+    print(pd.DataFrame(rows).to_string(index=False))
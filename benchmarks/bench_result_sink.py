@@ -0,0 +1,82 @@
+"""
+回測結果寫入：每檔每策略各自連線 + commit（原寫法）vs SqliteResultSink（單一連線、WAL、批次交易）
+
+以合成的交易紀錄模擬目前追蹤清單（24 檔）與 1,000 檔，每檔 4 個策略、每策略 150 筆交易紀錄。
+
+    python benchmarks/bench_result_sink.py
+"""
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.repositories.bt_engine import BacktestBatch  # noqa: E402
+from app.repositories.result_sink import SqliteResultSink  # noqa: E402
+
+METHODS = ('bt_dividend', 'bt_signals', 'bt_ma_pullback', 'bt_monthly_dca')
+LOG_INSERT = f"INSERT INTO transaction_logs ({SqliteResultSink.LOG_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+SUMMARY_INSERT = f"INSERT INTO bt_summaries ({SqliteResultSink.SUMMARY_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+
+def _create(db_path: Path) -> None:
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE transaction_logs (stock_id TEXT, date TEXT, method TEXT, position_size REAL, "
+                     "position_price REAL, position_value REAL, date_closed_price REAL, broker_dividend REAL, "
+                     "asset_value REAL)")
+        conn.execute("CREATE TABLE bt_summaries (stock_id TEXT, date TEXT, method TEXT, close REAL, "
+                     "position_value REAL, broker_dividend REAL, asset_value REAL, roi REAL, irr REAL)")
+
+
+def _batches(n_symbols: int, n_logs: int = 150):
+    dates = pd.bdate_range('2020-01-01', periods=n_logs).strftime('%Y-%m-%d')
+    for i in range(n_symbols):
+        stock_id = f'{i:04d}'
+        for method in METHODS:
+            logs = [(stock_id, d, method, 1.0, 10.0, 10.0, 10.0, 0.0, 10.0) for d in dates]
+            yield BacktestBatch(logs=logs, summaries=[(stock_id, dates[-1], method, 10., 10., 0., 10., 0., 0.)])
+
+
+def _legacy(db_path: Path, n_symbols: int) -> float:
+    start = time.perf_counter()
+    for batch in _batches(n_symbols):
+        with sqlite3.connect(db_path) as conn:
+            conn.executemany(LOG_INSERT, batch.logs)
+            conn.commit()
+        with sqlite3.connect(db_path) as conn:
+            conn.execute(SUMMARY_INSERT, batch.summaries[0])
+            conn.commit()
+    return time.perf_counter() - start
+
+
+def _sink(db_path: Path, n_symbols: int) -> float:
+    start = time.perf_counter()
+    with SqliteResultSink(db_path, 'transaction_logs', 'bt_summaries') as sink:
+        for batch in _batches(n_symbols):
+            sink.add(batch)
+    print(f'  sink: {sink.stats}')
+    return time.perf_counter() - start
+
+
+def _bench(n_symbols: int) -> dict:
+    rows = n_symbols * len(METHODS) * 151
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_db, sink_db = Path(tmp) / 'legacy.sqlite', Path(tmp) / 'sink.sqlite'
+        _create(legacy_db)
+        _create(sink_db)
+        legacy, sink = _legacy(legacy_db, n_symbols), _sink(sink_db, n_symbols)
+    return {
+        'symbols': n_symbols,
+        'rows': rows,
+        'legacy_s': round(legacy, 3),
+        'sink_s': round(sink, 3),
+        'legacy_rows_per_s': round(rows / legacy),
+        'sink_rows_per_s': round(rows / sink),
+    }
+
+
+if __name__ == '__main__':
+    print(pd.DataFrame([_bench(24), _bench(1000)]).to_string(index=False))
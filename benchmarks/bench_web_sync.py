@@ -0,0 +1,120 @@
+"""
+WebDataSync payload：每檔股票各開連線查詢 + 逐格 format_float（原寫法）vs sync_payload（單一連線、單次排序查詢）
+
+以合成資料模擬目前追蹤清單（24 檔）與 500 檔，每檔 4 個策略、每策略 250 筆交易紀錄，不呼叫 Firebase。
+另以同步帳本比較隔日（每檔每策略新增一筆交易）差異同步與完整上傳的位元組數。
+
+    python benchmarks/bench_web_sync.py
+"""
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import closing
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.repositories import db_schema, sync_payload  # noqa: E402
+from app.repositories.bt_engine import BacktestBatch  # noqa: E402
+from app.repositories.result_sink import SqliteResultSink  # noqa: E402
+from app.repositories.sync_ledger import plan_delta  # noqa: E402
+from app.utils.formatting import format_float  # noqa: E402
+
+METHODS = ('bt_dividend', 'bt_signals', 'bt_ma_pullback', 'bt_monthly_dca')
+
+
+def _populate(db_path: Path, n_symbols: int, n_logs: int = 250, start: int = 0) -> None:
+    """寫入第 start 到 n_logs 筆交易紀錄（start > 0 模擬隔日新增的交易）"""
+    dates = pd.bdate_range('2016-01-01', periods=n_logs * 10)[::10].strftime('%Y-%m-%d')
+    with SqliteResultSink(db_path, 'transaction_logs', 'bt_summaries') as sink:
+        for i in range(n_symbols):
+            stock_id = f'{i:04d}'
+            for m, method in enumerate(METHODS):
+                prices = np.random.default_rng(i * len(METHODS) + m).lognormal(3, 1, n_logs)
+                logs = [(stock_id, d, method, 1., p, p, p, 0., p) for d, p in zip(dates, prices)][start:]
+                sink.add(BacktestBatch(logs=logs, summaries=[(stock_id, dates[-1], method, 10., 10., 0., 10., .1, .05)]))
+
+
+def _legacy(db_path: Path) -> int:
+    """原本 do_process 的查詢方式；回傳開啟的連線數"""
+    connections = 1
+    with sqlite3.connect(db_path) as conn:
+        methods = pd.read_sql_query("SELECT DISTINCT method FROM bt_summaries", conn)['method'].tolist()
+    for method in methods:
+        connections += 1
+        with sqlite3.connect(db_path) as conn:
+            df_method = pd.read_sql_query(
+                f"SELECT bs.* FROM bt_summaries bs INNER JOIN (SELECT stock_id, MAX(date) AS latest_date "
+                f"FROM bt_summaries WHERE method = '{method}' GROUP BY stock_id) latest "
+                f"ON bs.stock_id = latest.stock_id AND bs.date = latest.latest_date "
+                f"WHERE bs.method = '{method}' ORDER BY bs.stock_id", conn).map(format_float)
+        df_method.to_dict('records')
+        for _, row in df_method.iterrows():
+            connections += 1
+            with sqlite3.connect(db_path) as conn:
+                s = pd.read_sql_query(f"SELECT * FROM transaction_logs WHERE stock_id = '{row['stock_id']}' "
+                                      f"AND method = '{method}' ORDER BY date", conn).map(format_float)
+            s.to_dict('records')
+    return connections
+
+
+def _single_query(db_path: Path) -> int:
+    with closing(db_schema.connect(db_path)) as conn:
+        sync_payload.method_summaries(conn)
+        sync_payload.method_transaction_logs(conn)
+    return 1
+
+
+def _timed(fn, db_path: Path):
+    start = time.perf_counter()
+    connections = fn(db_path)
+    return time.perf_counter() - start, connections
+
+
+def _bench(n_symbols: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / 'db.sqlite'
+        _populate(db_path, n_symbols)
+        legacy_s, legacy_conns = _timed(_legacy, db_path)
+        single_s, single_conns = _timed(_single_query, db_path)
+    return {
+        'symbols': n_symbols,
+        'log_rows': n_symbols * len(METHODS) * 250,
+        'legacy_s': round(legacy_s, 3),
+        'legacy_connections': legacy_conns,
+        'single_s': round(single_s, 3),
+        'single_connections': single_conns,
+        'speedup': round(legacy_s / single_s, 1),
+    }
+
+
+def _plan(db_path: Path, ledger: dict):
+    with closing(db_schema.connect(db_path)) as conn:
+        summaries = sync_payload.method_summaries(conn)
+        logs = sync_payload.method_transaction_logs(conn)
+    nodes = {f'tw/{method}/summaries': rows for method, rows in summaries.items()}
+    return plan_delta(nodes, {f'tw/{method}/transaction_logs': logs[method] for method in summaries}, ledger)
+
+
+def _delta(n_symbols: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / 'db.sqlite'
+        _populate(db_path, n_symbols, n_logs=249)
+        first = _plan(db_path, {})
+        _populate(db_path, n_symbols, n_logs=250, start=249)
+        next_day = _plan(db_path, first.entries).stats
+    return {
+        'symbols': n_symbols,
+        'full_bytes': next_day.uploaded_bytes + next_day.skipped_bytes,
+        'delta_bytes': next_day.uploaded_bytes,
+        'saved': f'{next_day.saved_ratio:.1%}',
+        'appended_rows': next_day.appended_rows,
+    }
+
+
+if __name__ == '__main__':
+    print(pd.DataFrame([_bench(24), _bench(500)]).to_string(index=False))
+    print(pd.DataFrame([_delta(24), _delta(500)]).to_string(index=False))
@@ -0,0 +1,7 @@
+from app.repositories import db_schema
+
+# 遷移既有的 data/*/db.sqlite：建立索引與 latest_bt_summaries（回測、報表、同步首次連線時也會自動執行）
+if __name__ == "__main__":
+    for db_path, migrated in db_schema.migrate_all().items():
+        status = f'已遷移至 schema v{db_schema.SCHEMA_VERSION}' if migrated else '已是最新版本'
+        print(f'[INFO] {db_path}：{status}')
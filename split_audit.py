@@ -0,0 +1,18 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+from app.repositories.base_trade_record import TaiwanTradeRecord, USTradeRecord
+
+# 定期全量稽核：以快取的價格面板一次檢查所有追蹤標的的分割跳動（不呼叫股價 API）
+if __name__ == "__main__":
+    stocks_config = json.loads(Path('stocks.json').read_text(encoding='utf-8'))
+    results = [
+        TaiwanTradeRecord().audit_splits(stocks_config['tw']).assign(market='tw'),
+        USTradeRecord().audit_splits(stocks_config['us']).assign(market='us'),
+    ]
+    df = pd.concat(results, ignore_index=True)
+    if df.empty:
+        print('[INFO] 未偵測到分割跳動')
+    else:
+        print(df.to_string(index=False))
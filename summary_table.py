@@ -1,10 +1,12 @@
+import argparse
 import logging
-import sqlite3
+from contextlib import closing
 from datetime import date
 from pathlib import Path
 
 import pandas as pd
-from app.repositories.base_report import USReport, TWReport
+from app.repositories import db_schema, report_data
+from app.repositories.base_report import USReport, TWReport, render_reports
 from app.services.app_logger import get_logger
 from app.utils.formatting import format_float
 
@@ -22,21 +24,15 @@ TW_DB = Path('data/tw/db.sqlite')
 US_DB = Path('data/us/db.sqlite')
 OUTPUT_HTML = Path('output/summary_report.html')
 
-_LOAD_QUERY = """
-    SELECT bs.stock_id, bs.method, bs.close, bs.position_value,
-           bs.broker_dividend, bs.asset_value, bs.roi, bs.irr
-    FROM bt_summaries bs
-    INNER JOIN (
-        SELECT stock_id, method, MAX(date) AS latest_date
-        FROM bt_summaries GROUP BY stock_id, method
-    ) latest ON bs.stock_id = latest.stock_id
-           AND bs.method = latest.method
-           AND bs.date = latest.latest_date
+_LOAD_QUERY = f"""
+    SELECT stock_id, method, close, position_value,
+           broker_dividend, asset_value, roi, irr
+    FROM {db_schema.LATEST_TABLE}
 """
 
 
 def load_summaries(db_path: Path, market_label: str) -> pd.DataFrame:
-    with sqlite3.connect(db_path) as conn:
+    with closing(db_schema.connect(db_path)) as conn:
         df = pd.read_sql_query(_LOAD_QUERY, conn)
     return df.assign(market=market_label)
 
@@ -62,7 +58,7 @@ def build_strategy_table(df: pd.DataFrame, method: str) -> str:
 
     rows_html = []
     for _, row in method_df.iterrows():
-        rows_html.append(f'''        <tr data-market="{row['market']}">
+        rows_html.append(f'''        <tr data-market="{row['market']}" data-key="{row['market']}/{row['stock_id']}/{method}">
           <td>{row['stock_id']}</td>
           <td>{row['market']}</td>
           <td>{format_float(row['close'])}</td>
@@ -141,8 +137,110 @@ def build_cross_strategy_table(df: pd.DataFrame) -> str:
     </table>'''
 
 
-def generate_html_report(tw_df: pd.DataFrame, us_df: pd.DataFrame) -> None:
+# --charts inline：點選策略表的列時以內嵌資料在 canvas 繪製資產曲線（第一次展開才解碼、繪製）
+_CHART_STYLE = """
+    tr.expandable { cursor: pointer; }
+    tr.chart-row td { background: #f9fafb; }
+    tr.chart-row canvas { max-width: 100%; }
+    tr.chart-row p { color: #6b7280; font-size: 0.85em; margin: 4px 0; }"""
+
+_CHART_SCRIPT = """
+    // Inline charts
+    const REPORT = (async () => {
+      const el = document.getElementById('report-data');
+      let text = el.textContent;
+      if (el.dataset.encoding === 'gzip+base64') {
+        const bytes = Uint8Array.from(atob(text), c => c.charCodeAt(0));
+        text = await new Response(new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'))).text();
+      }
+      return JSON.parse(text);
+    })();
+
+    function drawCurve(canvas, curve) {
+      const ctx = canvas.getContext('2d');
+      const w = canvas.width, h = canvas.height, pad = 56;
+      const days = [0];
+      curve.dd.forEach(d => days.push(days[days.length - 1] + d));
+      const span = days[days.length - 1] || 1;
+      const values = curve.pv.concat(curve.av).filter(v => v !== null);
+      const min = values.reduce((a, b) => Math.min(a, b), Infinity);
+      const max = values.reduce((a, b) => Math.max(a, b), -Infinity);
+      const x = i => pad + (w - 2 * pad) * days[i] / span;
+      const y = v => h - pad - (h - 2 * pad) * (v - min) / ((max - min) || 1);
+      ctx.font = '12px Arial';
+      for (let k = 0; k <= 4; k++) {
+        const v = min + (max - min) * k / 4;
+        ctx.strokeStyle = '#e5e7eb';
+        ctx.beginPath(); ctx.moveTo(pad, y(v)); ctx.lineTo(w - pad, y(v)); ctx.stroke();
+        ctx.fillStyle = '#6b7280';
+        ctx.fillText(v.toFixed(0), 4, y(v) + 4);
+      }
+      const end = new Date(Date.parse(curve.d0) + span * 86400000).toISOString().slice(0, 10);
+      ctx.fillText(curve.d0, pad, h - pad + 20);
+      ctx.fillText(end, w - pad - ctx.measureText(end).width, h - pad + 20);
+      [[curve.pv, 'gray', 'Position Value'], [curve.av, 'darkred', 'Asset Value']].forEach(([series, color, label], n) => {
+        ctx.strokeStyle = color;
+        ctx.beginPath();
+        let started = false;
+        series.forEach((v, i) => {
+          if (v === null) return;
+          started ? ctx.lineTo(x(i), y(v)) : ctx.moveTo(x(i), y(v));
+          started = true;
+        });
+        ctx.stroke();
+        ctx.fillStyle = color;
+        ctx.fillText(label, pad + n * 140, pad - 16);
+      });
+    }
+
+    function percent(value) {
+      return value === null ? '—' : (value * 100).toFixed(2) + '%';
+    }
+
+    document.querySelectorAll('.strat-table tr[data-key]').forEach(row => {
+      row.classList.add('expandable');
+      row.addEventListener('click', async () => {
+        const next = row.nextElementSibling;
+        if (next && next.classList.contains('chart-row')) {
+          next.remove();
+          return;
+        }
+        const data = await REPORT;
+        const curve = data.curves[row.dataset.key];
+        const summary = data.summaries[row.dataset.key];
+        const detail = document.createElement('tr');
+        detail.className = 'chart-row';
+        detail.dataset.market = row.dataset.market;
+        const cell = document.createElement('td');
+        cell.colSpan = row.children.length;
+        if (summary) {
+          const column = name => summary[data.summary_columns.indexOf(name)];
+          const caption = document.createElement('p');
+          caption.textContent = `As of ${column('date')}: ROI ${percent(column('roi'))}, IRR ${percent(column('irr'))}`;
+          cell.appendChild(caption);
+        }
+        if (curve) {
+          const canvas = document.createElement('canvas');
+          canvas.width = 960;
+          canvas.height = 320;
+          cell.appendChild(canvas);
+          drawCurve(canvas, curve);
+        } else {
+          cell.appendChild(document.createTextNode('No data'));
+        }
+        detail.appendChild(cell);
+        row.after(detail);
+      });
+    });"""
+
+
+def generate_html_report(tw_df: pd.DataFrame, us_df: pd.DataFrame, data_tag: str = '') -> Path:
+    """
+    :param data_tag: report_data.script_tag() 的結果；有值時策略表的列可展開為資產曲線
+    :return: HTML 路徑
+    """
     df = pd.concat([tw_df, us_df], ignore_index=True)
+    chart_style, chart_script = (_CHART_STYLE, _CHART_SCRIPT) if data_tag else ('', '')
 
     strat_tab_buttons = ''.join(
         f'<button class="tab-btn{" active" if m == METHODS[0] else ""}" data-method="{m}">'
@@ -180,7 +278,7 @@ def generate_html_report(tw_df: pd.DataFrame, us_df: pd.DataFrame) -> None:
     tr:hover td {{ background: #f3f4f6; }}
     .pos {{ color: #16a34a; font-weight: 600; }}
     .neg {{ color: #dc2626; font-weight: 600; }}
-    .best {{ background: #fef9c3 !important; }}
+    .best {{ background: #fef9c3 !important; }}{chart_style}
   </style>
 </head>
 <body>
@@ -211,6 +309,7 @@ def generate_html_report(tw_df: pd.DataFrame, us_df: pd.DataFrame) -> None:
 {cross_table}
   </div>
 
+  {data_tag}
   <script>
     // Main view tabs
     document.querySelectorAll('.main-tab').forEach(btn => {{
@@ -247,7 +346,7 @@ def generate_html_report(tw_df: pd.DataFrame, us_df: pd.DataFrame) -> None:
       document.querySelectorAll('.strat-table tr[data-market]').forEach(row => {{
         row.style.display = (currentMarket === 'all' || row.dataset.market === currentMarket) ? '' : 'none';
       }});
-    }}
+    }}{chart_script}
   </script>
 </body>
 </html>'''
@@ -255,19 +354,48 @@ def generate_html_report(tw_df: pd.DataFrame, us_df: pd.DataFrame) -> None:
     OUTPUT_HTML.parent.mkdir(parents=True, exist_ok=True)
     OUTPUT_HTML.write_text(html, encoding='utf-8')
     logger.info("HTML 報表已產出：%s", OUTPUT_HTML)
+    return OUTPUT_HTML
+
+
+def _render_pngs(force: bool) -> None:
+    results = render_reports([USReport(), TWReport()], force=force)
+    if results:
+        slowest = max(results, key=lambda result: result.seconds)
+        logger.info("產生 %d 張圖片，繪製時間合計 %.1f 秒，最慢 %s（%.2f 秒）", len(results),
+                    sum(result.seconds for result in results), slowest.path, slowest.seconds)
+
+
+def _inline_data_tag(encoding: str) -> str:
+    payload = report_data.build_payload({'TW': TW_DB, 'US': US_DB})
+    logger.info("內嵌 %d 條資產曲線（%s）", len(payload['curves']), encoding)
+    return report_data.script_tag(payload, encoding)
+
+
+def _log_size_comparison(html_path: Path) -> None:
+    png_sizes = report_data.file_sizes(html_path.parent, '*.png')
+    logger.info("HTML %.1f KB；PNG 目錄 %d 張共 %.1f KB", html_path.stat().st_size / 1e3, len(png_sizes),
+                sum(png_sizes) / 1e3)
 
 
 if __name__ == "__main__":
-    try:
-        tw_report = TWReport()
-        us_report = USReport()
+    parser = argparse.ArgumentParser(description="產生回測報表圖片與 HTML 報表")
+    parser.add_argument("--charts", choices=["png", "inline"], default="png",
+                        help="png：每個組合一張圖片；inline：資產曲線以 JSON 內嵌於 HTML，由瀏覽器繪製")
+    parser.add_argument("--compress", action="store_true", help="inline 時內嵌資料以 gzip + base64 壓縮")
+    parser.add_argument("--force", action="store_true", help="忽略繪製清單，重新繪製所有圖片")
+    args = parser.parse_args()
 
-        us_report.run()
-        tw_report.run()
+    try:
+        data_tag = ''
+        if args.charts == 'png':
+            _render_pngs(args.force)
+        else:
+            data_tag = _inline_data_tag(report_data.GZIP_BASE64 if args.compress else report_data.JSON)
 
         tw_df = load_summaries(TW_DB, 'TW')
         us_df = load_summaries(US_DB, 'US')
-        generate_html_report(tw_df, us_df)
+        html_path = generate_html_report(tw_df, us_df, data_tag)
+        _log_size_comparison(html_path)
 
         logger.info("summary_table 完成")
     except Exception:
@@ -0,0 +1,163 @@
+"""
+Unit tests for BaseReport (grouped loading, headless rendering, process-pool rendering)
+"""
+from contextlib import closing
+
+import pandas as pd
+from PIL import Image
+
+from app.repositories import base_report
+from app.repositories.base_report import BaseReport, RenderJob, render_reports, yearly_rollup
+from app.repositories.bt_engine import BacktestBatch
+from app.repositories.result_sink import SqliteResultSink
+
+METHODS = ("bt_dividend", "bt_signals")
+
+
+def _monthly(n_logs):
+    dates = pd.date_range("1990-01-01", periods=n_logs, freq="MS").strftime("%Y-%m-%d")
+    values = [100.0 + i for i in range(n_logs)]
+    return pd.DataFrame({"date": dates, "date_closed_price": values, "position_size": [i + 1.0 for i in range(n_logs)],
+                         "position_price": values, "position_value": values, "broker_dividend": values,
+                         "asset_value": values})
+
+
+def _report(tmp_path, stocks=("0050", "0056"), n_logs=5):
+    tmp_path.mkdir(exist_ok=True)
+    db_path = tmp_path / "db.sqlite"
+    dates = pd.bdate_range("2024-01-01", periods=n_logs).strftime("%Y-%m-%d")
+    with SqliteResultSink(db_path, "transaction_logs", "bt_summaries") as sink:
+        for stock_id in reversed(stocks):
+            for method in METHODS:
+                logs = [(stock_id, d, method, 1.0, 10.0 + i, 10.0 + i, 10.0 + i, 0.5, 10.5 + i)
+                        for i, d in enumerate(dates)]
+                summaries = [(stock_id, dates[-1], method, 14.0, 14.0, 0.5, 14.5, 0.45, 0.05)]
+                sink.add(BacktestBatch(logs=logs, summaries=summaries))
+
+    class Report(BaseReport):
+        DB_PATH = db_path
+        OUTPUT_DIR = tmp_path / "output"
+
+    return Report()
+
+
+class TestLoadData:
+    def test_groups_by_stock_and_method(self, tmp_path):
+        data = _report(tmp_path).load_data()
+        assert sorted(data) == [(s, m) for s in ("0050", "0056") for m in METHODS]
+        df_transaction, df_summary = data[("0056", "bt_signals")]
+        assert list(df_transaction.columns) == base_report.TRANSACTION_COLUMNS
+        assert df_transaction["date"].is_monotonic_increasing and len(df_transaction) == 5
+        assert list(df_summary.columns) == base_report.SUMMARY_COLUMNS
+        assert df_summary["asset_value"].tolist() == [14.5]
+
+    def test_missing_summary_is_empty(self, tmp_path):
+        report = _report(tmp_path, stocks=("0050",))
+        with closing(base_report.db_schema.connect(report.DB_PATH)) as conn, conn:
+            conn.execute("DELETE FROM bt_summaries WHERE method = 'bt_signals'")
+        df_summary = report.load_data()[("0050", "bt_signals")][1]
+        assert df_summary.empty and list(df_summary.columns) == base_report.SUMMARY_COLUMNS
+
+
+class TestYearlyRollup:
+    def test_last_row_and_trade_count_per_year(self):
+        rollup = yearly_rollup(_monthly(30))
+        assert rollup["year"].tolist() == ["1990", "1991", "1992"]
+        assert rollup["trades"].tolist() == [12, 12, 6]
+        assert rollup["position_size"].tolist() == [12.0, 24.0, 30.0]
+        assert list(rollup.columns) == ["year", "trades"] + base_report.TRANSACTION_COLUMNS[1:]
+
+    def test_merges_older_years(self):
+        rollup = yearly_rollup(_monthly(300), max_years=4)
+        assert rollup["year"].tolist() == ["1990-2011", "2012", "2013", "2014"]
+        assert rollup["trades"].tolist() == [264, 12, 12, 12]
+        assert rollup["position_size"].iloc[0] == 264.0
+
+
+class TestBoundedImage:
+    def test_size_does_not_grow_with_history(self, tmp_path):
+        summary = pd.DataFrame([["2024-06-14", 10.0, 10.0, 0.0, 10.0, 0.1, 0.05]] * 20,
+                               columns=base_report.SUMMARY_COLUMNS)
+        sizes = []
+        for n_logs in (150, 600):
+            path = BaseReport.process_data(RenderJob("0050", f"m{n_logs}", _monthly(n_logs), summary, tmp_path))
+            with Image.open(path) as image:
+                sizes.append(image.size)
+        assert sizes[0] == sizes[1]
+
+
+class TestRender:
+    def test_renders_one_png_per_pair(self, tmp_path):
+        report = _report(tmp_path, stocks=("0050",))
+        results = report.run(workers=1)
+        assert [(r.stock_id, r.method) for r in results] == [("0050", m) for m in METHODS]
+        for result in results:
+            assert result.path == tmp_path / "output" / f"0050_{result.method}.png"
+            assert result.seconds > 0
+            with Image.open(result.path) as image:
+                assert image.format == "PNG" and image.width > 0
+
+    def test_process_pool_matches_in_process(self, tmp_path):
+        serial = _report(tmp_path / "serial", stocks=("0050", "0056"))
+        pooled = _report(tmp_path / "pooled", stocks=("0050", "0056"))
+        serial_results = render_reports([serial], workers=1)
+        pooled_results = render_reports([pooled], workers=2)
+        assert [(r.stock_id, r.method) for r in pooled_results] == [(r.stock_id, r.method) for r in serial_results]
+        for a, b in zip(serial_results, pooled_results):
+            assert a.path.read_bytes() == b.path.read_bytes()
+
+    def test_workers_from_environment(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("REPORT_WORKERS", "1")
+        report = _report(tmp_path, stocks=("0050",))
+        assert len(render_reports([report])) == len(METHODS)
+
+
+class TestRenderManifest:
+    def _rendered(self, results):
+        return sorted((r.stock_id, r.method) for r in results)
+
+    def test_skips_unchanged_images(self, tmp_path):
+        report = _report(tmp_path, stocks=("0050",))
+        assert len(report.run(workers=1)) == len(METHODS)
+        mtimes = {p: p.stat().st_mtime_ns for p in (tmp_path / "output").glob("*.png")}
+        assert report.run(workers=1) == []
+        assert {p: p.stat().st_mtime_ns for p in (tmp_path / "output").glob("*.png")} == mtimes
+
+    def test_rerenders_only_changed_pair(self, tmp_path):
+        report = _report(tmp_path)
+        report.run(workers=1)
+        with SqliteResultSink(report.DB_PATH, "transaction_logs", "bt_summaries") as sink:
+            sink.add(BacktestBatch(logs=[("0056", "2024-01-08", "bt_signals", 1.0, 15.0, 15.0, 15.0, 0.5, 15.5)],
+                                   summaries=[]))
+        assert self._rendered(report.run(workers=1)) == [("0056", "bt_signals")]
+
+    def test_rerenders_when_valuation_changes(self, tmp_path):
+        report = _report(tmp_path)
+        report.run(workers=1)
+        # 增量回測以新的估值取代該組合的 summary，即使沒有新交易
+        with SqliteResultSink(report.DB_PATH, "transaction_logs", "bt_summaries") as sink:
+            sink.add(BacktestBatch(summaries=[("0050", "2024-01-08", "bt_dividend", 16.0, 16.0, 0.5, 16.5, 0.65, 0.07)],
+                                   resumed=[("0050", "bt_dividend", "2024-01-05")]), incremental=True)
+        assert self._rendered(report.run(workers=1)) == [("0050", "bt_dividend")]
+
+    def test_plotted_summary_is_latest_rows(self, tmp_path):
+        summary = pd.DataFrame([[f"2024-01-{d:02d}", 10.0, 10.0, 0.0, 10.0, 0.1, 0.05] for d in range(1, 9)],
+                               columns=base_report.SUMMARY_COLUMNS)
+        job = RenderJob("0050", "m", _monthly(30), summary, tmp_path)
+        assert job.plotted_summary["date"].tolist() == [f"2024-01-{d:02d}" for d in range(4, 9)]
+        # 圖中看不到的較早 summary 不影響指紋
+        assert RenderJob("0050", "m", _monthly(30), summary.iloc[2:], tmp_path).fingerprint == job.fingerprint
+
+    def test_rerenders_missing_image(self, tmp_path):
+        report = _report(tmp_path, stocks=("0050",))
+        report.run(workers=1)
+        (tmp_path / "output" / "0050_bt_dividend.png").unlink()
+        assert self._rendered(report.run(workers=1)) == [("0050", "bt_dividend")]
+
+    def test_force_and_renderer_version(self, tmp_path, monkeypatch):
+        report = _report(tmp_path, stocks=("0050",))
+        report.run(workers=1)
+        assert len(report.run(workers=1, force=True)) == len(METHODS)
+        monkeypatch.setattr(base_report, "RENDERER_VERSION", base_report.RENDERER_VERSION + 1)
+        assert len(report.run(workers=1)) == len(METHODS)
+        assert report.run(workers=1) == []
@@ -0,0 +1,293 @@
+"""
+Equivalence tests: vectorized backtest engine vs. the original iterrows loop
+in BaseStrategy.bt_strategy().
+"""
+import sqlite3
+
+import pytest
+import pandas as pd
+import numpy as np
+
+from app.repositories.base_strategy import TwStrategy, UsStrategy
+
+
+METHODS = ['bt_dividend', 'bt_signals', 'bt_ma_pullback', 'bt_monthly_dca']
+
+
+class _CaptureMixin:
+    """Capture DB writes in memory instead of touching SQLite."""
+
+    def __init__(self):
+        self.logs = []
+        self.summaries = []
+
+    def update_transaction_logs(self, data):
+        self.logs.extend(data)
+
+    def update_bt_summary(self, data):
+        self.summaries.append(data)
+
+    def write_batch(self, batch, incremental=False):
+        self.logs.extend(batch.logs)
+        self.summaries.extend(batch.summaries)
+
+
+class _TwCapture(_CaptureMixin, TwStrategy):
+    pass
+
+
+class _UsCapture(_CaptureMixin, UsStrategy):
+    pass
+
+
+def _random_df(strategy_cls, n=1500, seed=0, dividend_every=63, stock_id="0050"):
+    """Random-walk prices over ~6 years with periodic dividends."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2018-01-01", periods=n)
+    closes = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.015, n)))
+    dividends = np.zeros(n)
+    dividends[dividend_every::dividend_every] = rng.uniform(0.5, 3.0, len(dividends[dividend_every::dividend_every]))
+    return pd.DataFrame({
+        "stock_id": stock_id,
+        "date": dates,
+        strategy_cls.CLOSED_PRICE_COLUMN: closes,
+        strategy_cls.DIVIDEND_COLUMN: dividends,
+    })
+
+
+def _run(strategy_cls, df, method, engine):
+    strategy = strategy_cls()
+    strategy.bt_strategy(df.copy(), method, engine=engine)
+    return strategy.logs, strategy.summaries
+
+
+# ===========================================================================
+# Loop vs vectorized equivalence
+# ===========================================================================
+
+class TestVectorizedEquivalence:
+    @pytest.mark.parametrize("method", METHODS)
+    @pytest.mark.parametrize("seed", [0, 1, 2])
+    def test_tw_rows_identical(self, method, seed):
+        df = _random_df(_TwCapture, seed=seed)
+        assert _run(_TwCapture, df, method, 'vectorized') == _run(_TwCapture, df, method, 'loop')
+
+    @pytest.mark.parametrize("method", METHODS)
+    def test_us_rows_identical(self, method):
+        df = _random_df(_UsCapture, seed=7, dividend_every=21, stock_id="VOO")
+        assert _run(_UsCapture, df, method, 'vectorized') == _run(_UsCapture, df, method, 'loop')
+
+    def test_expensive_stock_with_zero_share_buys(self):
+        """Prices above the per-trade budget round to 0 shares; dividends must not accrue."""
+        df = _random_df(_UsCapture, seed=3, dividend_every=10)
+        df[_UsCapture.CLOSED_PRICE_COLUMN] *= 100   # ~10,000 per share vs 3,500/year budget
+        for method in METHODS:
+            assert _run(_UsCapture, df, method, 'vectorized') == _run(_UsCapture, df, method, 'loop')
+
+    def test_dividend_on_buy_day_not_accrued_until_next_buy(self):
+        """A dividend dated on the buy day is only visible to later buys (strict <)."""
+        dates = pd.bdate_range("2020-01-01", periods=300)
+        closes = np.linspace(50.0, 80.0, len(dates))
+        dividends = np.zeros(len(dates))
+        dividends[[30, 60, 61, 150]] = [1.0, 2.0, 1.5, 0.8]
+        df = pd.DataFrame({
+            "stock_id": "0056",
+            "date": dates,
+            _TwCapture.CLOSED_PRICE_COLUMN: closes,
+            _TwCapture.DIVIDEND_COLUMN: dividends,
+        })
+        for method in METHODS:
+            assert _run(_TwCapture, df, method, 'vectorized') == _run(_TwCapture, df, method, 'loop')
+
+    def test_types_match_loop(self):
+        """Rows must carry the same Python/NumPy scalar types as the loop."""
+        df = _random_df(_TwCapture, seed=5)
+        vec_logs, _ = _run(_TwCapture, df, 'bt_dividend', 'vectorized')
+        loop_logs, _ = _run(_TwCapture, df, 'bt_dividend', 'loop')
+        for vec_row, loop_row in zip(vec_logs, loop_logs):
+            assert [type(v) for v in vec_row[3:]] == [type(v) for v in loop_row[3:]]
+
+
+class _TwPointInTime(_TwCapture):
+    BUDGET_POLICY = 'point_in_time'
+
+
+class TestPointInTimeBudget:
+    @pytest.mark.parametrize("method", METHODS)
+    def test_rows_identical(self, method):
+        df = _random_df(_TwPointInTime, seed=11)
+        assert _run(_TwPointInTime, df, method, 'vectorized') == _run(_TwPointInTime, df, method, 'loop')
+
+
+class TestEngineSelection:
+    def test_unknown_engine_raises(self):
+        df = _random_df(_TwCapture, n=50)
+        with pytest.raises(ValueError):
+            _TwCapture().bt_strategy(df, 'bt_dividend', engine='gpu')
+
+    def test_no_signal_returns_none(self):
+        df = _random_df(_TwCapture, n=50, dividend_every=1000)
+        strategy = _TwCapture()
+        assert strategy.bt_strategy(df, 'bt_dividend', engine='vectorized') is None
+        assert strategy.logs == []
+
+
+# ===========================================================================
+# Fused multi-strategy pass
+# ===========================================================================
+
+class TestBtStrategies:
+    def test_matches_separate_calls(self):
+        df = _random_df(_TwCapture, seed=4)
+        fused = _TwCapture()
+        fused.bt_strategies(df)
+
+        separate = _TwCapture()
+        for method in METHODS:
+            separate.bt_strategy(df.copy(), method)
+
+        assert fused.logs == separate.logs
+        assert fused.summaries == separate.summaries
+
+    def test_caller_frame_untouched(self):
+        df = _random_df(_UsCapture, seed=6, stock_id="QQQ")
+        before = df.copy()
+        _UsCapture().bt_strategies(df)
+        pd.testing.assert_frame_equal(df, before)
+
+    def test_methods_without_signal_skipped(self):
+        df = _random_df(_TwCapture, n=200, dividend_every=1000)
+        results = _TwCapture().bt_strategies(df, methods=['bt_dividend', 'bt_monthly_dca'])
+        assert list(results) == ['bt_monthly_dca']
+
+    def test_unknown_method_raises(self):
+        df = _random_df(_TwCapture, n=50)
+        with pytest.raises(ValueError):
+            _TwCapture().bt_strategies(df, methods=['bt_moon'])
+
+    def test_batch_written_to_sqlite(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("CREATE TABLE transaction_logs (stock_id TEXT, date TEXT, method TEXT, position_size REAL, "
+                         "position_price REAL, position_value REAL, date_closed_price REAL, broker_dividend REAL, "
+                         "asset_value REAL)")
+            conn.execute("CREATE TABLE bt_summaries (stock_id TEXT, date TEXT, method TEXT, close REAL, "
+                         "position_value REAL, broker_dividend REAL, asset_value REAL, roi REAL, irr REAL)")
+
+        class _DbStrategy(TwStrategy):
+            DB_PATH = db_path
+
+        df = _random_df(_DbStrategy, seed=8)
+        results = _DbStrategy().bt_strategies(df)
+
+        with sqlite3.connect(db_path) as conn:
+            n_logs = conn.execute("SELECT COUNT(*) FROM transaction_logs").fetchone()[0]
+            methods = {r[0] for r in conn.execute("SELECT method FROM bt_summaries")}
+        assert n_logs == sum(len(r.rows) for r in results.values())
+        assert methods == set(METHODS)
+
+
+# ===========================================================================
+# Checkpointed incremental backtest
+# ===========================================================================
+
+def _db_strategy(base_cls, db_path, policy='full_year'):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS transaction_logs (stock_id TEXT, date TEXT, method TEXT, "
+                     "position_size REAL, position_price REAL, position_value REAL, date_closed_price REAL, "
+                     "broker_dividend REAL, asset_value REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS bt_summaries (stock_id TEXT, date TEXT, method TEXT, close REAL, "
+                     "position_value REAL, broker_dividend REAL, asset_value REAL, roi REAL, irr REAL)")
+
+    class _DbStrategy(base_cls):
+        DB_PATH = db_path
+        BUDGET_POLICY = policy
+
+    return _DbStrategy()
+
+
+def _dump(db_path):
+    with sqlite3.connect(db_path) as conn:
+        logs = conn.execute("SELECT * FROM transaction_logs ORDER BY method, date").fetchall()
+        summaries = conn.execute("SELECT * FROM bt_summaries ORDER BY method").fetchall()
+    return logs, summaries
+
+
+class TestIncrementalBacktest:
+    @pytest.mark.parametrize("policy", ['full_year', 'point_in_time'])
+    def test_daily_appends_match_full_rebuild(self, tmp_path, policy):
+        # 2018-01-01 + 515 business days crosses into 2020; append across the year boundary
+        df = _random_df(TwStrategy, n=540, seed=12, dividend_every=21)
+        incremental = _db_strategy(TwStrategy, tmp_path / "inc.sqlite", policy)
+        for end in range(500, 541, 4):
+            incremental.bt_strategies(df.iloc[:end], incremental=True)
+
+        full = _db_strategy(TwStrategy, tmp_path / "full.sqlite", policy)
+        full.bt_strategies(df)
+
+        assert _dump(tmp_path / "inc.sqlite") == _dump(tmp_path / "full.sqlite")
+
+    def test_resume_processes_only_new_rows(self, tmp_path):
+        df = _random_df(TwStrategy, n=540, seed=13)
+        strategy = _db_strategy(TwStrategy, tmp_path / "db.sqlite", 'point_in_time')
+        strategy.bt_strategies(df.iloc[:530], incremental=True)
+        results = strategy.bt_strategies(df, incremental=True)
+        new_dates = set(df['date'].iloc[530:].dt.strftime('%Y-%m-%d'))
+        for result in results.values():
+            assert {row[1] for row in result.rows} <= new_dates
+
+    def test_rewritten_history_triggers_rebuild(self, tmp_path):
+        df = _random_df(UsStrategy, n=540, seed=14, stock_id="VOO")
+        strategy = _db_strategy(UsStrategy, tmp_path / "inc.sqlite", 'point_in_time')
+        strategy.bt_strategies(df.iloc[:520], incremental=True)
+
+        # e.g. a split re-adjusts every past price
+        adjusted = df.assign(**{UsStrategy.CLOSED_PRICE_COLUMN: df[UsStrategy.CLOSED_PRICE_COLUMN] / 4})
+        strategy.bt_strategies(adjusted, incremental=True)
+
+        full = _db_strategy(UsStrategy, tmp_path / "full.sqlite", 'point_in_time')
+        full.bt_strategies(adjusted)
+        assert _dump(tmp_path / "inc.sqlite") == _dump(tmp_path / "full.sqlite")
+
+    def test_resume_after_dividend_on_non_trading_date(self, tmp_path):
+        # tw_update 以 outer merge 合併配息：非交易日的配息列 close 為 NaN，bt_dividend 在該列買入後持股為 NaN
+        df = _random_df(TwStrategy, n=540, seed=16, dividend_every=1000)
+        holiday = pd.DataFrame({"stock_id": ["0050"], "date": [pd.Timestamp("2019-06-08")],
+                                TwStrategy.CLOSED_PRICE_COLUMN: [np.nan], TwStrategy.DIVIDEND_COLUMN: [1.5]})
+        df = pd.concat([df, holiday]).sort_values("date", ignore_index=True)
+
+        incremental = _db_strategy(TwStrategy, tmp_path / "inc.sqlite", 'point_in_time')
+        for end in (400, 520, len(df)):
+            incremental.bt_strategies(df.iloc[:end], incremental=True)
+        _, _, state = incremental.checkpoint_store.load("0050")["bt_dividend"]
+        assert np.isnan(state.position_size)
+
+        full = _db_strategy(TwStrategy, tmp_path / "full.sqlite", 'point_in_time')
+        full.bt_strategies(df)
+        assert _dump(tmp_path / "inc.sqlite") == _dump(tmp_path / "full.sqlite")
+
+    def test_replayed_dividend_row_without_stock_id_is_not_duplicated(self, tmp_path):
+        # outer merge 的配息列沒有 stock_id；full_year 每次續算都會重播最後一年，該列需歸屬股票才能被刪除重寫
+        df = _random_df(TwStrategy, n=540, seed=17, dividend_every=1000)
+        holiday = pd.DataFrame({"stock_id": [None], "date": [pd.Timestamp("2020-01-18")],
+                                TwStrategy.CLOSED_PRICE_COLUMN: [np.nan], TwStrategy.DIVIDEND_COLUMN: [2.0]})
+        df = pd.concat([df, holiday]).sort_values("date", ignore_index=True)
+
+        incremental = _db_strategy(TwStrategy, tmp_path / "inc.sqlite")
+        for end in (530, len(df), len(df)):
+            incremental.bt_strategies(df.iloc[:end], incremental=True)
+
+        full = _db_strategy(TwStrategy, tmp_path / "full.sqlite")
+        full.bt_strategies(df)
+        logs, _ = _dump(tmp_path / "inc.sqlite")
+        assert ("0050", "2020-01-18") in {(row[0], row[1]) for row in logs}
+        assert all(row[0] == "0050" for row in logs)
+        assert _dump(tmp_path / "inc.sqlite") == _dump(tmp_path / "full.sqlite")
+
+    def test_clear_tables_drops_checkpoints(self, tmp_path):
+        df = _random_df(TwStrategy, n=300, seed=15)
+        strategy = _db_strategy(TwStrategy, tmp_path / "db.sqlite", 'point_in_time')
+        strategy.bt_strategies(df, incremental=True)
+        assert strategy.checkpoint_store.load("0050")
+        strategy.clear_tables()
+        assert strategy.checkpoint_store.load("0050") == {}
@@ -0,0 +1,71 @@
+"""
+Unit tests for BudgetAllocator
+"""
+import pytest
+import pandas as pd
+import numpy as np
+
+from app.repositories.budget_allocator import BudgetAllocator
+
+
+def _signals(dates: list, signals: list):
+    return pd.Series(pd.to_datetime(dates)), pd.Series(signals)
+
+
+class TestFromSignals:
+    def test_counts_signals_per_calendar_year(self):
+        dates, signals = _signals(
+            ["2023-03-01", "2023-06-01", "2023-09-01", "2024-01-02", "2024-02-01"],
+            [1, 1, 0, True, 1],
+        )
+        allocator = BudgetAllocator.from_signals(dates, signals, 1200)
+        assert allocator.year_counts == {2023: 2, 2024: 2}
+
+    def test_unknown_policy_raises(self):
+        with pytest.raises(ValueError):
+            BudgetAllocator(1000, {2024: 1}, policy="greedy")
+
+
+class TestFullYear:
+    def test_matches_original_buy_times_scan(self):
+        """full_year must equal year_cash / (signals in that year) as computed by the old scan."""
+        rng = np.random.default_rng(1)
+        dates = pd.Series(pd.bdate_range("2020-01-01", periods=900))
+        signals = pd.Series((rng.random(900) < 0.1).astype(int))
+        allocator = BudgetAllocator.from_signals(dates, signals, 100000)
+
+        for d in dates[signals == 1]:
+            buy_times = ((dates.dt.year == d.year) & (signals == 1)).sum()
+            assert allocator.per_trade_cash(d.year) == 100000 / buy_times
+
+    def test_allocate_many_matches_scalar(self):
+        allocator = BudgetAllocator(3500, {2023: 7, 2024: 3})
+        years = np.array([2023, 2023, 2024])
+        nth = np.array([0, 1, 0])
+        expected = [allocator.per_trade_cash(y, n) for y, n in zip(years, nth)]
+        assert allocator.allocate_many(years, nth).tolist() == expected
+
+
+class TestPointInTime:
+    def test_uses_previous_year_count(self):
+        allocator = BudgetAllocator(1200, {2023: 4, 2024: 12}, policy="point_in_time")
+        assert allocator.per_trade_cash(2024, 0) == pytest.approx(300.0)
+
+    def test_first_year_uses_default_expected_trades(self):
+        allocator = BudgetAllocator(1200, {2024: 3}, policy="point_in_time")
+        assert allocator.per_trade_cash(2024, 0) == pytest.approx(1200 / BudgetAllocator.DEFAULT_EXPECTED_TRADES)
+
+    def test_year_budget_never_exceeded(self):
+        """More signals than expected: spending stops once the year budget is used."""
+        allocator = BudgetAllocator(1000, {2023: 4, 2024: 10}, policy="point_in_time")
+        spent = [allocator.per_trade_cash(2024, n) for n in range(10)]
+        assert spent[:4] == [250.0] * 4
+        assert sum(spent) == pytest.approx(1000.0)
+        assert spent[4:] == [0] * 6
+
+    def test_allocate_many_matches_scalar(self):
+        allocator = BudgetAllocator(1000, {2023: 3, 2024: 5}, policy="point_in_time")
+        years = np.array([2023] * 3 + [2024] * 5)
+        nth = np.array([0, 1, 2, 0, 1, 2, 3, 4])
+        expected = [allocator.per_trade_cash(y, n) for y, n in zip(years, nth)]
+        assert allocator.allocate_many(years, nth).tolist() == expected
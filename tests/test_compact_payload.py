@@ -0,0 +1,91 @@
+"""
+Unit tests for the columnar transaction-log encoding
+"""
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.repositories import compact_payload, db_schema, sync_payload
+from app.repositories.compact_payload import VALUE_COLUMNS, encode_pages, method_transaction_pages
+from app.services.firebase import json_size
+from tests.test_sync_payload import _populate
+
+
+def _decode(pages):
+    """前端解碼：頁 → 列"""
+    rows = []
+    for key in sorted(pages, key=int):
+        page = pages[key]
+        d0 = np.datetime64(page["d0"])
+        for i in range(page["n"]):
+            row = {"date": str(d0 + np.timedelta64(page["date"][i], "D"))}
+            rows.append({**row, **{column: page[column][i] for column in VALUE_COLUMNS}})
+    return rows
+
+
+def _as_numbers(records):
+    """records 格式（format_float 字串）轉為與 columnar 相同的數值"""
+    return [{"date": r["date"], **{c: None if r[c] is None else float(r[c]) for c in VALUE_COLUMNS}} for r in records]
+
+
+def _logs(n, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2020-01-01", periods=n * 20)[::20].strftime("%Y-%m-%d")
+    return pd.DataFrame({"date": dates, **{column: rng.lognormal(0, 2, n) for column in VALUE_COLUMNS}})
+
+
+class TestEncodePages:
+    def test_fixed_size_pages(self):
+        pages = encode_pages(_logs(300), page_size=128)
+        assert list(pages) == ["0", "1", "2"]
+        assert [page["n"] for page in pages.values()] == [128, 128, 44]
+        assert pages["1"]["date"][0] == 0
+
+    def test_roundtrip_matches_format_float_precision(self):
+        df = _logs(50)
+        expected = [{"date": d, **{c: float(f"{v:.4f}" if v < 1 else f"{v:.2f}") for c, v in zip(VALUE_COLUMNS, vals)}}
+                    for d, *vals in df[["date", *VALUE_COLUMNS]].itertuples(index=False)]
+        assert _decode(encode_pages(df, page_size=16)) == expected
+
+    def test_nan_becomes_null(self):
+        df = _logs(3).assign(broker_dividend=[0.5, np.nan, 2.0])
+        assert encode_pages(df)["0"]["broker_dividend"] == [0.5, None, 2.0]
+
+    def test_empty(self):
+        assert encode_pages(_logs(0)) == {}
+
+
+class TestMethodTransactionPages:
+    def test_decodes_to_records_payload(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        _populate(db_path, n_logs=40)
+        with closing(db_schema.connect(db_path)) as conn:
+            pages = method_transaction_pages(conn, page_size=16)
+            records = sync_payload.method_transaction_logs(conn)
+        assert set(pages) == set(records)
+        for method, stocks in records.items():
+            assert {key.split("/")[0] for key in pages[method]} == set(stocks)
+            for stock_id, rows in stocks.items():
+                stock_pages = {k.split("/")[1]: v for k, v in pages[method].items() if k.startswith(f"{stock_id}/")}
+                assert _decode(stock_pages) == _as_numbers(rows)
+
+    def test_smaller_than_records(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        _populate(db_path, n_logs=200)
+        with closing(db_schema.connect(db_path)) as conn:
+            pages = method_transaction_pages(conn)
+            records = sync_payload.method_transaction_logs(conn)
+        assert json_size(pages) < json_size(records) / 2
+
+
+class TestSchema:
+    def test_columnar_includes_page_size(self):
+        assert compact_payload.schema("columnar", 64) == {
+            "transaction_logs": {"format": "columnar", "version": 1, "page_size": 64}}
+        assert compact_payload.schema("records") == {"transaction_logs": {"format": "records", "version": 1}}
+
+    def test_unknown_format_raises(self):
+        with pytest.raises(ValueError):
+            compact_payload.schema("protobuf")
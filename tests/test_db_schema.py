@@ -0,0 +1,118 @@
+"""
+Unit tests for db_schema (indexes, latest_bt_summaries, migration of existing databases)
+"""
+import sqlite3
+
+import pandas as pd
+
+from app.repositories import db_schema
+from app.repositories.base_strategy import TwStrategy
+from app.repositories.bt_engine import BacktestBatch
+from app.repositories.result_sink import SqliteResultSink
+
+
+def _legacy_db(db_path, summaries=()):
+    """建立沒有索引、沒有 latest_bt_summaries 的舊資料庫"""
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE transaction_logs (stock_id TEXT, date TEXT, method TEXT, position_size REAL, "
+                     "position_price REAL, position_value REAL, date_closed_price REAL, broker_dividend REAL, "
+                     "asset_value REAL)")
+        conn.execute("CREATE TABLE bt_summaries (stock_id TEXT, date TEXT, method TEXT, close REAL, "
+                     "position_value REAL, broker_dividend REAL, asset_value REAL, roi REAL, irr REAL)")
+        conn.executemany("INSERT INTO bt_summaries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", summaries)
+
+
+def _summary(stock_id, day, method="bt_dividend", roi=0.1):
+    return (stock_id, day, method, 10.0, 10.0, 0.0, 10.0, roi, 0.05)
+
+
+def _latest(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(f"SELECT {db_schema.SUMMARY_COLUMNS} FROM latest_bt_summaries "
+                            "ORDER BY stock_id, method").fetchall()
+
+
+def _plan(db_path, query, params=()):
+    with db_schema.connect(db_path) as conn:
+        return " ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params))
+
+
+class TestMigration:
+    def test_backfills_latest_from_existing_summaries(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        _legacy_db(db_path, [_summary("0050", "2024-06-13", roi=0.1), _summary("0050", "2024-06-14", roi=0.2),
+                             _summary("0056", "2024-06-12", roi=0.3),
+                             _summary("0050", "2024-06-10", method="bt_signals", roi=0.4)])
+        assert db_schema.migrate(db_path)
+        assert _latest(db_path) == [_summary("0050", "2024-06-14", roi=0.2),
+                                    _summary("0050", "2024-06-10", method="bt_signals", roi=0.4),
+                                    _summary("0056", "2024-06-12", roi=0.3)]
+
+    def test_runs_once(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        _legacy_db(db_path)
+        assert db_schema.migrate(db_path)
+        assert not db_schema.migrate(db_path)
+        with sqlite3.connect(db_path) as conn:
+            assert db_schema.schema_version(conn) == db_schema.SCHEMA_VERSION
+
+    def test_migrate_all_finds_market_databases(self, tmp_path):
+        for market in ("tw", "us"):
+            (tmp_path / market).mkdir()
+            _legacy_db(tmp_path / market / "db.sqlite")
+        assert db_schema.migrate_all(tmp_path) == {tmp_path / "tw" / "db.sqlite": True,
+                                                   tmp_path / "us" / "db.sqlite": True}
+
+    def test_readers_use_indexes(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        _legacy_db(db_path)
+        assert "idx_transaction_logs_stock_method_date" in _plan(
+            db_path, "SELECT * FROM transaction_logs WHERE stock_id = ? AND method = ? ORDER BY date",
+            ("0050", "bt_dividend"))
+        assert "idx_transaction_logs_date" in _plan(
+            db_path, "SELECT * FROM transaction_logs WHERE date BETWEEN ? AND ?", ("2024-01-01", "2024-01-14"))
+
+
+class TestLatestOnWrite:
+    def _write(self, db_path, *summaries, incremental=False):
+        with SqliteResultSink(db_path, "transaction_logs", "bt_summaries") as sink:
+            sink.add(BacktestBatch(summaries=list(summaries)), incremental=incremental)
+
+    def test_newer_summary_replaces_older(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        self._write(db_path, _summary("0050", "2024-06-13", roi=0.1))
+        self._write(db_path, _summary("0050", "2024-06-14", roi=0.2))
+        assert _latest(db_path) == [_summary("0050", "2024-06-14", roi=0.2)]
+
+    def test_older_summary_does_not_replace_newer(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        self._write(db_path, _summary("0050", "2024-06-14", roi=0.2), _summary("0050", "2024-06-13", roi=0.1))
+        assert _latest(db_path) == [_summary("0050", "2024-06-14", roi=0.2)]
+
+    def test_same_day_rewrite_updates_values(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        self._write(db_path, _summary("0050", "2024-06-14", roi=0.2), incremental=True)
+        self._write(db_path, _summary("0050", "2024-06-14", roi=0.3), incremental=True)
+        assert _latest(db_path) == [_summary("0050", "2024-06-14", roi=0.3)]
+
+    def test_matches_group_by_query(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        days = pd.bdate_range("2024-06-03", periods=5).strftime("%Y-%m-%d")
+        for i, day in enumerate(days):
+            self._write(db_path, *[_summary(s, day, m, roi=i / 10) for s in ("0050", "0056") for m in ("a", "b")])
+        with sqlite3.connect(db_path) as conn:
+            expected = conn.execute(
+                "SELECT bs.* FROM bt_summaries bs INNER JOIN (SELECT stock_id, method, MAX(date) AS d "
+                "FROM bt_summaries GROUP BY stock_id, method) l "
+                "ON bs.stock_id = l.stock_id AND bs.method = l.method AND bs.date = l.d "
+                "ORDER BY bs.stock_id, bs.method").fetchall()
+        assert _latest(db_path) == expected
+
+    def test_clear_tables_empties_latest(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        self._write(db_path, _summary("0050", "2024-06-14"))
+        strategy = TwStrategy()
+        strategy.DB_PATH = db_path
+        strategy.clear_tables()
+        assert _latest(db_path) == []
+
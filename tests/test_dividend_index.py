@@ -0,0 +1,80 @@
+"""
+Unit tests for DividendIndex
+"""
+import pytest
+import pandas as pd
+import numpy as np
+
+from app.repositories.dividend_index import DividendIndex
+
+
+DIVIDEND_COL = "stock_and_cache_dividend"
+
+
+def _make_df(dividends: list) -> pd.DataFrame:
+    dates = pd.date_range("2024-01-01", periods=len(dividends), freq="B")
+    return pd.DataFrame({"date": dates, DIVIDEND_COL: [float(d) for d in dividends]})
+
+
+def _scan_last_before(df: pd.DataFrame, when, after=None):
+    """The original full-frame boolean-mask lookup from bt_strategy."""
+    mask = (df[DIVIDEND_COL] > 0) & (df["date"] < when)
+    if after is not None:
+        mask &= df["date"] > after
+    div_data = df.loc[mask, ["date", DIVIDEND_COL]]
+    if div_data.empty:
+        return None
+    return div_data["date"].values[-1], div_data[DIVIDEND_COL].values[-1]
+
+
+class TestFromFrame:
+    def test_only_positive_dividends_indexed(self):
+        df = _make_df([0, 1.5, 0, np.nan, 2.0, 0])
+        index = DividendIndex.from_frame(df, DIVIDEND_COL)
+        assert len(index) == 2
+        assert index.amounts.tolist() == [1.5, 2.0]
+        assert index.cumulative.tolist() == [1.5, 3.5]
+
+    def test_empty_when_no_dividends(self):
+        index = DividendIndex.from_frame(_make_df([0, 0, 0]), DIVIDEND_COL)
+        assert len(index) == 0
+        assert index.last_before(pd.Timestamp("2030-01-01")) == -1
+
+
+class TestLastBefore:
+    def test_excludes_same_day(self):
+        df = _make_df([0, 1.0, 0])
+        index = DividendIndex.from_frame(df, DIVIDEND_COL)
+        assert index.last_before(df["date"][1]) == -1
+        assert index.last_before(df["date"][2]) == 0
+
+    def test_after_is_exclusive(self):
+        df = _make_df([1.0, 0, 2.0, 0])
+        index = DividendIndex.from_frame(df, DIVIDEND_COL)
+        assert index.last_before(df["date"][3], after=df["date"][2]) == -1
+        assert index.last_before(df["date"][3], after=df["date"][0]) == 1
+
+    def test_matches_full_frame_scan(self):
+        rng = np.random.default_rng(0)
+        dividends = np.where(rng.random(400) < 0.05, rng.uniform(0.1, 3.0, 400), 0.0)
+        df = _make_df(dividends.tolist())
+        index = DividendIndex.from_frame(df, DIVIDEND_COL)
+
+        last_div_date = None
+        for when in df["date"][::7]:
+            expected = _scan_last_before(df, when, last_div_date)
+            i = index.last_before(when, after=last_div_date)
+            if expected is None:
+                assert i == -1
+            else:
+                assert (index.dates[i], index.amounts[i]) == expected
+                last_div_date = index.dates[i]
+
+
+class TestPerShareBetween:
+    def test_open_interval_sum(self):
+        df = _make_df([1.0, 0, 2.0, 0, 4.0, 0])
+        index = DividendIndex.from_frame(df, DIVIDEND_COL)
+        assert index.per_share_between(None, df["date"][5]) == pytest.approx(7.0)
+        assert index.per_share_between(df["date"][0], df["date"][4]) == pytest.approx(2.0)
+        assert index.per_share_between(df["date"][4], df["date"][5]) == 0.0
@@ -0,0 +1,78 @@
+"""
+Unit tests for multi-path update chunking (checked against an in-memory Realtime Database emulator)
+"""
+import json
+
+from app.services.firebase import chunk_updates
+
+
+def _normalize(value):
+    """Realtime Database 以字串鍵保存陣列"""
+    if isinstance(value, list):
+        value = {str(i): v for i, v in enumerate(value)}
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    return value
+
+
+def _apply(tree, updates):
+    """模擬 update()：每個路徑整個覆寫、None 刪除；同一次 update 不可同時含祖先與子孫路徑"""
+    paths = list(updates)
+    assert not any(a != b and b.startswith(a + "/") for a in paths for b in paths)
+    for path, value in updates.items():
+        *parents, leaf = path.split("/")
+        node = tree
+        for key in parents:
+            node = node.setdefault(key, {})
+        if value is None:
+            node.pop(leaf, None)
+        else:
+            node[leaf] = _normalize(value)
+    return tree
+
+
+def _size(updates):
+    return len(json.dumps(updates, separators=(",", ":")).encode("utf-8"))
+
+
+def _updates(n_stocks=20, n_logs=30):
+    logs = {f"{i:04d}": [{"date": f"2024-01-{d + 1:02d}", "close": "10.00"} for d in range(n_logs)]
+            for i in range(n_stocks)}
+    return {
+        "tw/recent_transaction_logs": [{"stock_id": "0050", "date": "2024-01-02"}],
+        "tw/bt_dividend/summaries": [{"stock_id": f"{i:04d}", "roi": "0.1000"} for i in range(n_stocks)],
+        "tw/bt_dividend/transaction_logs": logs,
+    }
+
+
+class TestChunkUpdates:
+    def test_small_payload_is_one_update(self):
+        updates = _updates()
+        assert chunk_updates(updates, 10 * 1024 * 1024) == [updates]
+
+    def test_chunks_respect_limit_and_rebuild_same_tree(self):
+        updates = _updates()
+        max_bytes = 4000
+        chunks = chunk_updates(updates, max_bytes)
+        assert len(chunks) > 1
+        assert all(_size(chunk) <= max_bytes * 1.1 for chunk in chunks)
+
+        chunked = {}
+        for chunk in chunks:
+            _apply(chunked, chunk)
+        assert chunked == _apply({}, updates)
+
+    def test_split_node_still_replaces_stale_children(self):
+        existing = _apply({}, {"tw/bt_dividend/transaction_logs": {"9999": [{"date": "2020-01-01"}]}})
+        updates = _updates()
+        for chunk in chunk_updates(updates, 4000):
+            _apply(existing, chunk)
+        assert "9999" not in existing["tw"]["bt_dividend"]["transaction_logs"]
+        assert existing == _apply({}, updates)
+
+    def test_oversized_leaf_is_its_own_chunk(self):
+        updates = {"a": "x" * 500, "b": "y" * 10}
+        assert chunk_updates(updates, 100) == [{"a": "x" * 500}, {"b": "y" * 10}]
+
+    def test_empty_node_kept(self):
+        assert chunk_updates({"tw/bt_signals/transaction_logs": {}}, 100) == [{"tw/bt_signals/transaction_logs": {}}]
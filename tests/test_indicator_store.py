@@ -0,0 +1,96 @@
+"""
+Unit tests for IndicatorStore (incremental MACD / RSI / MA cache)
+"""
+import pytest
+import pandas as pd
+import numpy as np
+
+from app.repositories.base_strategy import TwStrategy
+from app.repositories.indicator_store import IndicatorStore
+
+
+def _prices(n=600, seed=0, nan_at=(5, 300, 301)):
+    rng = np.random.default_rng(seed)
+    values = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    values[list(nan_at)] = np.nan   # outer-merged dividend-only rows have no close
+    return pd.Series(values)
+
+
+def _assert_matches_full(result: dict, price: pd.Series, exact_ewm: bool = True):
+    expected = TwStrategy._macd_rsi_columns(price)
+    for col in ("MACD", "Signal"):
+        if exact_ewm:
+            np.testing.assert_array_equal(result[col].to_numpy(), expected[col].to_numpy())
+        else:
+            np.testing.assert_allclose(result[col].to_numpy(), expected[col].to_numpy())
+    np.testing.assert_allclose(result["RSI"].to_numpy(), expected["RSI"].to_numpy(), rtol=1e-9, equal_nan=True)
+
+
+class TestMacdRsi:
+    def test_cold_start_equals_full_computation(self, tmp_path):
+        price = _prices()
+        _assert_matches_full(IndicatorStore(tmp_path).macd_rsi("0050", price), price)
+
+    @pytest.mark.parametrize("start", [100, 299, 300, 599])
+    def test_extension_equals_full_computation(self, tmp_path, start):
+        """Extending day by day must reproduce a full recompute (EWM bit-for-bit)."""
+        price = _prices()
+        store = IndicatorStore(tmp_path)
+        store.macd_rsi("0050", price[:start])
+        for n in range(start + 1, min(start + 4, len(price)) + 1):
+            result = IndicatorStore(tmp_path).macd_rsi("0050", price[:n])
+        _assert_matches_full(result, price[:n])
+
+    def test_history_rewrite_triggers_full_recompute(self, tmp_path):
+        price = _prices()
+        store = IndicatorStore(tmp_path)
+        store.macd_rsi("0050", price[:500])
+
+        adjusted = price * 0.5           # e.g. a 2:1 split re-adjusts the whole history
+        result = store.macd_rsi("0050", adjusted)
+        _assert_matches_full(result, adjusted)
+
+    def test_unchanged_history_served_from_cache(self, tmp_path):
+        price = _prices()
+        store = IndicatorStore(tmp_path)
+        first = store.macd_rsi("0050", price)
+        second = store.macd_rsi("0050", price)
+        for col in ("MACD", "Signal", "RSI"):
+            np.testing.assert_array_equal(first[col].to_numpy(), second[col].to_numpy())
+
+    def test_keyed_by_parameters(self, tmp_path):
+        price = _prices(nan_at=())
+        store = IndicatorStore(tmp_path)
+        store.macd_rsi("0050", price)
+        store.macd_rsi("0050", price, fast=5, slow=35, signal=5)
+        assert len(list(tmp_path.glob("0050_macd_rsi_*.npz"))) == 2
+
+
+class TestMovingAverage:
+    @pytest.mark.parametrize("start", [50, 119, 400])
+    def test_extension_equals_full_rolling_mean(self, tmp_path, start):
+        price = _prices()
+        store = IndicatorStore(tmp_path)
+        store.moving_average("0050", price[:start])
+        result = store.moving_average("0050", price)
+        np.testing.assert_allclose(result.to_numpy(), price.rolling(window=120).mean().to_numpy(),
+                                   rtol=1e-12, equal_nan=True)
+
+
+class TestStrategyIntegration:
+    def test_signals_unchanged_with_store(self, tmp_path):
+        dates = pd.bdate_range("2020-01-01", periods=600)
+        df = pd.DataFrame({
+            "stock_id": "0050",
+            "date": dates,
+            "close": _prices(nan_at=()).to_numpy(),
+            "stock_and_cache_dividend": 0.0,
+        })
+        plain = TwStrategy()
+        cached = TwStrategy()
+        cached.indicator_store = IndicatorStore(tmp_path)
+
+        for method in ("bt_signals", "bt_ma_pullback"):
+            cached.buy_signal(df.iloc[:550], method)      # warm the cache with older history
+            pd.testing.assert_series_equal(cached.buy_signal(df, method), plain.buy_signal(df, method),
+                                           check_names=False)
@@ -0,0 +1,146 @@
+"""
+Parallel runner tests: results and SQLite contents must equal the sequential bt_strategies() path.
+"""
+import logging
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.repositories.base_strategy import TwStrategy
+from app.repositories.parallel_backtest import ParallelBacktestRunner, SharedPrices
+
+
+class _TwDb(TwStrategy):
+    """DB_PATH is set per instance so the strategy stays picklable for worker processes."""
+
+
+def _strategy(db_path):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS transaction_logs (stock_id TEXT, date TEXT, method TEXT, "
+                     "position_size REAL, position_price REAL, position_value REAL, date_closed_price REAL, "
+                     "broker_dividend REAL, asset_value REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS bt_summaries (stock_id TEXT, date TEXT, method TEXT, close REAL, "
+                     "position_value REAL, broker_dividend REAL, asset_value REAL, roi REAL, irr REAL)")
+    strategy = _TwDb()
+    strategy.DB_PATH = db_path
+    return strategy
+
+
+def _dump(db_path):
+    with sqlite3.connect(db_path) as conn:
+        logs = conn.execute("SELECT * FROM transaction_logs ORDER BY stock_id, method, date").fetchall()
+        summaries = conn.execute("SELECT * FROM bt_summaries ORDER BY stock_id, method").fetchall()
+    return logs, summaries
+
+
+def _random_df(stock_id, seed, n=800):
+    rng = np.random.default_rng(seed)
+    dividends = np.zeros(n)
+    dividends[30::63] = rng.uniform(0.5, 3.0, len(dividends[30::63]))
+    df = pd.DataFrame({
+        "stock_id": stock_id,
+        "date": pd.bdate_range("2019-01-01", periods=n),
+        "close": 100.0 * np.exp(np.cumsum(rng.normal(0, 0.015, n))),
+        "stock_and_cache_dividend": dividends,
+    })
+    # dividend-only rows from the outer merge carry no stock_id
+    return df.assign(stock_id=df['stock_id'].where(np.arange(n) % 97 != 5))
+
+
+STOCKS = [_random_df("0050", 1), _random_df("0056", 2), _random_df("00878", 3)]
+
+
+class TestSharedPrices:
+    def test_round_trip(self, tmp_path):
+        prices = SharedPrices(tmp_path, "close", "stock_and_cache_dividend")
+        prices.save("0050", STOCKS[0])
+        loaded = prices.load("0050")
+        pd.testing.assert_frame_equal(loaded, STOCKS[0], check_dtype=False)
+        assert loaded['date'].dtype == 'datetime64[ns]'
+
+
+class TestParallelBacktestRunner:
+    @pytest.mark.parametrize("workers", [1, 3])
+    @pytest.mark.parametrize("incremental", [False, True])
+    def test_matches_sequential(self, tmp_path, workers, incremental):
+        sequential = _strategy(tmp_path / "seq.sqlite")
+        for df in STOCKS:
+            sequential.bt_strategies(df, incremental=incremental)
+
+        with ParallelBacktestRunner(_strategy(tmp_path / "par.sqlite"), workers=workers) as runner:
+            for df in STOCKS:
+                runner.add(df)
+            runner.run(incremental=incremental)
+
+        assert _dump(tmp_path / "par.sqlite") == _dump(tmp_path / "seq.sqlite")
+
+    def test_runs_again_until_closed(self, tmp_path):
+        with ParallelBacktestRunner(_strategy(tmp_path / "db.sqlite"), workers=1) as runner:
+            runner.add(STOCKS[0])
+            runner.run(methods=['bt_dividend'], incremental=True)
+            runner.add(STOCKS[1])
+            runner.run(methods=['bt_dividend'], incremental=True)
+            root = runner.prices.root
+            assert root.exists()
+        assert not root.exists()
+
+        sequential = _strategy(tmp_path / "seq.sqlite")
+        for df in STOCKS[:2]:
+            sequential.bt_strategies(df, methods=['bt_dividend'], incremental=True)
+        assert _dump(tmp_path / "db.sqlite") == _dump(tmp_path / "seq.sqlite")
+
+    def test_worker_logs_reach_main_handlers(self, tmp_path):
+        records = []
+
+        class _Collect(logging.Handler):
+            def emit(self, record):
+                records.append(record.getMessage())
+
+        logger = logging.getLogger("test_parallel_backtest")
+        handler = _Collect(level=logging.DEBUG)
+        logger.addHandler(handler)
+        logger.setLevel(logging.DEBUG)
+        try:
+            with ParallelBacktestRunner(_strategy(tmp_path / "db.sqlite"), workers=2, logger=logger) as runner:
+                runner.add(STOCKS[0])
+                runner.run(methods=['bt_dividend', 'bt_monthly_dca'])
+        finally:
+            logger.removeHandler(handler)
+
+        jobs = [m for m in records if m.startswith("回測 ")]
+        assert sorted(m.split(" (pid")[0] for m in jobs) == ["回測 0050 bt_dividend", "回測 0050 bt_monthly_dca"]
+        assert any(m.startswith("寫入回測結果") and "rows/sec" in m for m in records)
+
+    def test_prune_removes_dropped_stock(self, tmp_path):
+        def run(db_path, stocks):
+            with ParallelBacktestRunner(_strategy(db_path), workers=1) as runner:
+                for df in stocks:
+                    runner.add(df)
+                runner.run(incremental=True, prune=True)
+
+        run(tmp_path / "db.sqlite", STOCKS)
+        # a dividend row written without stock_id by an older version belongs to no pair
+        with sqlite3.connect(tmp_path / "db.sqlite") as conn:
+            conn.execute("INSERT INTO transaction_logs (stock_id, date, method) VALUES (NULL, '2019-06-08', 'bt_dividend')")
+        run(tmp_path / "db.sqlite", STOCKS[:2])
+        run(tmp_path / "fresh.sqlite", STOCKS[:2])
+
+        assert _dump(tmp_path / "db.sqlite") == _dump(tmp_path / "fresh.sqlite")
+        with sqlite3.connect(tmp_path / "db.sqlite") as conn:
+            for table in ("transaction_logs", "bt_summaries", "latest_bt_summaries", "bt_checkpoints"):
+                stocks = {row[0] for row in conn.execute(f"SELECT DISTINCT stock_id FROM {table}")}
+                assert stocks == {"0050", "0056"}, table
+
+    def test_write_error_fails_the_run(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        with sqlite3.connect(db_path) as conn:
+            # a schema the sink cannot write into
+            conn.execute("CREATE TABLE transaction_logs (stock_id TEXT, date TEXT, method TEXT)")
+        strategy = _strategy(db_path)
+        with ParallelBacktestRunner(strategy, workers=1) as runner, pytest.raises(sqlite3.Error):
+            runner.add(STOCKS[0])
+            runner.run(methods=['bt_dividend'], incremental=True)
+        with sqlite3.connect(db_path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM bt_summaries").fetchone()[0] == 0
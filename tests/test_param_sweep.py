@@ -0,0 +1,104 @@
+"""
+Unit tests for the batched parameter sweep
+"""
+import pytest
+import pandas as pd
+import numpy as np
+
+from app.repositories.base_strategy import TwStrategy, UsStrategy
+from app.repositories.budget_allocator import BudgetAllocator
+from app.repositories.bt_engine import BacktestInputs, run_vectorized
+from app.repositories.dividend_index import DividendIndex
+from app.repositories.param_sweep import (
+    ParamSweep, ma_pullback_signals, macd_rsi_signals, rolling_means, sweep_backtest,
+)
+
+
+def _random_df(strategy_cls, n=1200, seed=0, dividend_every=21, stock_id="0050"):
+    rng = np.random.default_rng(seed)
+    dividends = np.zeros(n)
+    dividends[dividend_every::dividend_every] = rng.uniform(0.5, 3.0, len(dividends[dividend_every::dividend_every]))
+    return pd.DataFrame({
+        "stock_id": stock_id,
+        "date": pd.bdate_range("2018-01-01", periods=n),
+        strategy_cls.CLOSED_PRICE_COLUMN: 100.0 * np.exp(np.cumsum(rng.normal(0, 0.015, n))),
+        strategy_cls.DIVIDEND_COLUMN: dividends,
+    })
+
+
+class _TwPointInTime(TwStrategy):
+    BUDGET_POLICY = 'point_in_time'
+
+
+class TestSignals:
+    def test_rolling_means_match_pandas(self):
+        price = np.random.default_rng(1).uniform(10, 20, 300)
+        price[[40, 41, 200]] = np.nan
+        result = rolling_means(price, [1, 5, 30, 500])
+        for j, window in enumerate([1, 5, 30, 500]):
+            expected = pd.Series(price).rolling(window=window).mean().to_numpy()
+            np.testing.assert_allclose(result[:, j], expected, rtol=1e-12, equal_nan=True)
+
+    def test_ma_pullback_matches_strategy(self):
+        df = _random_df(TwStrategy, seed=2)
+        price = df[TwStrategy.CLOSED_PRICE_COLUMN]
+        signals = ma_pullback_signals(price.to_numpy(), [60, 120])
+        for j, window in enumerate([60, 120]):
+            expected = TwStrategy._ma_pullback_columns(price, window)['MA_pullback_signal']
+            assert signals[:, j].tolist() == expected.tolist()
+
+    def test_macd_rsi_matches_strategy_and_column_order(self):
+        df = _random_df(TwStrategy, seed=3)
+        price = df[TwStrategy.CLOSED_PRICE_COLUMN]
+        signals = macd_rsi_signals(price, [(8, 17, 9), (12, 26, 9)], [40, 50])
+        assert signals.shape == (len(df), 4)
+        columns = TwStrategy._macd_rsi_columns(price)
+        assert signals[:, 3].tolist() == (columns['MACD_signal'] & columns['RSI_signal']).tolist()
+
+
+class TestSweepBacktest:
+    @pytest.mark.parametrize("policy", BudgetAllocator.POLICIES)
+    def test_totals_match_vectorized_engine(self, policy):
+        df = _random_df(UsStrategy, seed=4, stock_id="VOO")
+        signals = np.random.default_rng(5).random((len(df), 6)) < [[0.01, 0.03, 0.05, 0.1, 0.2, 0.5]]
+        dividend_index = DividendIndex.from_frame(df, UsStrategy.DIVIDEND_COLUMN)
+        inputs = BacktestInputs.from_frame(df, UsStrategy.CLOSED_PRICE_COLUMN)
+        totals = sweep_backtest(inputs.dates, inputs.closes, signals, dividend_index, 3500, policy)
+
+        for j in range(signals.shape[1]):
+            allocator = BudgetAllocator.from_signals(df['date'], pd.Series(signals[:, j]), 3500, policy)
+            result = run_vectorized(inputs, signals[:, j], 'sweep', dividend_index, allocator)
+            assert totals['position_size'][j] == result.position_size
+            assert totals['broker_dividend'][j] == result.broker_dividend
+            assert totals['total_investment'][j] == result.total_investment
+
+
+class TestParamSweep:
+    @pytest.mark.parametrize("strategy_cls", [TwStrategy, _TwPointInTime])
+    def test_default_params_match_bt_summary(self, strategy_cls, monkeypatch):
+        df = _random_df(strategy_cls, seed=6)
+        summaries = []
+        monkeypatch.setattr(strategy_cls, 'write_batch',
+                            lambda self, batch, incremental=False: summaries.extend(batch.summaries))
+        strategy = strategy_cls()
+        strategy.bt_strategies(df, methods=['bt_signals', 'bt_ma_pullback'])
+        expected = {row[2]: (row[7], row[8]) for row in summaries}
+
+        sweep = ParamSweep(strategy)
+        ma = sweep.ma_pullback(df, [60, 120, 200]).set_index('window')
+        macd = sweep.macd_rsi(df, [(12, 26, 9)], [40, 50]).set_index('rsi_threshold')
+        assert (ma.loc[120, 'roi'], ma.loc[120, 'irr']) == expected['bt_ma_pullback']
+        assert (macd.loc[50, 'roi'], macd.loc[50, 'irr']) == expected['bt_signals']
+
+    def test_chunking_does_not_change_results(self):
+        df = _random_df(TwStrategy, seed=7)
+        sweep = ParamSweep(TwStrategy())
+        full = sweep.ma_pullback(df, range(20, 80))
+        sweep.CHUNK_COLUMNS = 7
+        pd.testing.assert_frame_equal(sweep.ma_pullback(df, range(20, 80)), full)
+
+    def test_combination_without_trades(self):
+        df = _random_df(TwStrategy, n=100, seed=8)
+        table = ParamSweep(TwStrategy()).ma_pullback(df, [200])
+        assert table.loc[0, 'trades'] == 0
+        assert np.isnan(table.loc[0, 'roi'])
@@ -0,0 +1,113 @@
+"""
+Unit tests for ColumnarCache
+"""
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.repositories.price_cache import ColumnarCache
+
+
+def _frame(n=5, start="2024-01-01"):
+    return pd.DataFrame({
+        "date": pd.bdate_range(start, periods=n),
+        "stock_id": ["0050"] * n,
+        "close": np.linspace(100, 110, n),
+        "Trading_Volume": np.arange(n, dtype=np.int64) * 1000,
+    })
+
+
+class TestReadWrite:
+    def test_round_trip_keeps_dtypes(self, tmp_path):
+        cache = ColumnarCache(tmp_path)
+        df = _frame().assign(stock_id=["0050", np.nan, "0050", "0050", "0050"])
+        cache.write("0050", df)
+        loaded = cache.read("0050")
+        pd.testing.assert_frame_equal(loaded, df)
+        assert loaded["date"].dtype == "datetime64[ns]"
+        assert pd.isna(loaded.loc[1, "stock_id"])
+
+    def test_missing_key_returns_none(self, tmp_path):
+        assert ColumnarCache(tmp_path).read("nope") is None
+
+    def test_write_replaces_previous_partitions(self, tmp_path):
+        cache = ColumnarCache(tmp_path)
+        cache.write("0050", _frame(5))
+        cache.write("0050", _frame(3))
+        assert len(cache.read("0050")) == 3
+        assert len([p for p in (tmp_path / "0050").iterdir() if p.is_dir()]) == 1
+
+    def test_unreferenced_partition_ignored(self, tmp_path):
+        """A crash after writing a partition but before the manifest swap leaves the old data readable."""
+        cache = ColumnarCache(tmp_path)
+        cache.write("0050", _frame(5))
+        cache._write_partition("0050", cache._next_partition("0050"), _frame(2))
+        assert len(cache.read("0050")) == 5
+
+
+class TestAppend:
+    def test_append_adds_partition(self, tmp_path):
+        cache = ColumnarCache(tmp_path)
+        cache.write("0050", _frame(5))
+        cache.append("0050", _frame(2, start="2024-02-01"))
+        manifest = json.loads((tmp_path / "0050" / "manifest.json").read_text())
+        assert len(manifest["partitions"]) == 2
+        assert manifest["rows"] == 7
+        assert cache.read("0050")["date"].is_monotonic_increasing
+
+    def test_append_column_mismatch_raises(self, tmp_path):
+        cache = ColumnarCache(tmp_path)
+        cache.write("0050", _frame(5))
+        with pytest.raises(ValueError):
+            cache.append("0050", _frame(2).drop(columns="close"))
+
+    def test_compacts_after_max_partitions(self, tmp_path):
+        cache = ColumnarCache(tmp_path)
+        cache.MAX_PARTITIONS = 3
+        cache.write("0050", _frame(1))
+        for i in range(5):
+            cache.append("0050", _frame(1, start=f"2024-02-0{i + 1}"))
+        manifest = json.loads((tmp_path / "0050" / "manifest.json").read_text())
+        assert len(manifest["partitions"]) <= 3
+        assert len(cache.read("0050")) == 6
+
+
+class TestSave:
+    def test_prefix_only_appends(self, tmp_path):
+        cache = ColumnarCache(tmp_path)
+        df = _frame(8)
+        cache.write("0050", df.iloc[:5])
+        cache.save("0050", df)
+        manifest = json.loads((tmp_path / "0050" / "manifest.json").read_text())
+        assert len(manifest["partitions"]) == 2
+        pd.testing.assert_frame_equal(cache.read("0050"), df)
+
+    def test_restated_rows_rewrite(self, tmp_path):
+        cache = ColumnarCache(tmp_path)
+        df = _frame(8)
+        cache.write("0050", df.iloc[:5])
+        restated = df.assign(close=df["close"] / 4)
+        cache.save("0050", restated)
+        manifest = json.loads((tmp_path / "0050" / "manifest.json").read_text())
+        assert len(manifest["partitions"]) == 1
+        pd.testing.assert_frame_equal(cache.read("0050"), restated)
+
+
+class TestMigration:
+    def test_legacy_csv_converted_once(self, tmp_path):
+        legacy = tmp_path / "0050.csv"
+        df = _frame(4)
+        df.assign(date=df["date"].dt.strftime("%Y-%m-%d")).to_csv(legacy, encoding="utf_8_sig", index=False)
+
+        cache = ColumnarCache(tmp_path / "cache")
+        migrated = cache.load_or_migrate("0050", legacy, dtype={"stock_id": str})
+        pd.testing.assert_frame_equal(migrated, df)
+        assert cache.exists("0050")
+
+        legacy.unlink()
+        pd.testing.assert_frame_equal(cache.load_or_migrate("0050", legacy, dtype={"stock_id": str}), df)
+
+    def test_nothing_to_migrate(self, tmp_path):
+        assert ColumnarCache(tmp_path).load_or_migrate("0050", tmp_path / "missing.csv") is None
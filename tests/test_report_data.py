@@ -0,0 +1,88 @@
+"""
+Unit tests for report_data (inline HTML report payload)
+"""
+import base64
+import gzip
+import json
+from contextlib import closing
+
+import numpy as np
+import pytest
+
+from app.repositories import db_schema, report_data
+from app.repositories.bt_engine import BacktestBatch
+from app.repositories.result_sink import SqliteResultSink
+
+
+def _populate(db_path):
+    dates = ["2024-01-02", "2024-01-03", "2024-01-08", "2024-02-01"]
+    with SqliteResultSink(db_path, "transaction_logs", "bt_summaries") as sink:
+        for stock_id in ("0056", "0050"):
+            logs = [(stock_id, d, "bt_dividend", 1.0, 10.0, 10.0 + i / 3, 10.0, 0.0, 11.0 + i / 3)
+                    for i, d in enumerate(dates)]
+            summaries = [(stock_id, day, "bt_dividend", 10.0, 10.0, 0.0, 11.0, roi, 0.05)
+                         for day, roi in (("2024-01-31", 0.1), ("2024-02-01", 0.123456))]
+            sink.add(BacktestBatch(logs=logs, summaries=summaries))
+        # 沒有 summary 的組合不輸出曲線
+        sink.add(BacktestBatch(logs=[("2330", "2024-01-02", "bt_signals", 1.0, 1.0, 1.0, 1.0, 0.0, 1.0)], summaries=[]))
+    return dates
+
+
+class TestPayload:
+    def test_curves_and_latest_summaries(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        dates = _populate(db_path)
+        payload = report_data.build_payload({"TW": db_path})
+
+        assert sorted(payload["curves"]) == ["TW/0050/bt_dividend", "TW/0056/bt_dividend"]
+        curve = payload["curves"]["TW/0050/bt_dividend"]
+        decoded = np.datetime64(curve["d0"]) + np.cumsum([0] + curve["dd"]).astype("timedelta64[D]")
+        assert [str(d) for d in decoded] == dates
+        assert curve["pv"] == [10.0, 10.33, 10.67, 11.0]
+        assert curve["av"] == [11.0, 11.33, 11.67, 12.0]
+
+        assert payload["summary_columns"] == report_data.SUMMARY_COLUMNS
+        assert payload["summaries"]["TW/0056/bt_dividend"] == ["2024-02-01", 10.0, 10.0, 0.0, 11.0, 0.1235, 0.05]
+
+    def test_markets_are_prefixed(self, tmp_path):
+        (tmp_path / "tw").mkdir()
+        (tmp_path / "us").mkdir()
+        _populate(tmp_path / "tw" / "db.sqlite")
+        _populate(tmp_path / "us" / "db.sqlite")
+        payload = report_data.build_payload({"TW": tmp_path / "tw" / "db.sqlite", "US": tmp_path / "us" / "db.sqlite"})
+        assert {key.split("/")[0] for key in payload["curves"]} == {"TW", "US"}
+        assert len(payload["summaries"]) == 4
+
+    def test_nan_is_null(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        _populate(db_path)
+        with closing(db_schema.connect(db_path)) as conn, conn:
+            conn.execute("UPDATE transaction_logs SET asset_value = NULL WHERE date = '2024-01-03'")
+            curves = report_data.equity_curves(conn, "TW")
+        assert curves["TW/0050/bt_dividend"]["av"][1] is None
+
+
+class TestEncode:
+    PAYLOAD = {"v": 1, "curves": {"TW/0050/m": {"d0": "2024-01-02", "dd": [1], "pv": [1.0, 2.0]}}, "note": "</script>"}
+
+    def test_gzip_base64_round_trip(self):
+        encoded = report_data.encode(self.PAYLOAD, report_data.GZIP_BASE64)
+        assert json.loads(gzip.decompress(base64.b64decode(encoded))) == self.PAYLOAD
+        assert encoded == report_data.encode(self.PAYLOAD, report_data.GZIP_BASE64)
+
+    def test_script_tag_escapes_closing_tag(self):
+        tag = report_data.script_tag(self.PAYLOAD)
+        body = tag[tag.index(">") + 1:-len("</script>")]
+        assert "</" not in body
+        assert json.loads(body.replace("<\\/", "</")) == self.PAYLOAD
+        assert 'data-encoding="json"' in tag
+
+    def test_unknown_encoding(self):
+        with pytest.raises(ValueError):
+            report_data.encode(self.PAYLOAD, "brotli")
+
+    def test_file_sizes(self, tmp_path):
+        (tmp_path / "a.png").write_bytes(b"x" * 3)
+        (tmp_path / "b.png").write_bytes(b"x" * 5)
+        (tmp_path / "c.html").write_bytes(b"x")
+        assert sorted(report_data.file_sizes(tmp_path)) == [3, 5]
@@ -0,0 +1,130 @@
+"""
+Unit tests for SqliteResultSink (single connection, WAL, batched transactions)
+"""
+import pickle
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from app.repositories.base_strategy import TwStrategy
+from app.repositories.bt_engine import BacktestBatch
+from app.repositories.result_sink import SqliteResultSink
+
+
+def _create_tables(db_path):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE transaction_logs (stock_id TEXT, date TEXT, method TEXT, position_size REAL, "
+                     "position_price REAL, position_value REAL, date_closed_price REAL, broker_dividend REAL, "
+                     "asset_value REAL)")
+        conn.execute("CREATE TABLE bt_summaries (stock_id TEXT, date TEXT, method TEXT, close REAL, "
+                     "position_value REAL, broker_dividend REAL, asset_value REAL, roi REAL, irr REAL)")
+
+
+def _batch(stock_id, n_logs=3, method="bt_dividend", day="2024-06-14"):
+    dates = pd.bdate_range("2024-01-01", periods=n_logs).strftime("%Y-%m-%d")
+    logs = [(stock_id, d, method, 1.0, 10.0, 10.0, 10.0, 0.0, 10.0) for d in dates]
+    summary = (stock_id, day, method, 10.0, 10.0, 0.0, 10.0, 0.0, 0.0)
+    return BacktestBatch(logs=logs, summaries=[summary], resumed=[(stock_id, method, None)])
+
+
+def _count(db_path, table):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def _sink(db_path, **kwargs):
+    return SqliteResultSink(db_path, "transaction_logs", "bt_summaries", **kwargs)
+
+
+class TestSqliteResultSink:
+    def test_buffers_until_close_in_one_transaction(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        _create_tables(db_path)
+        with _sink(db_path) as sink:
+            for stock_id in ["0050", "0056", "2330"]:
+                sink.add(_batch(stock_id))
+            assert _count(db_path, "transaction_logs") == 0
+        assert _count(db_path, "transaction_logs") == 9
+        assert sink.stats.transactions == 1
+        assert sink.stats.rows == 12
+        assert sink.stats.rows_per_second > 0
+        assert "rows/sec" in str(sink.stats)
+
+    def test_wal_journal_mode(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        _create_tables(db_path)
+        with _sink(db_path) as sink:
+            sink.add(_batch("0050"))
+            sink.flush()
+            assert sink.connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    def test_flushes_when_batch_rows_reached(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        _create_tables(db_path)
+        with _sink(db_path, batch_rows=5) as sink:
+            sink.add(_batch("0050"))
+            assert _count(db_path, "transaction_logs") == 0
+            sink.add(_batch("0056"))
+            assert _count(db_path, "transaction_logs") == 6
+        assert sink.stats.transactions == 1
+
+    def test_incremental_replaces_rows(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        _create_tables(db_path)
+        with _sink(db_path) as sink:
+            sink.add(_batch("0050", n_logs=5), incremental=True)
+        with _sink(db_path) as sink:
+            sink.add(_batch("0050", n_logs=2), incremental=True)
+        assert _count(db_path, "transaction_logs") == 2
+        assert _count(db_path, "bt_summaries") == 1
+
+    def test_incremental_keeps_one_summary_per_pair(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        _create_tables(db_path)
+        for day in ("2024-06-13", "2024-06-14", "2024-06-17"):
+            with _sink(db_path) as sink:
+                sink.add(_batch("0050", day=day), incremental=True)
+        with sqlite3.connect(db_path) as conn:
+            assert conn.execute("SELECT date FROM bt_summaries").fetchall() == [("2024-06-17",)]
+            assert conn.execute("SELECT date FROM latest_bt_summaries").fetchall() == [("2024-06-17",)]
+
+    def test_error_rolls_back_whole_transaction(self, tmp_path, caplog):
+        db_path = tmp_path / "db.sqlite"
+        _create_tables(db_path)
+        with pytest.raises(sqlite3.Error):
+            with _sink(db_path) as sink:
+                sink.add(_batch("0050"))
+                sink.add(BacktestBatch(logs=[("0056", "2024-01-01")]))
+        assert _count(db_path, "transaction_logs") == 0
+        assert "寫入回測結果失敗" in caplog.text
+        assert sink.stats.rows == 0
+        assert sink.pending == 0
+
+
+class TestStrategyResultSink:
+    def test_shared_sink_buffers_across_calls(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        _create_tables(db_path)
+
+        class _DbStrategy(TwStrategy):
+            DB_PATH = db_path
+
+        strategy = _DbStrategy()
+        strategy.open_result_sink()
+        strategy.write_batch(_batch("0050"))
+        strategy.update_transaction_logs(_batch("0056").logs)
+        assert _count(db_path, "transaction_logs") == 0
+
+        stats = strategy.close_result_sink()
+        assert _count(db_path, "transaction_logs") == 6
+        assert stats.transactions == 1
+        assert strategy.result_sink is None
+
+    def test_strategy_pickles_without_connection(self, tmp_path):
+        strategy = TwStrategy()
+        strategy.DB_PATH = tmp_path / "db.sqlite"
+        strategy.open_result_sink().connection
+        clone = pickle.loads(pickle.dumps(strategy))
+        assert clone.result_sink is None
+        strategy.result_sink.close()
@@ -0,0 +1,107 @@
+"""
+Unit tests for incremental split detection and the vectorized universe audit
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.repositories.base_trade_record import BaseTradeRecord, TaiwanTradeRecord
+from app.repositories.split_audit import audit_splits, max_jump, price_panel
+from app.repositories.split_table import SplitTable
+
+
+THRESHOLD = BaseTradeRecord.SPLIT_RATIO_THRESHOLD
+
+
+def _prices(values, start="2024-01-01"):
+    return pd.DataFrame({"date": pd.bdate_range(start, periods=len(values)), "close": [float(v) for v in values]})
+
+
+class TestIncrementalDetectSplit:
+    def test_split_before_validated_date_ignored(self):
+        df = _prices([100.0] * 5 + [50.0] * 10)
+        assert BaseTradeRecord._detect_split(df, "close")
+        assert not BaseTradeRecord._detect_split(df, "close", since=str(df["date"].iloc[8].date()))
+
+    def test_boundary_bar_included(self):
+        # the validated bar itself vs the first new bar
+        df = _prices([100.0] * 10 + [50.0])
+        assert BaseTradeRecord._detect_split(df, "close", since=str(df["date"].iloc[9].date()))
+
+    def test_since_after_last_bar_checks_nothing_new(self):
+        df = _prices([100.0] * 5 + [50.0])
+        assert not BaseTradeRecord._detect_split(df, "close", since="2030-01-01")
+
+    def test_max_jump_matches_series_ratios(self):
+        prices = np.random.default_rng(0).lognormal(0, 0.3, 500)
+        series = pd.Series(prices)
+        expected = max((series / series.shift(1)).max(), (series.shift(1) / series).max())
+        assert max_jump(prices) == pytest.approx(expected)
+
+
+class TestAuditSplits:
+    def test_flags_jumps_across_universe(self):
+        panel = price_panel({
+            "AAA": _prices([100.0] * 5 + [50.0] * 5),
+            "BBB": _prices([10.0 + i for i in range(10)]),
+            "CCC": _prices([20.0] * 3 + [200.0] * 7),
+        }, "close")
+        result = audit_splits(panel, THRESHOLD)
+        assert result["stock_id"].tolist() == ["AAA", "CCC"]
+        assert result["ratio"].tolist() == pytest.approx([2.0, 10.0])
+        assert result["date"].tolist() == [panel.index[5], panel.index[3]]
+
+    def test_gaps_compare_with_last_traded_bar(self):
+        suspended = _prices([100.0] * 10).assign(close=[100.0] * 4 + [np.nan] * 3 + [40.0] * 3).dropna()
+        other = _prices([10.0] * 10)
+        result = audit_splits(price_panel({"AAA": suspended, "BBB": other}, "close"), THRESHOLD)
+        assert result[["stock_id", "prev_price", "price"]].values.tolist() == [["AAA", 100.0, 40.0]]
+
+    def test_matches_per_stock_detection(self):
+        rng = np.random.default_rng(1)
+        frames = {f"S{i}": _prices(100 * np.exp(np.cumsum(rng.normal(0, 0.2, 200)))) for i in range(20)}
+        flagged = set(audit_splits(price_panel(frames, "close"), THRESHOLD)["stock_id"])
+        assert flagged == {s for s, df in frames.items() if BaseTradeRecord._detect_split(df, "close")}
+
+    def test_empty_panel(self):
+        assert audit_splits(pd.DataFrame(), THRESHOLD).empty
+
+
+class TestValidatedThrough:
+    def _record(self, tmp_path, monkeypatch, splits):
+        monkeypatch.setattr(TaiwanTradeRecord, "DATA_DIR", tmp_path)
+        cache = tmp_path / f"splits_{len(list(tmp_path.glob('splits_*')))}.csv"
+        monkeypatch.setattr(SplitTable, "_shared", {
+            ("2020-01-01", None): SplitTable("2020-01-01", cache, lambda start: splits)})
+        record = TaiwanTradeRecord()
+        raw = pd.DataFrame({"date": ["2024-06-06", "2024-06-07", "2024-06-11"], "stock_id": "0050",
+                            "close": [188.0, 188.5, 47.2]})
+        monkeypatch.setattr(record, "fetchTradeData", lambda stock_id, start: raw)
+        return record
+
+    def test_meta_records_validated_date_and_factors(self, tmp_path, monkeypatch):
+        splits = pd.DataFrame({"date": ["2024-06-10"], "stock_id": ["0050"],
+                               "before_price": [188.65], "after_price": [47.16]})
+        record = self._record(tmp_path, monkeypatch, splits)
+        record.getTradeRecords("0050", "2020-01-01")
+        meta = record.cache.meta("0050_raw")
+        assert meta["split_validated"] == "2024-06-11"
+        assert meta["split_signature"] == pytest.approx([47.16 / 188.65])
+
+    def test_new_factors_invalidate_validation(self, tmp_path, monkeypatch, capsys):
+        splits = pd.DataFrame({"date": ["2024-06-10"], "stock_id": ["0050"],
+                               "before_price": [188.65], "after_price": [47.16]})
+        record = self._record(tmp_path, monkeypatch, splits)
+        record.getTradeRecords("0050", "2020-01-01")
+
+        # the split disappears from the table: the raw jump must be re-detected
+        record = self._record(tmp_path, monkeypatch, splits.iloc[:0])
+        record.getTradeRecords("0050", "2020-01-01")
+        assert "疑似股票分割" in capsys.readouterr().out
+
+    def test_audit_uses_adjusted_prices(self, tmp_path, monkeypatch):
+        splits = pd.DataFrame({"date": ["2024-06-10"], "stock_id": ["0050"],
+                               "before_price": [188.65], "after_price": [47.16]})
+        record = self._record(tmp_path, monkeypatch, splits)
+        record.getTradeRecords("0050", "2020-01-01")
+        assert record.audit_splits(["0050", "9999"]).empty
@@ -0,0 +1,157 @@
+"""
+Unit tests for SplitTable (market-wide split events fetched once per run)
+"""
+import os
+import time
+from datetime import datetime, time as clock_time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.repositories.base_trade_record import TaiwanTradeRecord
+from app.repositories.split_table import AdjustmentFactors, SplitTable
+from app.repositories.trading_calendar import TradingCalendar
+
+
+SPLITS = pd.DataFrame({
+    "date": ["2024-06-10", "2022-03-01", "2023-01-05"],
+    "stock_id": ["0050", "0050", "00631L"],
+    "before_price": [188.65, 100.0, 200.0],
+    "after_price": [47.16, 50.0, 20.0],
+    "max_price": [0, 0, 0],
+})
+
+
+class _Fetch:
+    def __init__(self, result=SPLITS):
+        self.calls = 0
+        self.result = result
+
+    def __call__(self, start_date):
+        self.calls += 1
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+class TestSplitTable:
+    def test_downloads_once_for_many_stocks(self, tmp_path):
+        fetch = _Fetch()
+        table = SplitTable("2020-01-01", tmp_path / "splits.csv", fetch)
+        for stock_id in ["0050", "0056", "00631L", "2330"] * 3:
+            table.for_stock(stock_id)
+        assert fetch.calls == 1
+
+    def test_indexed_by_stock_and_sorted(self, tmp_path):
+        table = SplitTable("2020-01-01", tmp_path / "splits.csv", _Fetch())
+        events = table.for_stock("0050")
+        assert events["date"].tolist() == [pd.Timestamp("2022-03-01"), pd.Timestamp("2024-06-10")]
+        assert table.for_stock("2330").empty
+
+    def test_fresh_disk_cache_skips_download(self, tmp_path):
+        path = tmp_path / "splits.csv"
+        SplitTable("2020-01-01", path, _Fetch()).for_stock("0050")
+
+        fetch = _Fetch()
+        events = SplitTable("2020-01-01", path, fetch).for_stock("00631L")
+        assert fetch.calls == 0
+        assert events["after_price"].tolist() == [20.0]
+
+    def test_stale_disk_cache_redownloaded(self, tmp_path):
+        path = tmp_path / "splits.csv"
+        SplitTable("2020-01-01", path, _Fetch()).for_stock("0050")
+        old = time.time() - 2 * SplitTable.MAX_AGE
+        os.utime(path, (old, old))
+
+        fetch = _Fetch()
+        SplitTable("2020-01-01", path, fetch).for_stock("0050")
+        assert fetch.calls == 1
+
+    def test_failed_download_not_retried(self, tmp_path):
+        fetch = _Fetch(RuntimeError("quota"))
+        table = SplitTable("2020-01-01", tmp_path / "splits.csv", fetch)
+        assert table.for_stock("0050").empty
+        assert table.for_stock("0056").empty
+        assert fetch.calls == 1
+        assert not (tmp_path / "splits.csv").exists()
+
+
+class TestApplySplitAdjustments:
+    def test_uses_shared_table(self, tmp_path, monkeypatch):
+        fetch = _Fetch()
+        monkeypatch.setattr(TaiwanTradeRecord, "DATA_DIR", tmp_path)
+        monkeypatch.setattr(SplitTable, "_shared", {
+            ("2020-01-01", None): SplitTable("2020-01-01", tmp_path / "splits.csv", fetch)})
+        df = pd.DataFrame({"date": ["2024-06-07", "2024-06-11"], "close": [188.0, 47.0]})
+
+        adjusted = TaiwanTradeRecord._apply_split_adjustments(df, "0050", "2020-01-01")
+        TaiwanTradeRecord._apply_split_adjustments(df, "0056", "2020-01-01")
+
+        assert adjusted["close"].tolist() == pytest.approx([188.0 * 47.16 / 188.65, 47.0])
+        assert fetch.calls == 1
+
+
+class TestAdjustmentFactors:
+    def test_matches_sequential_where_adjustment(self):
+        """Same result as the former per-event `where` loop over every OHLC column."""
+        splits = SPLITS[SPLITS["stock_id"] == "0050"].sort_values("date")
+        dates = pd.bdate_range("2021-01-01", "2025-01-01")
+        df = pd.DataFrame({"date": dates, "close": np.linspace(50, 200, len(dates))})
+
+        expected = df.copy()
+        for _, row in splits.iterrows():
+            mask = expected["date"] < pd.Timestamp(row["date"])
+            expected = expected.assign(close=expected["close"].where(~mask, expected["close"] * row["after_price"] / row["before_price"]))
+
+        adjusted = AdjustmentFactors.from_splits(splits).apply(df, ["close", "open"])
+        np.testing.assert_allclose(adjusted["close"], expected["close"], rtol=1e-12)
+
+    def test_split_day_itself_not_adjusted(self):
+        factors = AdjustmentFactors(np.array(["2024-06-10"], dtype="datetime64[ns]"), [0.25])
+        dates = np.array(["2024-06-07", "2024-06-10", "2024-06-11"], dtype="datetime64[ns]")
+        assert factors.multipliers(dates).tolist() == [0.25, 1.0, 1.0]
+
+    def test_save_load_round_trip(self, tmp_path):
+        factors = AdjustmentFactors.from_splits(SPLITS[SPLITS["stock_id"] == "0050"].sort_values("date"))
+        factors.save(tmp_path / "f.csv")
+        assert AdjustmentFactors.load(tmp_path / "f.csv") == factors
+        assert AdjustmentFactors.load(tmp_path / "missing.csv") is None
+
+
+class TestRawCacheWithFactors:
+    def _record(self, tmp_path, monkeypatch, splits):
+        monkeypatch.setattr(TaiwanTradeRecord, "DATA_DIR", tmp_path)
+        # both runs happen after the 2024-06-11 close, so the raw cache stays fresh
+        monkeypatch.setattr(TaiwanTradeRecord, "CALENDAR", TradingCalendar(
+            "tw", "Asia/Taipei", clock_time(14, 0), clock=lambda: datetime(2024, 6, 11, 20, 0)))
+        # a fresh split cache per run, as if each run happened on a different day
+        cache = tmp_path / f"splits_{len(list(tmp_path.glob('splits_*')))}.csv"
+        monkeypatch.setattr(SplitTable, "_shared", {
+            ("2020-01-01", None): SplitTable("2020-01-01", cache, _Fetch(splits))})
+        raw = pd.DataFrame({"date": ["2024-06-06", "2024-06-07", "2024-06-11"], "stock_id": "0050",
+                            "close": [188.0, 188.5, 47.2]})
+        fetches = []
+        record = TaiwanTradeRecord()
+        monkeypatch.setattr(record, "fetchTradeData", lambda stock_id, start: fetches.append(stock_id) or raw)
+        return record, fetches
+
+    def test_new_split_only_updates_factor_table(self, tmp_path, monkeypatch):
+        record, fetches = self._record(tmp_path, monkeypatch, SPLITS.iloc[:0])
+        before = record.getTradeRecords("0050", "2020-01-01")
+        assert before["close"].tolist() == [188.0, 188.5, 47.2]
+
+        # the split shows up in FinMind the next run; the raw cache is still fresh
+        record, fetches = self._record(tmp_path, monkeypatch, SPLITS)
+        after = record.getTradeRecords("0050", "2020-01-01")
+        assert fetches == []
+        assert after["close"].tolist() == pytest.approx([188.0 * 47.16 / 188.65, 188.5 * 47.16 / 188.65, 47.2])
+        assert record.cache.read("0050_raw")["close"].tolist() == [188.0, 188.5, 47.2]
+        assert (tmp_path / "0050_factors.csv").exists()
+
+    def test_unavailable_split_table_keeps_stored_factors(self, tmp_path, monkeypatch):
+        record, _ = self._record(tmp_path, monkeypatch, SPLITS)
+        adjusted = record.getTradeRecords("0050", "2020-01-01")
+
+        record, _ = self._record(tmp_path, monkeypatch, RuntimeError("quota"))
+        pd.testing.assert_frame_equal(record.getTradeRecords("0050", "2020-01-01"), adjusted)
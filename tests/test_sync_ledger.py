@@ -0,0 +1,118 @@
+"""
+Unit tests for the Firebase delta-sync ledger
+"""
+import copy
+
+from app.repositories.sync_ledger import SyncLedger, chain_hashes, plan_delta
+from tests.test_firebase import _apply
+
+LOGS = "tw/bt_dividend/transaction_logs"
+SUMMARIES = "tw/bt_dividend/summaries"
+
+
+def _rows(n, stock_id="0050"):
+    return [{"stock_id": stock_id, "date": f"2024-01-{d + 1:02d}", "close": f"{10 + d:.2f}"} for d in range(n)]
+
+
+def _state(n_0050=5, n_0056=3, roi="0.1000"):
+    nodes = {SUMMARIES: [{"stock_id": "0050", "roi": roi}]}
+    collections = {LOGS: {"0050": _rows(n_0050), "0056": _rows(n_0056, "0056")}}
+    return nodes, collections
+
+
+def _sync(tree, ledger, nodes, collections):
+    plan = plan_delta(nodes, collections, ledger)
+    _apply(tree, plan.updates)
+    for path in plan.removed:
+        ledger.pop(path)
+    ledger.update(plan.entries)
+    return plan
+
+
+def _full(nodes, collections):
+    return _apply({}, {**nodes, **collections})
+
+
+class TestChainHashes:
+    def test_prefix_hash_matches_shorter_chain(self):
+        hashes, sizes = chain_hashes(_rows(5))
+        assert hashes[3] == chain_hashes(_rows(3))[0][-1]
+        assert len(sizes) == 5
+
+
+class TestPlanDelta:
+    def test_first_sync_overwrites_whole_collection(self):
+        nodes, collections = _state()
+        plan = plan_delta(nodes, collections, {})
+        assert set(plan.updates) == {SUMMARIES, LOGS}
+        assert plan.updates[LOGS] == collections[LOGS]
+        assert f"{LOGS}/0050" in plan.entries
+        assert plan.stats.skipped_bytes == 0
+
+    def test_unchanged_nodes_skipped(self):
+        tree, ledger = {}, {}
+        first = _sync(tree, ledger, *_state())
+        plan = _sync(tree, ledger, *_state())
+        assert plan.updates == {}
+        assert plan.stats.uploaded_bytes == 0
+        assert plan.stats.skipped_bytes == first.stats.uploaded_bytes
+        assert plan.stats.skipped_nodes == 3
+
+    def test_new_rows_appended_by_index(self):
+        tree, ledger = {}, {}
+        _sync(tree, ledger, *_state())
+        plan = _sync(tree, ledger, *_state(n_0050=7))
+        assert plan.updates == {f"{LOGS}/0050/5": _rows(7)[5], f"{LOGS}/0050/6": _rows(7)[6]}
+        assert plan.stats.appended_rows == 2
+        assert 0 < plan.stats.uploaded_bytes < plan.stats.skipped_bytes
+        assert tree == _full(*_state(n_0050=7))
+
+    def test_rewritten_history_replaces_stock(self):
+        tree, ledger = {}, {}
+        _sync(tree, ledger, *_state())
+        nodes, collections = _state(n_0050=6)
+        collections[LOGS]["0050"][0] = {**collections[LOGS]["0050"][0], "close": "9.00"}
+        plan = _sync(tree, ledger, nodes, copy.deepcopy(collections))
+        assert list(plan.updates) == [f"{LOGS}/0050"]
+        assert tree == _full(nodes, collections)
+
+    def test_removed_stock_deleted(self):
+        tree, ledger = {}, {}
+        _sync(tree, ledger, *_state())
+        nodes, collections = _state()
+        del collections[LOGS]["0056"]
+        plan = _sync(tree, ledger, nodes, collections)
+        assert plan.updates == {f"{LOGS}/0056": None}
+        assert f"{LOGS}/0056" not in ledger
+        assert "0056" not in tree["tw"]["bt_dividend"]["transaction_logs"]
+
+    def test_changed_summary_uploaded(self):
+        tree, ledger = {}, {}
+        _sync(tree, ledger, *_state())
+        plan = _sync(tree, ledger, *_state(roi="0.2000"))
+        assert list(plan.updates) == [SUMMARIES]
+        assert "bytes" in str(plan.stats)
+
+    def test_sequence_of_runs_matches_full_sync(self):
+        tree, ledger = {}, {}
+        for n in range(3, 10):
+            _sync(tree, ledger, *_state(n_0050=n, n_0056=max(n - 4, 0), roi=f"{n / 10:.4f}"))
+        assert tree == _full(*_state(n_0050=9, n_0056=5, roi="0.9000"))
+
+
+class TestSyncLedger:
+    def test_save_and_load(self, tmp_path):
+        ledger = SyncLedger(tmp_path / "db.sqlite")
+        assert ledger.load() == {}
+        first = plan_delta(*_state(), {})
+        ledger.save(first)
+        assert ledger.load() == first.entries
+
+        nodes, collections = _state()
+        del collections[LOGS]["0056"]
+        second = plan_delta(nodes, collections, ledger.load())
+        ledger.save(second)
+        assert f"{LOGS}/0056" not in ledger.load()
+
+        ledger.clear()
+        assert ledger.load() == {}
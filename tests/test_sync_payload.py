@@ -0,0 +1,84 @@
+"""
+Unit tests for sync_payload (single-query WebDataSync payloads vs. the former per-stock queries)
+"""
+import sqlite3
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from app.repositories import db_schema, sync_payload
+from app.repositories.bt_engine import BacktestBatch
+from app.repositories.result_sink import SqliteResultSink
+from app.utils.formatting import format_float
+
+METHODS = ("bt_dividend", "bt_signals")
+
+
+def _populate(db_path, stocks=("0050", "0056", "2330"), n_logs=6, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2024-01-01", periods=n_logs).strftime("%Y-%m-%d")
+    with SqliteResultSink(db_path, "transaction_logs", "bt_summaries") as sink:
+        for stock_id in reversed(stocks):
+            for method in METHODS:
+                prices = rng.lognormal(0, 1.5, n_logs)
+                logs = [(stock_id, d, method, 1.0, p, p, p, 0.0, p) for d, p in zip(dates, prices)]
+                summaries = [(stock_id, day, method, 10.0, 10.0, 0.0, 10.0, rng.normal(0, 0.5), 0.05)
+                             for day in ("2024-06-13", "2024-06-14")]
+                sink.add(BacktestBatch(logs=logs, summaries=summaries))
+
+
+def _legacy_payloads(db_path):
+    """原本 do_process 的 N+1 查詢與逐格格式化"""
+    summaries, transaction_logs = {}, {}
+    with sqlite3.connect(db_path) as conn:
+        methods = pd.read_sql_query("SELECT DISTINCT method FROM bt_summaries", conn)["method"].tolist()
+        for method in methods:
+            df_method = pd.read_sql_query(
+                "SELECT bs.* FROM bt_summaries bs INNER JOIN (SELECT stock_id, MAX(date) AS latest_date "
+                "FROM bt_summaries WHERE method = ? GROUP BY stock_id) latest "
+                "ON bs.stock_id = latest.stock_id AND bs.date = latest.latest_date "
+                "WHERE bs.method = ? ORDER BY bs.stock_id", conn, params=(method, method)).map(format_float)
+            summaries[method] = df_method.to_dict("records")
+            transaction_logs[method] = {}
+            for _, row in df_method.iterrows():
+                s = pd.read_sql_query("SELECT * FROM transaction_logs WHERE stock_id = ? AND method = ? ORDER BY date",
+                                      conn, params=(row["stock_id"], method)).map(format_float)
+                transaction_logs[method][s.stock_id.values[0]] = s.to_dict("records")
+    return summaries, transaction_logs
+
+
+def _payloads(db_path):
+    with closing(db_schema.connect(db_path)) as conn:
+        return sync_payload.method_summaries(conn), sync_payload.method_transaction_logs(conn)
+
+
+class TestSyncPayload:
+    def test_matches_per_stock_queries(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        _populate(db_path)
+        summaries, transaction_logs = _payloads(db_path)
+        legacy_summaries, legacy_logs = _legacy_payloads(db_path)
+        assert summaries == legacy_summaries
+        assert transaction_logs == legacy_logs
+        for method in METHODS:
+            assert list(transaction_logs[method]) == list(legacy_logs[method]) == ["0050", "0056", "2330"]
+
+    def test_logs_without_latest_summary_skipped(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        _populate(db_path)
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("DELETE FROM latest_bt_summaries WHERE stock_id = '0056'")
+        _, transaction_logs = _payloads(db_path)
+        assert list(transaction_logs["bt_dividend"]) == ["0050", "2330"]
+
+    def test_recent_logs_in_range(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        _populate(db_path)
+        with closing(db_schema.connect(db_path)) as conn:
+            recent = sync_payload.recent_logs(conn, "2024-01-05", "2024-01-08")
+        assert {row["date"] for row in recent} == {"2024-01-05", "2024-01-08"}
+        assert list(recent[0]) == ["stock_id", "date", "date_closed_price", "method"]
+
+    def test_empty_database(self, tmp_path):
+        assert _payloads(tmp_path / "db.sqlite") == ({}, {})
@@ -0,0 +1,101 @@
+"""
+Unit tests for incremental tail fetching (tail_fetch + trade/dividend record integration)
+"""
+import numpy as np
+import pandas as pd
+
+from app.repositories.base_trade_record import TaiwanTradeRecord
+from app.repositories.price_cache import ColumnarCache
+from app.repositories.split_table import SplitTable
+from app.repositories.tail_fetch import is_restated, refresh_tail, tail_start
+from app.repositories.tw_dividend_record import DividendRecord
+
+
+def _prices(start, n, base=100.0):
+    dates = pd.bdate_range(start, periods=n)
+    return pd.DataFrame({"date": dates.strftime("%Y-%m-%d"), "stock_id": "0050",
+                         "close": base + np.arange(n, dtype=float)})
+
+
+class _Source:
+    """Serves rows of a full history from the requested start date."""
+
+    def __init__(self, history):
+        self.history = history
+        self.starts = []
+
+    def __call__(self, start):
+        self.starts.append(start)
+        return self.history[pd.to_datetime(self.history["date"]) >= pd.Timestamp(start)].reset_index(drop=True)
+
+
+class TestTailFetch:
+    def test_tail_start_not_before_start_date(self):
+        assert tail_start(pd.Timestamp("2024-03-15"), "2020-01-01", 7) == "2024-03-08"
+        assert tail_start(pd.Timestamp("2020-01-03"), "2020-01-01", 7) == "2020-01-01"
+
+    def test_appends_new_bars_with_overlap(self):
+        history = _prices("2024-01-01", 30)
+        cached = history.iloc[:20].assign(date=lambda d: pd.to_datetime(d["date"]))
+        source = _Source(history)
+
+        merged = refresh_tail(cached, source, "2020-01-01", 7, ["close"])
+
+        assert source.starts == [tail_start(cached["date"].max(), "2020-01-01", 7)]
+        pd.testing.assert_frame_equal(merged, history.assign(date=pd.to_datetime(history["date"])))
+
+    def test_restatement_triggers_full_fetch(self):
+        history = _prices("2024-01-01", 30)
+        cached = history.iloc[:20].assign(date=lambda d: pd.to_datetime(d["date"]), close=lambda d: d["close"] * 2)
+        source = _Source(history)
+
+        merged = refresh_tail(cached, source, "2020-01-01", 7, ["close"])
+
+        assert source.starts[-1] == "2020-01-01"
+        assert merged["close"].tolist() == history["close"].tolist()
+
+    def test_empty_tail_keeps_cache(self):
+        cached = _prices("2024-01-01", 5).assign(date=lambda d: pd.to_datetime(d["date"]))
+        merged = refresh_tail(cached, lambda start: pd.DataFrame(), "2020-01-01", 7, ["close"])
+        pd.testing.assert_frame_equal(merged, cached)
+
+    def test_no_overlap_counts_as_restated(self):
+        cached = _prices("2024-01-01", 5).assign(date=lambda d: pd.to_datetime(d["date"]))
+        fetched = _prices("2024-03-01", 5).assign(date=lambda d: pd.to_datetime(d["date"]))
+        assert is_restated(cached, fetched, ["close"])
+
+
+class TestRecordsFetchTail:
+    def test_stale_tw_cache_fetches_tail_only(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(TaiwanTradeRecord, "DATA_DIR", tmp_path)
+        monkeypatch.setattr(SplitTable, "_shared", {
+            ("2020-01-01", None): SplitTable("2020-01-01", tmp_path / "splits.csv",
+                                             lambda start: pd.DataFrame(columns=SplitTable.COLUMNS))})
+        history = _prices("2024-01-01", 30)
+        source = _Source(history)
+        record = TaiwanTradeRecord()
+        monkeypatch.setattr(record, "fetchTradeData", lambda stock_id, start: source(start))
+        record.cache.write("0050_raw", history.iloc[:20].assign(date=lambda d: pd.to_datetime(d["date"])))
+
+        df = record.getTradeRecords("0050", "2020-01-01")
+
+        assert source.starts == ["2024-01-19"]
+        assert df["close"].tolist() == history["close"].tolist()
+        # the overlap matched, so the cache only gained a partition
+        assert len(record.cache._manifest("0050_raw")["partitions"]) == 2
+
+    def test_stale_dividend_cache_fetches_tail_only(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(DividendRecord, "CACHE", ColumnarCache(tmp_path))
+        history = pd.DataFrame({"date": ["2022-07-18", "2023-07-18", "2024-01-17", "2024-07-16"],
+                                "stock_and_cache_dividend": [1.8, 2.6, 1.9, 1.0],
+                                "stock_or_cache_dividend": [1.8, 2.6, 1.9, 1.0],
+                                "stock_id": "0050"})
+        source = _Source(history)
+        monkeypatch.setattr(DividendRecord, "fetchDividendRecords", lambda stock_id, start: source(start))
+        cached = history.iloc[:3][DividendRecord.COLUMNS]
+        DividendRecord.CACHE.write("0050-dividend", cached.assign(date=pd.to_datetime(cached["date"])))
+
+        df = DividendRecord.getDividendRecords("0050", "2020-01-01")
+
+        assert source.starts == ["2023-12-18"]
+        assert df["stock_or_cache_dividend"].tolist() == [1.8, 2.6, 1.9, 1.0]
@@ -0,0 +1,217 @@
+"""
+TiingoClient tests against a local aiohttp stub server, and USTradeRecord.prefetch with a fake client
+"""
+import asyncio
+import json
+import time
+
+import pandas as pd
+import pytest
+from aiohttp import web
+
+from app.repositories.base_trade_record import USTradeRecord
+from app.services.tiingo import TiingoClient, TiingoError, TokenBucket
+
+
+def _bars(stock_id):
+    return [
+        {"date": "2024-01-02T00:00:00.000Z", "adjClose": 100.0, "divCash": 0.0, "ticker": stock_id},
+        {"date": "2024-01-03T00:00:00.000Z", "adjClose": 101.5, "divCash": 0.5, "ticker": stock_id},
+    ]
+
+
+async def _with_stub(handler, scenario):
+    """Run scenario(base_url) while a stub Tiingo server is listening on localhost."""
+    app = web.Application()
+    app.router.add_get("/tiingo/daily/{stock_id}/prices", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        return await scenario(f"http://127.0.0.1:{port}")
+    finally:
+        await runner.cleanup()
+
+
+class TestTiingoClient:
+    def test_fetch_many_concurrently(self):
+        state = {"active": 0, "peak": 0, "tokens": set()}
+
+        async def handler(request):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            state["tokens"].add(request.query["token"])
+            await asyncio.sleep(0.05)
+            state["active"] -= 1
+            return web.json_response(_bars(request.match_info["stock_id"]))
+
+        async def scenario(base_url):
+            client = TiingoClient("secret", base_url=base_url, concurrency=4, hourly_quota=3600, burst=20)
+            return await client.fetch_many_async([f"S{i}" for i in range(8)], "2024-01-01")
+
+        frames = asyncio.run(_with_stub(handler, scenario))
+        assert sorted(frames) == [f"S{i}" for i in range(8)]
+        assert frames["S3"]["date"].tolist() == ["2024-01-02", "2024-01-03"]
+        assert frames["S3"]["ticker"].unique().tolist() == ["S3"]
+        assert 1 < state["peak"] <= 4
+        assert state["tokens"] == {"secret"}
+
+    def test_429_honours_retry_after(self):
+        calls = []
+
+        async def handler(request):
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                return web.Response(status=429, headers={"Retry-After": "0.3"})
+            return web.json_response(_bars(request.match_info["stock_id"]))
+
+        async def scenario(base_url):
+            client = TiingoClient("secret", base_url=base_url, concurrency=1, hourly_quota=3600, burst=10)
+            return await client.fetch_many_async(["VOO"], "2024-01-01")
+
+        frames = asyncio.run(_with_stub(handler, scenario))
+        assert len(frames["VOO"]) == 2
+        assert len(calls) == 2
+        assert calls[1] - calls[0] >= 0.3
+
+    def test_error_status_raises(self):
+        async def handler(request):
+            return web.Response(status=404, text="not found")
+
+        async def scenario(base_url):
+            client = TiingoClient("secret", base_url=base_url, hourly_quota=3600)
+            return await client.fetch_many_async(["NOPE"], "2024-01-01")
+
+        with pytest.raises(TiingoError):
+            asyncio.run(_with_stub(handler, scenario))
+
+    def test_return_exceptions_keeps_other_symbols(self):
+        async def handler(request):
+            if request.match_info["stock_id"] == "NOPE":
+                return web.Response(status=404, text="not found")
+            return web.json_response(_bars(request.match_info["stock_id"]))
+
+        async def scenario(base_url):
+            client = TiingoClient("secret", base_url=base_url, hourly_quota=3600)
+            return await client.fetch_since_async({"VOO": "2024-01-01", "NOPE": "2024-01-01"}, return_exceptions=True)
+
+        frames = asyncio.run(_with_stub(handler, scenario))
+        assert len(frames["VOO"]) == 2
+        assert isinstance(frames["NOPE"], TiingoError)
+
+    def test_from_config_reads_token_and_quota(self, tmp_path):
+        path = tmp_path / "tiingo.json"
+        path.write_text('{"token": "abc", "hourly_quota": 500}')
+        client = TiingoClient.from_config(path)
+        assert client.token == "abc"
+        assert client.bucket.rate == pytest.approx(500 / 3600)
+
+
+class _FakeClient:
+    """fetch_since stub: records each request, fails for symbols in `failing`."""
+
+    def __init__(self, failing=()):
+        self.requests = []
+        self.failing = set(failing)
+
+    def fetch_since(self, starts, return_exceptions=False):
+        self.requests.append(dict(starts))
+        frames = {}
+        for stock_id, start in starts.items():
+            if stock_id in self.failing:
+                if not return_exceptions:
+                    raise TiingoError(stock_id)
+                frames[stock_id] = TiingoError(stock_id)
+            else:
+                frames[stock_id] = pd.DataFrame({"date": [start], "close": [float(len(self.requests))]})
+        return frames
+
+
+class TestUSPrefetch:
+    @pytest.fixture
+    def client(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(USTradeRecord, "CACHE_ROOT", tmp_path)
+        monkeypatch.setattr(USTradeRecord, "_prefetched", {})
+        client = _FakeClient(failing={"NOPE"})
+        monkeypatch.setattr(USTradeRecord, "_client", client)
+        return client
+
+    def test_prefetched_frame_is_used_once(self, client):
+        USTradeRecord.prefetch(["VOO", "QQQ"], "2024-01-01")
+        record = USTradeRecord()
+        assert record.fetchTradeData("VOO", "2024-01-01")["close"].tolist() == [1.0]
+        # a second fetch in the same run (e.g. full re-fetch after a split) must not reuse the prefetched frame
+        assert record.fetchTradeData("VOO", "2024-01-01")["close"].tolist() == [2.0]
+        assert client.requests[-1] == {"VOO": "2024-01-01"}
+
+    def test_failed_symbol_falls_back_to_single_fetch(self, client):
+        USTradeRecord.prefetch(["VOO", "NOPE"], "2024-01-01")
+        assert list(USTradeRecord._prefetched) == [("VOO", "2024-01-01")]
+        client.failing.clear()
+        assert len(USTradeRecord().fetchTradeData("NOPE", "2024-01-01")) == 1
+        assert client.requests[-1] == {"NOPE": "2024-01-01"}
+
+    def test_prefetch_replaces_previous_run(self, client):
+        USTradeRecord.prefetch(["VOO", "QQQ"], "2024-01-01")
+        USTradeRecord.prefetch(["QQQ"], "2024-01-01")
+        assert list(USTradeRecord._prefetched) == [("QQQ", "2024-01-01")]
+
+
+class TestTokenBucket:
+    def test_rate_limits_after_burst(self):
+        async def scenario():
+            bucket = TokenBucket(capacity=2, rate=20)
+            start = time.monotonic()
+            for _ in range(6):
+                await bucket.acquire()
+            return time.monotonic() - start
+
+        # 2 immediate tokens, then 4 more at 20/s
+        assert asyncio.run(scenario()) >= 0.19
+
+    def test_pause_blocks_acquire(self):
+        async def scenario():
+            bucket = TokenBucket(capacity=5, rate=100)
+            bucket.pause(0.2)
+            start = time.monotonic()
+            await bucket.acquire()
+            return time.monotonic() - start
+
+        assert asyncio.run(scenario()) >= 0.2
+
+    def test_state_carries_over_between_runs(self, tmp_path):
+        path = tmp_path / "tiingo_requests.json"
+
+        async def spend(bucket, n):
+            for _ in range(n):
+                await bucket.acquire()
+
+        first = TokenBucket(capacity=3, rate=3 / 3600, state_path=path)
+        asyncio.run(spend(first, 3))
+        first.save()
+
+        # the next run starts with the quota already spent instead of a full bucket
+        second = TokenBucket(capacity=3, rate=3 / 3600, state_path=path)
+        assert second._tokens < 1
+        assert len(second._requests) == 3
+
+    def test_state_ignores_requests_older_than_window(self, tmp_path):
+        path = tmp_path / "tiingo_requests.json"
+        path.write_text(json.dumps([time.time() - 7200] * 3))
+        bucket = TokenBucket(capacity=3, rate=3 / 3600, state_path=path)
+        assert bucket._tokens == 3
+        assert bucket._requests == []
+
+    def test_client_saves_bucket_state(self, tmp_path):
+        async def handler(request):
+            return web.json_response(_bars(request.match_info["stock_id"]))
+
+        async def scenario(base_url):
+            client = TiingoClient("secret", base_url=base_url, hourly_quota=3600,
+                                  state_path=tmp_path / "tiingo_requests.json")
+            return await client.fetch_many_async(["VOO", "QQQ"], "2024-01-01")
+
+        asyncio.run(_with_stub(handler, scenario))
+        assert len(json.loads((tmp_path / "tiingo_requests.json").read_text())) == 2
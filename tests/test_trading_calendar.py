@@ -0,0 +1,147 @@
+"""
+Unit tests for TradingCalendar and FreshnessManifest
+"""
+from datetime import date, datetime, time
+
+import pandas as pd
+import pytest
+
+from app.repositories import tw_dividend_record
+from app.repositories.base_trade_record import TaiwanTradeRecord
+from app.repositories.freshness_manifest import FreshnessManifest, covered_session
+from app.repositories.price_cache import ColumnarCache
+from app.repositories.split_table import SplitTable
+from app.repositories.trading_calendar import NYSEHolidayCalendar, TradingCalendar
+
+
+def _tw(now=None, holidays=()):
+    return TradingCalendar("tw", "Asia/Taipei", time(14, 0), holidays, clock=lambda: now)
+
+
+def _us():
+    return TradingCalendar("us", "America/New_York", time(17, 0), rules=NYSEHolidayCalendar())
+
+
+class TestTradingCalendar:
+    def test_before_ready_time_uses_previous_session(self):
+        cal = _tw()
+        assert cal.last_completed_session(datetime(2024, 6, 12, 10, 0)) == date(2024, 6, 11)
+        assert cal.last_completed_session(datetime(2024, 6, 12, 18, 0)) == date(2024, 6, 12)
+
+    def test_weekend_rolls_back_to_friday(self):
+        cal = _tw()
+        assert cal.last_completed_session(datetime(2024, 6, 16, 20, 0)) == date(2024, 6, 14)
+        assert cal.last_completed_session(datetime(2024, 6, 17, 9, 0)) == date(2024, 6, 14)
+
+    def test_configured_holiday_skipped(self):
+        # 2024-06-10 端午節
+        cal = _tw(holidays={date(2024, 6, 10)})
+        assert cal.last_completed_session(datetime(2024, 6, 10, 20, 0)) == date(2024, 6, 7)
+
+    @pytest.mark.parametrize("day", ["2024-01-01", "2024-03-29", "2024-06-19", "2024-07-04", "2024-11-28",
+                                     "2024-12-25", "2022-12-26"])
+    def test_nyse_holidays(self, day):
+        assert not _us().is_session(date.fromisoformat(day))
+
+    def test_nyse_saturday_new_year_not_observed_on_friday(self):
+        # 2022-01-01 was a Saturday; NYSE stayed open on 2021-12-31
+        assert _us().is_session(date(2021, 12, 31))
+
+    def test_timezone_aware_now_converted(self):
+        # 2024-06-12 23:00 UTC = 19:00 New York
+        now = pd.Timestamp("2024-06-12 23:00", tz="UTC").to_pydatetime()
+        assert _us().last_completed_session(now) == date(2024, 6, 12)
+
+
+class TestFreshnessManifest:
+    def test_mark_and_reload(self, tmp_path):
+        path = tmp_path / "freshness.json"
+        FreshnessManifest(path).mark("0050_raw", date(2024, 6, 14))
+        assert FreshnessManifest(path).session("0050_raw") == date(2024, 6, 14)
+
+    def test_stale_only_after_new_session(self, tmp_path):
+        manifest = FreshnessManifest(tmp_path / "freshness.json")
+        manifest.mark("0050_raw", date(2024, 6, 14))
+        assert not manifest.is_stale("0050_raw", _tw(datetime(2024, 6, 16, 12, 0)))
+        assert manifest.is_stale("0050_raw", _tw(datetime(2024, 6, 17, 18, 0)))
+        assert manifest.is_stale("2330_raw", _tw(datetime(2024, 6, 16, 12, 0)))
+
+    def test_covered_session_is_last_bar_when_unpublished(self):
+        cal = _tw(datetime(2024, 6, 17, 20, 0))
+        assert covered_session(cal, date(2024, 6, 14)) == date(2024, 6, 14)
+        assert covered_session(cal, date(2024, 6, 17)) == date(2024, 6, 17)
+        assert covered_session(cal, None) == date(2024, 6, 17)
+
+    def test_covered_session_records_attempted_past_session(self):
+        # the 6/17 bar never arrives (a holiday missing from holidays.json); by the next morning it counts as attempted
+        cal = _tw(datetime(2024, 6, 18, 9, 0))
+        assert covered_session(cal, date(2024, 6, 14)) == date(2024, 6, 17)
+
+
+class TestLoaderSkipsNetwork:
+    def test_weekend_rerun_does_not_fetch(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(TaiwanTradeRecord, "DATA_DIR", tmp_path)
+        monkeypatch.setattr(SplitTable, "_shared", {
+            ("2020-01-01", None): SplitTable("2020-01-01", tmp_path / "splits.csv",
+                                             lambda start: pd.DataFrame(columns=SplitTable.COLUMNS))})
+        raw = pd.DataFrame({"date": ["2024-06-13", "2024-06-14"], "stock_id": "0050", "close": [188.0, 188.5]})
+        fetches = []
+        record = TaiwanTradeRecord()
+        monkeypatch.setattr(record, "fetchTradeData", lambda stock_id, start: fetches.append(start) or raw)
+
+        monkeypatch.setattr(TaiwanTradeRecord, "CALENDAR", _tw(datetime(2024, 6, 14, 20, 0)))
+        record.getTradeRecords("0050", "2020-01-01")
+        monkeypatch.setattr(TaiwanTradeRecord, "CALENDAR", _tw(datetime(2024, 6, 16, 9, 0)))
+        record.getTradeRecords("0050", "2020-01-01")
+        assert fetches == ["2020-01-01"]
+
+        monkeypatch.setattr(TaiwanTradeRecord, "CALENDAR", _tw(datetime(2024, 6, 17, 20, 0)))
+        record.getTradeRecords("0050", "2020-01-01")
+        assert fetches == ["2020-01-01", "2024-06-07"]
+
+    def test_unpublished_bar_is_fetched_again(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(TaiwanTradeRecord, "DATA_DIR", tmp_path)
+        monkeypatch.setattr(SplitTable, "_shared", {
+            ("2020-01-01", None): SplitTable("2020-01-01", tmp_path / "splits.csv",
+                                             lambda start: pd.DataFrame(columns=SplitTable.COLUMNS))})
+        # 6/17 收盤後執行，但 FinMind 只發布到 6/14
+        raw = pd.DataFrame({"date": ["2024-06-13", "2024-06-14"], "stock_id": "0050", "close": [188.0, 188.5]})
+        fetches = []
+        record = TaiwanTradeRecord()
+        monkeypatch.setattr(record, "fetchTradeData", lambda stock_id, start: fetches.append(start) or raw)
+        monkeypatch.setattr(TaiwanTradeRecord, "CALENDAR", _tw(datetime(2024, 6, 17, 20, 0)))
+
+        record.getTradeRecords("0050", "2020-01-01")
+        assert record.freshness.session("0050_raw") == date(2024, 6, 14)
+        record.getTradeRecords("0050", "2020-01-01")
+        assert fetches == ["2020-01-01", "2024-06-07"]
+
+    def test_dividend_freshness_follows_price_cache(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(tw_dividend_record.DividendRecord, "CACHE", ColumnarCache(tmp_path))
+        monkeypatch.setattr(tw_dividend_record, "TW_CALENDAR", _tw(datetime(2024, 6, 17, 20, 0)))
+        dividends = pd.DataFrame({"date": ["2024-01-18"], "stock_and_cache_dividend": [2.5],
+                                  "stock_or_cache_dividend": [2.5]})
+        monkeypatch.setattr(tw_dividend_record.DividendRecord, "fetchDividendRecords",
+                            lambda stock_id, start: dividends)
+        manifest = tw_dividend_record.DividendRecord.freshness()
+        manifest.mark("0050_raw", date(2024, 6, 14))
+
+        tw_dividend_record.DividendRecord.getDividendRecords("0050", "2020-01-01")
+        assert manifest.session("0050-dividend") == date(2024, 6, 14)
+
+    def test_unlisted_holiday_is_fetched_once_more(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(TaiwanTradeRecord, "DATA_DIR", tmp_path)
+        monkeypatch.setattr(SplitTable, "_shared", {
+            ("2020-01-01", None): SplitTable("2020-01-01", tmp_path / "splits.csv",
+                                             lambda start: pd.DataFrame(columns=SplitTable.COLUMNS))})
+        # 6/17 is a market holiday that holidays.json does not list
+        raw = pd.DataFrame({"date": ["2024-06-13", "2024-06-14"], "stock_id": "0050", "close": [188.0, 188.5]})
+        fetches = []
+        record = TaiwanTradeRecord()
+        monkeypatch.setattr(record, "fetchTradeData", lambda stock_id, start: fetches.append(start) or raw)
+
+        for now in (datetime(2024, 6, 17, 20, 0), datetime(2024, 6, 18, 9, 0), datetime(2024, 6, 18, 10, 0)):
+            monkeypatch.setattr(TaiwanTradeRecord, "CALENDAR", _tw(now))
+            record.getTradeRecords("0050", "2020-01-01")
+        assert fetches == ["2020-01-01", "2024-06-07"]
+        assert record.freshness.session("0050_raw") == date(2024, 6, 17)
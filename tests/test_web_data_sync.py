@@ -0,0 +1,121 @@
+"""
+Unit tests for WebDataSync: coalesced multi-path updates and _sync_with_retry (stub Firebase client)
+"""
+import logging
+
+import pytest
+
+from app.repositories import web_data_sync
+from app.repositories.bt_engine import BacktestBatch
+from app.repositories.result_sink import SqliteResultSink
+from app.repositories.web_data_sync import TWWebData, _sync_with_retry
+
+
+class _StubFirebase:
+    MAX_UPDATE_BYTES = 8 * 1024 * 1024
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = []
+
+    def updateNodes(self, updates):
+        self.calls.append(updates)
+        if len(self.calls) <= self.failures:
+            raise ConnectionError("stub failure")
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(web_data_sync.time, "sleep", delays.append)
+    return delays
+
+
+class TestSyncWithRetry:
+    def test_retries_with_exponential_backoff(self, monkeypatch, sleeps):
+        stub = _StubFirebase(failures=2)
+        monkeypatch.setattr(web_data_sync, "DB", stub)
+        _sync_with_retry({"tw/a": 1, "tw/b": 2})
+        assert len(stub.calls) == 3
+        assert sleeps == [2, 4]
+
+    def test_raises_after_last_attempt(self, monkeypatch, sleeps, caplog):
+        stub = _StubFirebase(failures=5)
+        monkeypatch.setattr(web_data_sync, "DB", stub)
+        with caplog.at_level(logging.WARNING, logger=web_data_sync.__name__):
+            with pytest.raises(ConnectionError):
+                _sync_with_retry({"tw/a": 1, "tw/b": 2})
+        assert len(stub.calls) == 3
+        assert sleeps == [2, 4]
+        assert "tw/a 等 2 個路徑" in caplog.records[-1].getMessage()
+
+
+class TestDoProcess:
+    def _web_data(self, tmp_path):
+        db_path = tmp_path / "db.sqlite"
+        with SqliteResultSink(db_path, "transaction_logs", "bt_summaries") as sink:
+            for stock_id in ("0050", "0056"):
+                for method in ("bt_dividend", "bt_signals"):
+                    logs = [(stock_id, "2024-01-02", method, 1.0, 10.0, 10.0, 10.0, 0.0, 10.0)]
+                    summary = (stock_id, "2024-06-14", method, 10.0, 10.0, 0.0, 10.0, 0.1, 0.05)
+                    sink.add(BacktestBatch(logs=logs, summaries=[summary]))
+
+        class _WebData(TWWebData):
+            DB_PATH = db_path
+
+        return _WebData()
+
+    def test_all_nodes_in_one_update(self, tmp_path, monkeypatch):
+        stub = _StubFirebase()
+        monkeypatch.setattr(web_data_sync, "DB", stub)
+        self._web_data(tmp_path).do_process()
+        assert len(stub.calls) == 1
+        assert sorted(stub.calls[0]) == ["tw/bt_dividend/summaries", "tw/bt_dividend/transaction_logs",
+                                         "tw/bt_signals/summaries", "tw/bt_signals/transaction_logs",
+                                         "tw/recent_transaction_logs", "tw/schema"]
+        assert list(stub.calls[0]["tw/bt_signals/transaction_logs"]) == ["0050", "0056"]
+
+    def test_second_run_uploads_nothing(self, tmp_path, monkeypatch):
+        stub = _StubFirebase()
+        monkeypatch.setattr(web_data_sync, "DB", stub)
+        web_data = self._web_data(tmp_path)
+        first = web_data.do_process()
+        second = web_data.do_process()
+        assert len(stub.calls) == 1
+        assert second.uploaded_bytes == 0
+        assert second.skipped_bytes == first.uploaded_bytes
+
+        web_data.do_process(full=True)
+        assert len(stub.calls) == 2
+
+    def test_switching_to_columnar_overwrites_collections(self, tmp_path, monkeypatch):
+        stub = _StubFirebase()
+        monkeypatch.setattr(web_data_sync, "DB", stub)
+        web_data = self._web_data(tmp_path)
+        web_data.do_process()
+        web_data.do_process(log_format="columnar")
+        updates = stub.calls[-1]
+        assert updates["tw/schema"]["transaction_logs"]["format"] == "columnar"
+        assert set(updates["tw/bt_dividend/transaction_logs"]) == {"0050", "0056"}
+        assert updates["tw/bt_dividend/transaction_logs"]["0050"]["0"]["n"] == 1
+
+        # 同格式再次同步不上傳
+        web_data.do_process(log_format="columnar")
+        assert len(stub.calls) == 2
+
+    def test_failed_upload_not_recorded(self, tmp_path, monkeypatch, sleeps):
+        monkeypatch.setattr(web_data_sync, "DB", _StubFirebase(failures=3))
+        web_data = self._web_data(tmp_path)
+        with pytest.raises(ConnectionError):
+            web_data.do_process()
+        assert web_data.ledger.load() == {}
+
+    def test_large_payload_split_into_bounded_updates(self, tmp_path, monkeypatch, sleeps):
+        stub = _StubFirebase(failures=1)
+        stub.MAX_UPDATE_BYTES = 600
+        monkeypatch.setattr(web_data_sync, "DB", stub)
+        self._web_data(tmp_path).do_process()
+        # 第一塊失敗一次後重試，其餘各一次
+        assert len(stub.calls) > 3
+        assert stub.calls[0] == stub.calls[1]
+        assert sleeps == [2]
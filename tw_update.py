@@ -4,6 +4,8 @@ from pathlib import Path
 
 import pandas as pd
 from app.repositories.base_strategy import TwStrategy
+from app.repositories.indicator_store import IndicatorStore
+from app.repositories.parallel_backtest import ParallelBacktestRunner
 from app.repositories.base_trade_record import TaiwanTradeRecord
 from app.repositories.tw_dividend_record import DividendRecord
 from app.services.app_logger import get_logger
@@ -14,34 +16,36 @@ if __name__ == "__main__":
     try:
         # 初始化
         Strategy = TwStrategy()
-
-        # 清除資料表
-        Strategy.clear_tables()
+        Strategy.indicator_store = IndicatorStore(Path('data/tw/indicators'))
 
         # 初始日期
         start_date = '2020-01-01'
 
         stocks_config = json.loads(Path('stocks.json').read_text(encoding='utf-8'))
         focus_stocks = stocks_config['tw']
-        for stock_id in focus_stocks:
-            logger.info("擷取:%s  起始日:%s", stock_id, start_date)
-
-            # 撈個資料
-            TradeRecord = TaiwanTradeRecord()
-            df_stock = TradeRecord.getTradeRecords(stock_id, start_date)
-            df_dividend = DividendRecord.getDividendRecords(stock_id, start_date)
-
-            # 合併股息和歷史交易資料
-            df_stock = df_stock.merge(df_dividend, how='outer', left_index=True, right_index=True)
-            df_stock = df_stock.fillna({'stock_and_cache_dividend': 0})
-            df_stock = df_stock.reset_index(names='date')
-            df_stock = df_stock.assign(date=pd.to_datetime(df_stock['date']))
-
-            # run
-            Strategy.bt_strategy(df_stock, 'bt_dividend')
-            Strategy.bt_strategy(df_stock, 'bt_signals')
-            Strategy.bt_strategy(df_stock, 'bt_ma_pullback')
-            Strategy.bt_strategy(df_stock, 'bt_monthly_dca')
+        # 股價暫存為記憶體映射檔，with 區塊結束時刪除
+        with ParallelBacktestRunner(Strategy, logger=logger) as Runner:
+            for stock_id in focus_stocks:
+                logger.info("擷取:%s  起始日:%s", stock_id, start_date)
+
+                # 撈個資料
+                TradeRecord = TaiwanTradeRecord()
+                df_stock = TradeRecord.getTradeRecords(stock_id, start_date)
+                df_dividend = DividendRecord.getDividendRecords(stock_id, start_date)
+
+                # 合併股息和歷史交易資料
+                df_stock = df_stock.merge(df_dividend, how='outer', left_index=True, right_index=True)
+                df_stock = df_stock.fillna({'stock_and_cache_dividend': 0})
+                df_stock = df_stock.reset_index(names='date')
+                df_stock = df_stock.assign(date=pd.to_datetime(df_stock['date']))
+
+                # 價格存為記憶體映射檔，待全部擷取完成後平行回測
+                Runner.add(df_stock)
+
+            # run：(股票, 策略) 分派至多個工作程序，自檢查點增量續算，結果以單一交易寫入；
+            # 已自 stocks.json 移除的股票於同一交易內刪除
+            logger.info("回測 %d 檔，工作程序 %d", len(Runner.stock_ids), Runner.workers)
+            Runner.run(Strategy.METHODS, incremental=True, prune=True)
 
         logger.info("tw_update 完成")
     except Exception:
@@ -4,6 +4,8 @@ from pathlib import Path
 
 import pandas as pd
 from app.repositories.base_strategy import UsStrategy
+from app.repositories.indicator_store import IndicatorStore
+from app.repositories.parallel_backtest import ParallelBacktestRunner
 from app.repositories.base_trade_record import USTradeRecord
 from app.services.app_logger import get_logger
 
@@ -13,30 +15,36 @@ if __name__ == "__main__":
     try:
         # 初始化
         Strategy = UsStrategy()
-
-        # 清除資料表
-        Strategy.clear_tables()
+        Strategy.indicator_store = IndicatorStore(Path('data/us/indicators'))
 
         # 初始日期
         start_date = '2020-01-01'
 
         stocks_config = json.loads(Path('stocks.json').read_text(encoding='utf-8'))
         focus_stocks = stocks_config['us']
-        for stock_id in focus_stocks:
-            logger.info("擷取:%s  起始日:%s", stock_id, start_date)
-
-            # 撈個資料 (含股息)
-            TradeRecord = USTradeRecord()
-            df_stock = TradeRecord.getTradeRecords(stock_id, start_date)
-            df_stock['stock_id'] = stock_id
-            df_stock = df_stock.reset_index(names='date')
-            df_stock = df_stock.assign(date=pd.to_datetime(df_stock['date']))
-
-            # run
-            Strategy.bt_strategy(df_stock, 'bt_dividend')
-            Strategy.bt_strategy(df_stock, 'bt_signals')
-            Strategy.bt_strategy(df_stock, 'bt_ma_pullback')
-            Strategy.bt_strategy(df_stock, 'bt_monthly_dca')
+
+        # 並行擷取需更新的股價（共用連線池、依 Tiingo 配額限速）
+        USTradeRecord.prefetch(focus_stocks, start_date)
+
+        # 股價暫存為記憶體映射檔，with 區塊結束時刪除
+        with ParallelBacktestRunner(Strategy, logger=logger) as Runner:
+            for stock_id in focus_stocks:
+                logger.info("擷取:%s  起始日:%s", stock_id, start_date)
+
+                # 撈個資料 (含股息)
+                TradeRecord = USTradeRecord()
+                df_stock = TradeRecord.getTradeRecords(stock_id, start_date)
+                df_stock['stock_id'] = stock_id
+                df_stock = df_stock.reset_index(names='date')
+                df_stock = df_stock.assign(date=pd.to_datetime(df_stock['date']))
+
+                # 價格存為記憶體映射檔，待全部擷取完成後平行回測
+                Runner.add(df_stock)
+
+            # run：(股票, 策略) 分派至多個工作程序，自檢查點增量續算，結果以單一交易寫入；
+            # 已自 stocks.json 移除的股票於同一交易內刪除
+            logger.info("回測 %d 檔，工作程序 %d", len(Runner.stock_ids), Runner.workers)
+            Runner.run(Strategy.METHODS, incremental=True, prune=True)
 
         logger.info("us_update 完成")
     except Exception: